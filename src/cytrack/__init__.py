@@ -3,6 +3,7 @@ import warnings
 
 from .cytrack import *
 from .cytrack_functions import *
+from .cytrack_geodesic import *
 from ._version import get_versions 
 
 __version__ = get_versions()['version']
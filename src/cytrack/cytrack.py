@@ -121,11 +121,17 @@ def get_cytrack_main(pathfile=""):
 	custom_upper_level_variable_name = check_paths(content,"custom_upper_level_variable_name")
 	custom_terrain_high_filename = check_paths(content,"custom_terrain_high_filename")
 	custom_terrain_high_var_name = check_paths(content,"custom_terrain_high_var_name")
+	precompute_mslp_anomaly = check_paths(content,"precompute_mslp_anomaly")
+	mslp_climatology_file = check_paths(content,"mslp_climatology_file")
+	extrema_window_km = check_paths(content,"extrema_window_km")
+	mslp_smoothing_km = check_paths(content,"mslp_smoothing_km")
+	wind_radii_thresholds = check_paths(content,"wind_radii_thresholds")
+	candidate_stats = check_paths(content,"candidate_stats")
 	
 	
 	
 	
-	filter_center_threshold, critical_outer_radius, dist_threshold, verbose, path_out, tmpdir, source, dt_h, rout,dr_res,d_ang,remove_tmp_dir,format_date_file_name,min_slp_threshold,dt_lifetime,minimum_distance_travelled,terrain_filter,prev_days,mslp_anomaly_threshold,search_limits,search_region,max_wind_speed_threshold,outer_wind_speed_threshold,intensity_threshold,vorticity_threshold,checking_upper_levels_parameters,max_dist,great_circle_distance,dmslp_great_circle_distance,radius_for_msw,path_data_source_upper,path_data_source,vtl_vtu_lr,core_criteria_length,VTL_threshold,VTU_threshold,Bhart_threshold,plotting_maps,use_mslp_anomaly, calendar=check_default_parameters(cyclone_type=cyclone_type,
+	filter_center_threshold, critical_outer_radius, dist_threshold, verbose, path_out, tmpdir, source, dt_h, rout,dr_res,d_ang,remove_tmp_dir,format_date_file_name,min_slp_threshold,dt_lifetime,minimum_distance_travelled,terrain_filter,prev_days,mslp_anomaly_threshold,search_limits,search_region,max_wind_speed_threshold,outer_wind_speed_threshold,intensity_threshold,vorticity_threshold,checking_upper_levels_parameters,max_dist,great_circle_distance,dmslp_great_circle_distance,radius_for_msw,path_data_source_upper,path_data_source,vtl_vtu_lr,core_criteria_length,VTL_threshold,VTU_threshold,Bhart_threshold,plotting_maps,use_mslp_anomaly, calendar, precompute_mslp_anomaly, mslp_climatology_file, extrema_window_km, mslp_smoothing_km, wind_radii_thresholds, candidate_stats=check_default_parameters(cyclone_type=cyclone_type,
 																																										verbose=verbose, 
 																																										source=source,
 																																										path_out=path_out,
@@ -166,9 +172,20 @@ def get_cytrack_main(pathfile=""):
 																																										Bhart_threshold=Bhart_threshold,
 																																										plotting_maps=plotting_maps,
 																																										use_mslp_anomaly=use_mslp_anomaly,
-																																										calendar=calendar
+																																										calendar=calendar,
+																																										precompute_mslp_anomaly=precompute_mslp_anomaly,
+																																										mslp_climatology_file=mslp_climatology_file,
+																																										extrema_window_km=extrema_window_km,
+																																										mslp_smoothing_km=mslp_smoothing_km,
+																																										wind_radii_thresholds=wind_radii_thresholds,
+																																										candidate_stats=candidate_stats
 																																										)
+	if use_mslp_anomaly=="climatology":
+		use_mslp_anomaly=True
+		precompute_mslp_anomaly=False
 	use_mslp_anomaly=str2boolean(use_mslp_anomaly)
+	precompute_mslp_anomaly=str2boolean(precompute_mslp_anomaly)
+	candidate_stats=str2boolean(candidate_stats)
 
 	verbose=str2boolean(verbose)
 	remove_tmp_dir=str2boolean(remove_tmp_dir)
@@ -184,6 +201,8 @@ def get_cytrack_main(pathfile=""):
 	if rank==0:
 		if not os.path.exists(pathoutput):os.makedirs(pathoutput)
 		if not os.path.exists(tmpdir):os.makedirs(tmpdir)
+		# the upper-air grid of a previous run in the same tmpdir may belong to other search limits
+		if os.path.exists(tmpdir+"/upper_grid.npz"):os.remove(tmpdir+"/upper_grid.npz")
 	
 	
 	
@@ -256,7 +275,13 @@ def get_cytrack_main(pathfile=""):
 				VTL_threshold=VTL_threshold,
 				VTU_threshold=VTU_threshold,
 				Bhart_threshold=Bhart_threshold,
-				use_mslp_anomaly=use_mslp_anomaly
+				use_mslp_anomaly=use_mslp_anomaly,
+				precompute_mslp_anomaly=precompute_mslp_anomaly,
+				mslp_climatology_file=mslp_climatology_file,
+				extrema_window_km=extrema_window_km,
+				mslp_smoothing_km=mslp_smoothing_km,
+				wind_radii_thresholds=wind_radii_thresholds,
+				candidate_stats=candidate_stats
 				)
 		
 	
@@ -315,6 +340,29 @@ def get_cytrack_main(pathfile=""):
 	hours=hours[i_bg:]
 	input_files=input_files[i_bg:]
 
+	mslp_history_dir=""
+	if use_mslp_anomaly and precompute_mslp_anomaly:
+		if rank==0 and verbose:
+			print("\nPrecomputing MSLP history")
+			print("----------------------------------------------------------------------------------------")
+		history_dates,history_hours=get_mslp_history_dates(dates=dates,hours=hours,prev_days=prev_days,calendar=calendar)
+		comm.barrier()
+		precompute_mslp_history(idir=path_data_source,
+			source=source,
+			dates=history_dates,
+			hours=history_hours,
+			tmpdir=tmpdir,
+			rank=rank,
+			mpisize=mpisize,
+			search_limits=search_limits,
+			search_region=search_region,
+			source_filename_prefix=source_prefix,
+			source_file_date_format=era_date_file_name,
+			custom_mslp_variable=custom_mslp_variable,
+			custom_latitude_var=custom_latitude_var,
+			custom_longitude_var=custom_longitude_var)
+		mslp_history_dir=tmpdir
+
 
 	comm.barrier()
 	count = len(dates) // mpisize
@@ -389,10 +437,28 @@ def get_cytrack_main(pathfile=""):
 			custom_upper_level_variable_name=custom_upper_level_variable_name,
 			custom_date_file_name=custom_date_file_name,
 			source_upperprefix=source_upperprefix,
+			mslp_history_dir=mslp_history_dir,
+			mslp_climatology_file=mslp_climatology_file,
+			extrema_window_km=extrema_window_km,
+			mslp_smoothing_km=mslp_smoothing_km,
+			wind_radii_thresholds=wind_radii_thresholds,
+			calendar=calendar,
+			candidate_stats=candidate_stats,
 			)
 
 		comm.barrier()
 	if rank==0:
+		if candidate_stats:
+			merge_candidate_stats(tmpdir=tmpdir,
+					dates=dates,
+					hours=hours,
+					filename=pathoutput+"/"+program_name()+"_"+search_region+"_"+dates[0]+hours[0]+"-"+dates[-1]+hours[-1]+"_"+source+"_"+cyclone_type+"_candidate_stats.dat")
+		if len(wind_radii_thresholds)>0:
+			merge_wind_radii(tmpdir=tmpdir,
+					dates=dates,
+					hours=hours,
+					wind_radii_thresholds=wind_radii_thresholds,
+					filename=pathoutput+"/"+program_name()+"_"+search_region+"_"+dates[0]+hours[0]+"-"+dates[-1]+hours[-1]+"_"+source+"_"+cyclone_type+"_wind_radii.dat")
 		if verbose:
 
 			print("\n\nLinking critical centers to contruct " +  cyclone_type.upper()+" trajectories")
@@ -434,6 +500,9 @@ def get_cytrack_main(pathfile=""):
 	if rank==0:
 		if checking_upper_levels_parameters:
 			os.system("rm -r "+tmpdir+"/*.npy")
+			if os.path.exists(tmpdir+"/upper_grid.npz"):os.remove(tmpdir+"/upper_grid.npz")
+		elif mslp_history_dir!="":
+			os.system("rm -r "+tmpdir+"/mslp_*.npy")
 
 	if rank==0 and remove_tmp_dir:
 		os.system("rm -r "+tmpdir)
@@ -445,3 +514,133 @@ def get_cytrack_main(pathfile=""):
 			print("\nRun time: %.2f seconds." % np.round(elapsed_time, 2))
 		ending_credits()
 
+
+
+def build_mslp_climatology_main(pathfile=""):
+	"""
+	Builds the static MSLP climatology used with use_mslp_anomaly='climatology' from the surface files
+	between the begin and end dates of a specified input file.
+
+	Parameters:
+	pathfile (str): The path to the input file containing configuration parameters.
+
+	Workflow:
+	- Reads the source, search region, dates and mslp_climatology_file from the input file.
+	- Splits the surface files in contiguous blocks between the MPI ranks and accumulates the MSLP of each
+	  block by month (mslp_climatology_period='monthly') or day of year (mslp_climatology_period='dayofyear').
+	- Reduces the sums on rank 0 and writes the mean MSLP to mslp_climatology_file.
+	"""
+	if rank==0:
+		disclaimer()
+		print("\n")
+		print("Building MSLP climatology using parameters from: " + pathfile)
+		print("============================================================================================================\n")
+	loader = imp.machinery.SourceFileLoader("", pathfile)
+	content = loader.load_module()
+	verbose = check_paths(content, "verbose")
+	source = check_paths(content, "source")
+	wrfprefix = check_paths(content, "wrfprefix")
+	era_file_prefix = check_paths(content, "era_file_prefix")
+	era_date_file_name = check_paths(content, "era_date_file_name")
+	path_data_source = check_paths(content, "path_data_source")
+	search_limits = check_paths(content, "search_limits")
+	search_region = check_paths(content, "search_region")
+	cyclone_type = check_paths(content, "cyclone_type")
+	begin_year = check_paths(content, "begin_year")
+	begin_month = check_paths(content, "begin_month")
+	begin_day = check_paths(content, "begin_day")
+	begin_hour = check_paths(content, "begin_hour")
+	end_year = check_paths(content, "end_year")
+	end_month = check_paths(content, "end_month")
+	end_day = check_paths(content, "end_day")
+	end_hour = check_paths(content, "end_hour")
+	calendar =  check_paths(content, "calendar")
+	dt_h = check_paths(content, "dt_h")
+	custom_file_prefix=check_paths(content,"custom_file_prefix")
+	custom_date_file_name=check_paths(content,"custom_date_file_name")
+	custom_mslp_variable = check_paths(content,"custom_mslp_variable")
+	custom_latitude_var = check_paths(content,"custom_latitude_var")
+	custom_longitude_var = check_paths(content,"custom_longitude_var")
+	mslp_climatology_file = check_paths(content,"mslp_climatology_file")
+	mslp_climatology_period = check_paths(content,"mslp_climatology_period")
+
+	if mslp_climatology_file=="" or mslp_climatology_file==None:
+		print_error_message("Please define mslp_climatology_file in "+pathfile)
+	if mslp_climatology_period=="" or mslp_climatology_period==None:
+		mslp_climatology_period="monthly"
+	if mslp_climatology_period.lower() not in ("monthly","dayofyear"):
+		print_error_message("mslp_climatology_period must be 'monthly' or 'dayofyear'")
+	if source=="":
+		source="ERA5"
+	if dt_h==None or dt_h=="":
+		dt_h = 6
+	if calendar=="" or calendar==None:
+		calendar="366d"
+	if search_region=="":
+		search_region="GL"
+	if search_limits==None or search_limits=="":
+		search_limits=get_limits_by_region(search_region=search_region,cyclone_type=cyclone_type)
+	if verbose=="" or verbose==None:
+		verbose=True
+	verbose=str2boolean(verbose)
+
+	dates,hours=get_dates_vectors(year_case_init=begin_year,
+		month_case_init=begin_month,
+		day_case_init=begin_day,
+		hour_case_init=begin_hour,
+		year_case_end=end_year,
+		month_case_end=end_month,
+		day_case_end=end_day,
+		hour_case_end=end_hour,
+		dt_h=dt_h,
+		prev_days=0,
+		calendar=calendar
+		)
+
+	if source.upper()=="WRF":
+		input_files=get_wrf_files(dates=dates,hours=hours,wrfprefix=wrfprefix)
+	elif source.upper()=="ERA5":
+		input_files=get_era5_files(dates=dates,hours=hours,era_file_prefix=era_file_prefix,era_date_file_name=era_date_file_name)
+	elif source.upper()=="CUSTOM":
+		input_files=get_custom_files(dates=dates,hours=hours,custom_file_prefix=custom_file_prefix,custom_date_file_name=custom_date_file_name)
+
+	checking_optimum_nproc(rank=rank, n_proc=mpisize, length_files=len(dates))
+	for i in range(0,len(input_files)):
+		checking_input_files(pathfile=path_data_source, source_file=input_files[i],source=source,date=dates[i],hour=hours[i],flev="sfc", rank=rank)
+	comm.barrier()
+
+	count = len(dates) // mpisize
+	remainder = len(dates) % mpisize
+	if rank < remainder:
+		start = rank * (count + 1)
+		stop = start + count + 1
+	else:
+		start = rank * count + remainder
+		stop = start + count
+
+	lats,lons,mslp_sum,mslp_count=accumulate_mslp_climatology(idir=path_data_source,
+			source=source,
+			sourcefiles=input_files[start:stop],
+			dates=dates[start:stop],
+			search_limits=search_limits,
+			search_region=search_region,
+			custom_mslp_variable=custom_mslp_variable,
+			custom_latitude_var=custom_latitude_var,
+			custom_longitude_var=custom_longitude_var,
+			mslp_climatology_period=mslp_climatology_period,
+			verbose=verbose)
+
+	mslp_sum=comm.reduce(mslp_sum, op=MPI.SUM, root=0)
+	mslp_count=comm.reduce(mslp_count, op=MPI.SUM, root=0)
+
+	if rank==0:
+		write_mslp_climatology(filename=mslp_climatology_file,
+				lats=lats,
+				lons=lons,
+				mslp_sum=mslp_sum,
+				mslp_count=mslp_count,
+				mslp_climatology_period=mslp_climatology_period)
+		if verbose:
+			print("\nMSLP climatology saved in: " + mslp_climatology_file)
+			print("\nRun time: %.2f seconds." % np.round(time.time() - start_time, 2))
+		ending_credits()
@@ -3,14 +3,12 @@ import sys
 import os
 from netCDF4 import Dataset,num2date,date2num
 from datetime import datetime, timedelta
-from scipy.interpolate import griddata
-from sklearn.linear_model import LinearRegression
-from scipy import interpolate
+from scipy.spatial import cKDTree
 from numpy.core.numeric import normalize_axis_index
 import argparse
-import xarray as xr
 import time
 import math
+import hashlib
 import scipy.ndimage as sp
 import matplotlib.collections as collections
 import matplotlib.pylab as plt
@@ -18,6 +16,7 @@ import warnings
 import functools
 from scipy.interpolate import interp1d
 from scipy.ndimage import maximum_filter, minimum_filter
+from cytrack.cytrack_geodesic import *
 print = functools.partial(print, flush=True)
 warnings.filterwarnings("ignore")
 warnings.filterwarnings("ignore", category=DeprecationWarning) 
@@ -117,6 +116,7 @@ def read_args():
 	- ``--parameterfile -pf``: name of parameters file.
 	- ``--cytrack_help -cth``: Help for CyTRACK input parameters.
 	- ``--get_template -gt``: Get a template for the CyTRACK input parameters.
+	- ``--build_mslp_climatology -bmc``: Build the MSLP climatology defined in the parameters file.
 
 	Returns:
 		argparse.Namespace: Namespace with the parsed arguments.
@@ -146,6 +146,14 @@ def read_args():
 		type=str2boolean,
 		default=False,
 	)
+	parser.add_argument(
+		"--build_mslp_climatology",
+		"-bmc",
+		help="Build the MSLP climatology defined in the parameters file. Run: python run_"+program_name()+".py -pf <your_input_file> -bmc t",
+		metavar="",
+		type=str2boolean,
+		default=False,
+	)
 	args = parser.parse_args()
 	return args
 
@@ -289,7 +297,13 @@ def check_default_parameters(cyclone_type="",
 				path_data_source_upper="./",
 				path_data_source="./",
 				use_mslp_anomaly=True,
-				calendar="366d"):
+				calendar="366d",
+				precompute_mslp_anomaly=False,
+				mslp_climatology_file="",
+				extrema_window_km=None,
+				mslp_smoothing_km=None,
+				wind_radii_thresholds=None,
+				candidate_stats=False):
 	
 	
 	"""
@@ -371,6 +385,18 @@ def check_default_parameters(cyclone_type="",
 		Whether to use the sea level pressure anomaly or not.
 	calendar : str
 		The calendar to use (e.g. 365d, 366d).
+	precompute_mslp_anomaly : bool
+		Whether to pre-read the MSLP history of the averaging windows, split across all the MPI ranks, before tracking.
+	mslp_climatology_file : str
+		NetCDF file with the static MSLP climatology. Only if use_mslp_anomaly='climatology'.
+	extrema_window_km : float
+		Size (in km) of the neighbourhood to search the MSLP minima. If not given, 25 grid points (25*model_res km).
+	mslp_smoothing_km : float
+		Scale (in km) of the Gaussian smoothing of the MSLP before the search of the minima. 0 to not smooth.
+	wind_radii_thresholds : list of float
+		Wind speed thresholds (in m/s) of the quadrant wind radii. Empty to not compute them.
+	candidate_stats : bool
+		Whether to write the candidate statistics of each time step.
 
 	Returns
 	-------
@@ -446,6 +472,10 @@ def check_default_parameters(cyclone_type="",
 		Whether to use the sea level pressure anomaly or not.
 	calendar : str
 		The calendar to use (e.g. 365d, 366d).
+	precompute_mslp_anomaly : bool
+		Whether to pre-read the MSLP history of the averaging windows, split across all the MPI ranks, before tracking.
+	mslp_climatology_file : str
+		NetCDF file with the static MSLP climatology. Only if use_mslp_anomaly='climatology'.
 	"""
 	if cyclone_type=="":
 		print_error_message("cyclone_type is not defined")
@@ -485,6 +515,19 @@ def check_default_parameters(cyclone_type="",
 		
 	if calendar=="" or calendar==None:
 		calendar="366d"
+
+	if precompute_mslp_anomaly=="" or precompute_mslp_anomaly==None:
+		precompute_mslp_anomaly=False
+
+	if extrema_window_km=="" or extrema_window_km==None:
+		extrema_window_km=25*model_res
+	if mslp_smoothing_km=="" or mslp_smoothing_km==None or mslp_smoothing_km<0:
+		mslp_smoothing_km=0
+	if isinstance(wind_radii_thresholds,str) or wind_radii_thresholds is None:
+		wind_radii_thresholds=[]
+	wind_radii_thresholds=[float(thr) for thr in np.atleast_1d(wind_radii_thresholds)]
+	if candidate_stats=="" or candidate_stats==None:
+		candidate_stats=False
 	
 	if source.upper()=="ERA5":
 		if path_data_source=="":
@@ -509,15 +552,24 @@ def check_default_parameters(cyclone_type="",
 		
 	if dt_h==None or dt_h=="":
 		dt_h = 6
-	if prev_days==None or  prev_days=="":
-		prev_days=14
-	elif prev_days<=0:
-		prev_days=0
-		use_mslp_anomaly=False
-	
-	use_mslp_anomaly=str2boolean(use_mslp_anomaly)
-	if use_mslp_anomaly==False:
+	if mslp_climatology_file==None:
+		mslp_climatology_file=""
+	if str(use_mslp_anomaly).lower()=="climatology":
+		if mslp_climatology_file=="":
+			print_error_message("Please define mslp_climatology_file to use use_mslp_anomaly='climatology'")
 		prev_days=0
+		use_mslp_anomaly="climatology"
+	else:
+		if prev_days==None or  prev_days=="":
+			prev_days=14
+		elif prev_days<=0:
+			prev_days=0
+			use_mslp_anomaly=False
+		
+		use_mslp_anomaly=str2boolean(use_mslp_anomaly)
+		if use_mslp_anomaly==False:
+			prev_days=0
+		mslp_climatology_file=""
 	
 	
 		
@@ -813,7 +865,7 @@ def check_default_parameters(cyclone_type="",
 		
 		
 			
-	return filter_center_threshold, critical_outer_radius, dist_threshold, verbose, path_out, tmpdir, source, dt_h,rout,dr_res,d_ang,remove_tmp_dir,era_date_file_name, min_slp_threshold,dt_lifetime, minimum_distance_travelled,terrain_filter,prev_days,mslp_anomaly_threshold,search_limits,search_region,max_wind_speed_threshold,outer_wind_speed_threshold,intensity_threshold,vorticity_threshold,checking_upper_levels_parameters,max_dist,great_circle_distance,dmslp_great_circle_distance,radius_for_msw,path_data_source_upper,path_data_source, vtl_vtu_lr, core_criteria_length,VTL_threshold,VTU_threshold,Bhart_threshold,plotting_maps,use_mslp_anomaly, calendar
+	return filter_center_threshold, critical_outer_radius, dist_threshold, verbose, path_out, tmpdir, source, dt_h,rout,dr_res,d_ang,remove_tmp_dir,era_date_file_name, min_slp_threshold,dt_lifetime, minimum_distance_travelled,terrain_filter,prev_days,mslp_anomaly_threshold,search_limits,search_region,max_wind_speed_threshold,outer_wind_speed_threshold,intensity_threshold,vorticity_threshold,checking_upper_levels_parameters,max_dist,great_circle_distance,dmslp_great_circle_distance,radius_for_msw,path_data_source_upper,path_data_source, vtl_vtu_lr, core_criteria_length,VTL_threshold,VTU_threshold,Bhart_threshold,plotting_maps,use_mslp_anomaly, calendar, precompute_mslp_anomaly, mslp_climatology_file, extrema_window_km, mslp_smoothing_km, wind_radii_thresholds, candidate_stats
 
 	
 
@@ -854,7 +906,13 @@ def print_dafault_values(cyclone_type="",
 			VTL_threshold=0,
 			VTU_threshold=0,
 			Bhart_threshold=10,
-			use_mslp_anomaly=True
+			use_mslp_anomaly=True,
+			precompute_mslp_anomaly=False,
+			mslp_climatology_file="",
+			extrema_window_km=None,
+			mslp_smoothing_km=0,
+			wind_radii_thresholds=[],
+			candidate_stats=False
 			):
 		
 	"""
@@ -904,6 +962,12 @@ def print_dafault_values(cyclone_type="",
 		VTU_threshold (int): Threshold for VTU.
 		Bhart_threshold (int): Bhart threshold.
 		use_mslp_anomaly (bool): Whether to use MSLP anomaly.
+		precompute_mslp_anomaly (bool): Whether to precompute the MSLP history shared across MPI ranks.
+		mslp_climatology_file (str): Static MSLP climatology used as baseline for the MSLP anomaly.
+		extrema_window_km (float): Size of the neighbourhood to search the MSLP minima in km.
+		mslp_smoothing_km (float): Scale of the MSLP smoothing before the search of the minima in km.
+		wind_radii_thresholds (list): Wind speed thresholds of the quadrant wind radii in m/s.
+		candidate_stats (bool): Whether to write the candidate statistics of each time step.
 
 	"""
 	if  str2boolean(verbose):
@@ -916,6 +980,10 @@ def print_dafault_values(cyclone_type="",
 		print("+ search_region " + search_region)
 		print("+ search_limits :",search_limits)
 		print("+ use_mslp_anomaly: ", use_mslp_anomaly)
+		if mslp_climatology_file!="":
+			print("+ mslp_climatology_file: ", mslp_climatology_file)
+		else:
+			print("+ precompute_mslp_anomaly: ", precompute_mslp_anomaly)
 		print("+ filter_center_threshold: " + str(filter_center_threshold) + " km")
 		print("+ critical_outer_radius: " + str(critical_outer_radius) + " km")
 		print("+ dist_threshold: " + str(dist_threshold) + " km")
@@ -935,6 +1003,11 @@ def print_dafault_values(cyclone_type="",
 		print("+ great_circle_distance: " + str(great_circle_distance) + " degrees")
 		print("+ dmslp_great_circle_distance: " + str(dmslp_great_circle_distance) + " Pa")
 		print("+ radius_for_msw: " + str(radius_for_msw) + " km")
+		print("+ extrema_window_km: " + str(extrema_window_km) + " km")
+		print("+ mslp_smoothing_km: " + str(mslp_smoothing_km) + " km")
+		if len(wind_radii_thresholds)>0:
+			print("+ wind_radii_thresholds: " + str(wind_radii_thresholds) + " m/s")
+		print("+ candidate_stats: " + str(candidate_stats))
 		print("+ checking_upper_levels_parameters: "+ str(checking_upper_levels_parameters))
 		print("+ vtl_vtu_lr: " + str(vtl_vtu_lr))
 		print("+ core_criteria_length: " + str(core_criteria_length))
@@ -980,7 +1053,11 @@ def help():
 	print("..........................................")
 	print("+ cyclone_type         = 'EC'/'TC'/'MC'/'TLC'/'SC'       -> Type of low pressure system for tracking: EC: extratropical cyclones")
 	print("** Note: In the current version of " + program_name()+ " ("+str(get_currentversion())+")" + " is only available the tracking for extratropical cyclones\n" )
-	print("+ use_mslp_anomaly     = 'yes'/'no'                      -> Apply MSLP anomaly to filter critical cyclones center. Default use_mslp_anomaly='yes'")
+	print("+ use_mslp_anomaly     = 'yes'/'no'/'climatology'        -> Apply MSLP anomaly to filter critical cyclones center. Default use_mslp_anomaly='yes'")
+	print("                                                            'climatology': the anomaly is computed from mslp_climatology_file and prev_days is not used")
+	print("+ mslp_climatology_file   = 'path'                       -> Only if use_mslp_anomaly='climatology'. NetCDF file with the MSLP climatology")
+	print("+ mslp_climatology_period = 'monthly'/'dayofyear'        -> Period of the MSLP climatology built with -bmc t. Default mslp_climatology_period='monthly'")
+	print("+ precompute_mslp_anomaly = 'yes'/'no'                   -> Pre-read the MSLP history of the averaging windows, split across all the MPI ranks, before tracking. Default precompute_mslp_anomaly='no'")
 	
 	
 	
@@ -1007,6 +1084,10 @@ def help():
 	
 	print("\nOther tracking parameters")
 	print("+ model_res            =  15                             -> Source data horizontal resolution in km")
+	print("+ extrema_window_km    =  750                            -> Size (in km) of the neighbourhood to search the MSLP minima. Default extrema_window_km=25*model_res (750 km with model_res=30)")
+	print("+ mslp_smoothing_km    =  0                              -> Scale (in km) of the Gaussian smoothing of the MSLP before searching the minima. Default mslp_smoothing_km=0 (no smoothing)")
+	print("+ wind_radii_thresholds=  [17,26,33]                     -> Wind speed thresholds (in m/s) of the quadrant wind radii written with the critical centers. Default wind_radii_thresholds=[] (not computed)")
+	print("+ candidate_stats      = 'yes'/'no'                      -> Write the MSLP minima and the candidates rejected by each criterion at every time step. Default candidate_stats='no'")
 	print("+ search_limits        = '[lonmin,latmin,lonmax,latmax]' -> Search limits")
 	print("+ search_region        = 'NA'                            -> Search Region for EC (TC)")
 	print("**EC (TC): Search region code and name")
@@ -1805,7 +1886,10 @@ def get_mslp_anomaly(idir="./",
 			source_file_date_format="",
 			custom_mslp_variable="",
 			custom_latitude_var="",
-			custom_longitude_var=""):
+			custom_longitude_var="",
+			climatology=None,
+			mslp_history_dir="",
+			calendar="366d"):
 
 
 	"""
@@ -1837,6 +1921,13 @@ def get_mslp_anomaly(idir="./",
 		The name of the latitude variable in the CUSTOM data files (default is an empty string).
 	custom_longitude_var : str
 		The name of the longitude variable in the CUSTOM data files (default is an empty string).
+	climatology : dict
+		Rolling MSLP climatology returned by init_mslp_climatology. If given, the previous fields are kept
+		between calls and only the files entering the window are read (default is None).
+	mslp_history_dir : str
+		Directory with the MSLP fields written by precompute_mslp_history. Only used with climatology (default is an empty string).
+	calendar : str
+		The calendar type (366d or 365d). With 365d, February 29 is skipped in the averaging window (default is 366d).
 
 	Returns
 	-------
@@ -1853,232 +1944,851 @@ def get_mslp_anomaly(idir="./",
 					hour_case_end=hour,
 					dt_h=24,
 					prev_days=prev_days,
-					previous_dates=True
+					previous_dates=True,
+					calendar=calendar
 					 )
 
 	dates=dates[:-1]
 	hours=hours[:-1]
 
-	if source.upper()=="ERA5":
-		previous_files=get_era5_files(dates=dates,hours=hours,era_file_prefix=source_filename_prefix,era_date_file_name=source_file_date_format)
-
-		mean_slp=0
-		for index in range(0,len(previous_files)):
-			varlist=get_era5_2dvar(idir=idir,erafile=previous_files[index],svariables=["msl"],search_limits=search_limits,search_region=search_region)
-			eramslp=varlist[2,:]/100
-			mean_slp=mean_slp+eramslp
-			
-	if source.upper()=="CUSTOM":
-		previous_files=get_custom_files(dates=dates,hours=hours,custom_file_prefix=source_filename_prefix,custom_date_file_name=source_file_date_format)
-		mean_slp=0
-		for index in range(0,len(previous_files)):
-			varlist=get_custom_2dvar(idir=idir,customfile=previous_files[index],svariables=[custom_mslp_variable],search_limits=search_limits,search_region=search_region, custom_latitude_var=custom_latitude_var, custom_longitude_var=custom_longitude_var)
-			sourcemslp=varlist[2,:]
-			
-			if len(str(int(sourcemslp.max())))>=5:
-				sourcemslp=sourcemslp/100
-		
-			mean_slp=mean_slp+sourcemslp
-			
-			
-	if source.upper()=="WRF":
-		previous_files=get_wrf_files(dates=dates,hours=hours,wrfprefix=source_filename_prefix)
-		mean_slp=0
-		for index in range(0,len(previous_files)):
-			#wrflat,wrflon,wrfmslp=get_wrf_mslp(idir=idir,wrffile=previous_files[index],variables=["PSFC","T2","PHB","PH"])
-			wrflat,wrflon,wrfmslp=get_wrf_mslp_new(idir=idir,wrffile=previous_files[index],variables=["PB","P","PHB","PH","T","QVAPOR"])
-			
-			
-			
-			mean_slp=mean_slp+wrfmslp
-
+	if climatology is not None:
+		mean_slp=update_mslp_climatology(climatology=climatology,
+						dates=dates,
+						hours=hours,
+						idir=idir,
+						source=source,
+						search_limits=search_limits,
+						search_region=search_region,
+						source_filename_prefix=source_filename_prefix,
+						source_file_date_format=source_file_date_format,
+						custom_mslp_variable=custom_mslp_variable,
+						custom_latitude_var=custom_latitude_var,
+						custom_longitude_var=custom_longitude_var,
+						mslp_history_dir=mslp_history_dir)
+		return mean_slp
+
+	previous_files=get_source_files(dates=dates,hours=hours,source=source,source_filename_prefix=source_filename_prefix,source_file_date_format=source_file_date_format)
+
+	mean_slp=0
+	for index in range(0,len(previous_files)):
+		sourcemslp=read_source_mslp(idir=idir,
+					sourcefile=previous_files[index],
+					source=source,
+					search_limits=search_limits,
+					search_region=search_region,
+					custom_mslp_variable=custom_mslp_variable,
+					custom_latitude_var=custom_latitude_var,
+					custom_longitude_var=custom_longitude_var)
+		mean_slp=mean_slp+sourcemslp
 
 	mean_slp=mean_slp/len(previous_files)
 
 	return mean_slp
 
 
-		
+def get_source_files(dates=[""],hours=[""],source="",source_filename_prefix="",source_file_date_format=""):
+	"""
+	Get the names of the surface files of a given source for a set of dates and hours.
 
-def get_era5_2dvar(idir="./",
-		erafile="",
-		svariables=[""],
-		search_limits=[None,None,None,None],
-		search_region=""):
-	
-	
+	Parameters
+	----------
+	dates : list of str
+		List of dates in the format "yyyymmdd".
+	hours : list of str
+		List of hours in the format "hh".
+	source : str
+		The source of the data (ERA5, WRF, or CUSTOM).
+	source_filename_prefix : str
+		The filename prefix for the data files (default is an empty string).
+	source_file_date_format : str
+		The date format of the data files (default is an empty string).
+
+	Returns
+	-------
+	list
+		List of file names.
 	"""
-	Reads ERA5 2D variables from a netCDF file and returns a numpy array
-	with the data. The function also applies a subregion of the data based
-	on the search_limits and search_region arguments.
+	if source.upper()=="ERA5":
+		source_files=get_era5_files(dates=dates,hours=hours,era_file_prefix=source_filename_prefix,era_date_file_name=source_file_date_format)
+	elif source.upper()=="CUSTOM":
+		source_files=get_custom_files(dates=dates,hours=hours,custom_file_prefix=source_filename_prefix,custom_date_file_name=source_file_date_format)
+	elif source.upper()=="WRF":
+		source_files=get_wrf_files(dates=dates,hours=hours,wrfprefix=source_filename_prefix)
+	return source_files
+
+
+def read_source_mslp(idir="./",
+			sourcefile="",
+			source="",
+			search_limits=[None,None,None,None],
+			search_region="",
+			custom_mslp_variable="",
+			custom_latitude_var="",
+			custom_longitude_var="",
+			coords=False):
+	"""
+	Read the mean sea level pressure (hPa) from an ERA5, CUSTOM or WRF surface file.
 
 	Parameters
 	----------
 	idir : str
-		Directory where the ERA5 netCDF file is located.
-	erafile : str
-		Name of the ERA5 netCDF file.
-	svariables : list of str
-		List of variables to be read from the netCDF file.
+		Directory path to the data files (default is the current working directory).
+	sourcefile : str
+		Name of the file to read.
+	source : str
+		The source of the data (ERA5, WRF, or CUSTOM).
 	search_limits : list of float
-		Search limits for subregion (lonmin,lonmax,latmin,latmax).
+		The limits of the search region (default is [None, None, None, None]).
 	search_region : str
-		Region for subregion (e.g. "NA" for North Atlantic).
+		The name of the search region (default is an empty string).
+	custom_mslp_variable : str
+		The name of the MSLP variable in the CUSTOM data files (default is an empty string).
+	custom_latitude_var : str
+		The name of the latitude variable in the CUSTOM data files (default is an empty string).
+	custom_longitude_var : str
+		The name of the longitude variable in the CUSTOM data files (default is an empty string).
+	coords : bool
+		Whether to also return the latitudes and longitudes of the grid (default is False).
 
 	Returns
 	-------
-	varlist : numpy array
-		Array with the variables read from the netCDF file.
+	numpy.ndarray
+		Mean sea level pressure in hPa. If coords is True, a tuple with the latitudes, longitudes and MSLP.
 	"""
-	ncera=Dataset(idir+"/"+erafile)
-	eralat=ncera.variables["latitude"][:]
-	eralon=ncera.variables["longitude"][:]
+	if source.upper()=="ERA5":
+		varlist=get_era5_2dvar(idir=idir,erafile=sourcefile,svariables=["msl"],search_limits=search_limits,search_region=search_region)
+		sourcelat=varlist[0,:]
+		sourcelon=varlist[1,:]
+		sourcemslp=varlist[2,:]/100
 
+	elif source.upper()=="CUSTOM":
+		varlist=get_custom_2dvar(idir=idir,customfile=sourcefile,svariables=[custom_mslp_variable],search_limits=search_limits,search_region=search_region, custom_latitude_var=custom_latitude_var, custom_longitude_var=custom_longitude_var)
+		sourcelat=varlist[0,:]
+		sourcelon=varlist[1,:]
+		sourcemslp=varlist[2,:]
 
+		if len(str(int(sourcemslp.max())))>=5:
+			sourcemslp=sourcemslp/100
 
+	elif source.upper()=="WRF":
+		#wrflat,wrflon,sourcemslp=get_wrf_mslp(idir=idir,wrffile=sourcefile,variables=["PSFC","T2","PHB","PH"])
+		sourcelat,sourcelon,sourcemslp=get_wrf_mslp_new(idir=idir,wrffile=sourcefile,variables=["PB","P","PHB","PH","T","QVAPOR"])
 
-	for var in svariables:
-		vars()[var]=ncera.variables[var][:]
-		if len(vars()[var].shape)>2:
-			vars()[var]=vars()[var][0,:]
-	
-	if search_region.upper() in ("NA","SA","AL","MS"):
-		for i in range(0,len(svariables)):
-			vars()[svariables[i]],nlon=convert_era5_matrix(vars()[svariables[i]],eralon,search_lon=180)
+	if coords:
+		return sourcelat,sourcelon,sourcemslp
+	return sourcemslp
 
-	else:
-		nlon=np.copy(eralon)
 
+def init_mslp_climatology():
+	"""
+	Create an empty rolling MSLP climatology.
 
+	The climatology keeps, for each hour of the day, a buffer with the daily MSLP fields of the averaging
+	window and their running sum. Moving the window one day forward only adds the newest field and
+	subtracts the oldest one, so each surface file is read once per rank.
 
-	if search_region.upper() in ("NA","SA","AL","MS"):
-		for i in range(0,len(nlon)):
-			if nlon[i]>=180:
-				nlon[i]=nlon[i]-360
-	
-	if len(nlon.shape):
-		nlon,eralat=np.meshgrid(nlon,eralat)
+	Returns
+	-------
+	dict
+		Empty climatology to be passed to get_mslp_anomaly and add_mslp_climatology_field.
+	"""
+	return {}
 
-	for i in range(0,len(svariables)):
-		nera_lat,nera_lon, vars()["n"+svariables[i]]= era_subregion(lat=eralat,lon=nlon,var=vars()[svariables[i]],search_limits=search_limits)
 
-	
-	varlist=np.empty((len(svariables)+2,nera_lat.shape[0],nera_lat.shape[1]))
-	varlist[0,:]=nera_lat
-	varlist[1,:]=nera_lon
-	ncera.close()	
-	for i in range(0,len(svariables)):
-		varlist[i+2,:]=vars()["n"+svariables[i]]
-	return varlist 
+def add_mslp_climatology_field(climatology=None,date="",hour="",mslp=np.array([None])):
+	"""
+	Store an already read MSLP field in the rolling climatology, so it is not read again when it enters
+	the averaging window of a later time step.
 
+	Parameters
+	----------
+	climatology : dict
+		Rolling MSLP climatology returned by init_mslp_climatology.
+	date : str
+		The date of the field in the format "yyyymmdd".
+	hour : str
+		The hour of the field in the format "hh".
+	mslp : numpy.ndarray
+		Mean sea level pressure field in hPa.
+	"""
+	if hour not in climatology:
+		climatology[hour]={"fields":{},"window":[],"sum":0}
+	climatology[hour]["fields"][date]=np.copy(mslp)
 
 
-def get_custom_2dvar(idir="./",
-		customfile="",
-		svariables=[""],
-		search_limits=[None,None,None,None],
-		search_region="",
-		custom_latitude_var="latitude", 
-		custom_longitude_var="longitude"):
-	
-	
-	nc=Dataset(idir+"/"+customfile)
-	customlat=nc.variables[custom_latitude_var][:]
-	customlon=nc.variables[custom_longitude_var][:]
+def update_mslp_climatology(climatology=None,
+			dates=[""],
+			hours=[""],
+			idir="./",
+			source="",
+			search_limits=[None,None,None,None],
+			search_region="",
+			source_filename_prefix="",
+			source_file_date_format="",
+			custom_mslp_variable="",
+			custom_latitude_var="",
+			custom_longitude_var="",
+			mslp_history_dir=""):
+	"""
+	Move the averaging window of the rolling MSLP climatology to a new set of dates and return the mean MSLP.
 
+	Parameters
+	----------
+	climatology : dict
+		Rolling MSLP climatology returned by init_mslp_climatology.
+	dates : list of str
+		Dates of the averaging window in the format "yyyymmdd", all at the same hour of the day.
+	hours : list of str
+		Hours of the averaging window in the format "hh".
+	idir : str
+		Directory path to the data files (default is the current working directory).
+	source : str
+		The source of the data (ERA5, WRF, or CUSTOM).
+	search_limits : list of float
+		The limits of the search region (default is [None, None, None, None]).
+	search_region : str
+		The name of the search region (default is an empty string).
+	source_filename_prefix : str
+		The filename prefix for the data files (default is an empty string).
+	source_file_date_format : str
+		The date format of the data files (default is an empty string).
+	custom_mslp_variable : str
+		The name of the MSLP variable in the CUSTOM data files (default is an empty string).
+	custom_latitude_var : str
+		The name of the latitude variable in the CUSTOM data files (default is an empty string).
+	custom_longitude_var : str
+		The name of the longitude variable in the CUSTOM data files (default is an empty string).
+	mslp_history_dir : str
+		Directory with the MSLP fields written by precompute_mslp_history. Fields found there are loaded
+		instead of reading the source files (default is an empty string).
 
-	# for var in svariables:
-	# 	print(var)
-	# 	vars()[var]=nc.variables[var][:]
- #
-	# 	print(vars()[var])
- #
-	# 	if len(vars()[var].shape)>2:
-	# 		vars()[var]=vars()[var][0,:]
-	
-	data = {}
+	Returns
+	-------
+	numpy.ndarray
+		Mean sea level pressure over the averaging window.
+	"""
+	hour=hours[0]
+	if hour not in climatology:
+		climatology[hour]={"fields":{},"window":[],"sum":0}
+	buffer=climatology[hour]
 
-	for var in svariables:
-		#print(f"Processing: {var}")
+	for wdate in list(buffer["window"]):
+		if wdate not in dates:
+			buffer["sum"]=buffer["sum"]-buffer["fields"][wdate]
+			buffer["window"].remove(wdate)
 
-		# Store the data in the dictionary instead of vars()
-		data[var] = nc.variables[var][:]
+	for wdate in list(buffer["fields"].keys()):
+		if wdate<dates[0]:
+			del buffer["fields"][wdate]
 
-		# Handle dimensions (e.g., removing 'expver' dimension if it exists)
-		if len(data[var].shape) > 2:
-			data[var] = data[var][0, :]
-	#if len(customlon.shape)>1:
-		#checklon=customlon[0,:]
-	#else:
-		#checklon=np.copy(customlon)
-	
-	#if search_region.upper() in ("NA","SA","AL","MS"):
-		#for i in range(0,len(svariables)):
-			#vars()[svariables[i]],nlon=convert_era5_matrix(vars()[svariables[i]],checklon,search_lon=180)
+	for index in range(0,len(dates)):
+		if dates[index] in buffer["window"]:
+			continue
+		history_file=mslp_history_dir+"/mslp_"+dates[index]+hours[index]+".npy"
+		if dates[index] not in buffer["fields"] and mslp_history_dir!="" and os.path.exists(history_file):
+			buffer["fields"][dates[index]]=np.load(history_file)
+		if dates[index] not in buffer["fields"]:
+			sourcefile=get_source_files(dates=[dates[index]],hours=[hours[index]],source=source,source_filename_prefix=source_filename_prefix,source_file_date_format=source_file_date_format)[0]
+			buffer["fields"][dates[index]]=read_source_mslp(idir=idir,
+									sourcefile=sourcefile,
+									source=source,
+									search_limits=search_limits,
+									search_region=search_region,
+									custom_mslp_variable=custom_mslp_variable,
+									custom_latitude_var=custom_latitude_var,
+									custom_longitude_var=custom_longitude_var)
+		buffer["sum"]=buffer["sum"]+buffer["fields"][dates[index]]
+		buffer["window"].append(dates[index])
 
-	#else:
-		#nlon=np.copy(customlon)
-	
-	
-	if len(customlon.shape):
-		nlon,customlat=np.meshgrid(customlon,customlat)
-		
-		
-	#if search_region.upper() in ("NA","SA","AL","MS"):
-	for i in range(0,nlon.shape[0]):
-		for j in range(0, nlon.shape[1]):
-			if nlon[i,j]>=180:
-				nlon[i,j]=nlon[i,j]-360	
+	mean_slp=buffer["sum"]/len(dates)
 
-	#for i in range(0,len(svariables)):
-		#ncust_lat,ncust_lon, vars()["n"+svariables[i]]= era_subregion(lat=customlat,lon=nlon,var=vars()[svariables[i]],search_limits=search_limits)
+	return mean_slp
 
-	
-	varlist=np.empty((len(svariables)+2,customlat.shape[0],customlat.shape[1]))
-	varlist[0,:]=customlat
-	varlist[1,:]=nlon
-	nc.close()	
-	for i in range(0,len(svariables)):
-		varlist[i+2,:]= data[svariables[i]] #vars()[svariables[i]]
-	return varlist 
 
+def get_mslp_history_dates(dates=[""],hours=[""],prev_days=14,calendar="366d"):
+	"""
+	Get the dates entering the MSLP averaging window of any of the given time steps.
 
+	The window of each time step is built as in get_mslp_anomaly, so February 29 is skipped with the 365d calendar.
 
+	Parameters
+	----------
+	dates : list of str
+		Dates of the time steps to be tracked in the format "yyyymmdd".
+	hours : list of str
+		Hours of the time steps to be tracked in the format "hh".
+	prev_days : int
+		The number of previous days to consider for the MSLP anomaly (default is 14).
+	calendar : str
+		The calendar type (366d or 365d) (default is 366d).
 
-def get_cumstom_hgt_data(filename, varname):
+	Returns
+	-------
+	tuple
+		Sorted dates and hours of the MSLP history.
+	"""
+	history=[]
+	for tdate in sorted(set([dates[index]+hours[index] for index in range(0,len(dates))])):
+		wdates,whours=get_dates_vectors(year_case_init=tdate[0:4],
+						month_case_init=tdate[4:6],
+						day_case_init=tdate[6:8],
+						hour_case_init=tdate[8:10],
+						year_case_end=tdate[0:4],
+						month_case_end=tdate[4:6],
+						day_case_end=tdate[6:8],
+						hour_case_end=tdate[8:10],
+						dt_h=24,
+						prev_days=prev_days,
+						previous_dates=True,
+						calendar=calendar
+						)
+		for index in range(0,len(wdates)-1):
+			history.append(wdates[index]+whours[index])
+	history=sorted(set(history))
+
+	history_dates=[hdate[0:8] for hdate in history]
+	history_hours=[hdate[8:10] for hdate in history]
+	return history_dates,history_hours
+
+
+def precompute_mslp_history(idir="./",
+			source="",
+			dates=[""],
+			hours=[""],
+			tmpdir="./",
+			rank=0,
+			mpisize=1,
+			search_limits=[None,None,None,None],
+			search_region="",
+			source_filename_prefix="",
+			source_file_date_format="",
+			custom_mslp_variable="",
+			custom_latitude_var="",
+			custom_longitude_var=""):
 	"""
-	Reads a custom 2D variable from a netCDF file and returns a numpy array
-	with the data.
+	Read the MSLP history files across all the MPI ranks and save them in tmpdir as mslp_<yyyymmddhh>.npy.
+
+	The history dates are split in contiguous blocks between ranks, so that each history file is read by only one
+	rank in the pre-pass. Afterwards, the rolling climatology of each rank loads the fields of its own time block
+	from tmpdir instead of decoding the source files again. The file of the time step being tracked is still read
+	by the tracking step itself.
 
 	Parameters
 	----------
-	filename : str
-		Name of the netCDF file.
-	varname : str
-		Name of the variable to be read from the netCDF file.
+	idir : str
+		Directory path to the data files (default is the current working directory).
+	source : str
+		The source of the data (ERA5, WRF, or CUSTOM).
+	dates : list of str
+		Dates of the MSLP history in the format "yyyymmdd".
+	hours : list of str
+		Hours of the MSLP history in the format "hh".
+	tmpdir : str
+		Directory path to the temporary files (default is the current working directory).
+	rank : int
+		Rank of the process (default is 0).
+	mpisize : int
+		Number of MPI processes (default is 1).
+	search_limits : list of float
+		The limits of the search region (default is [None, None, None, None]).
+	search_region : str
+		The name of the search region (default is an empty string).
+	source_filename_prefix : str
+		The filename prefix for the data files (default is an empty string).
+	source_file_date_format : str
+		The date format of the data files (default is an empty string).
+	custom_mslp_variable : str
+		The name of the MSLP variable in the CUSTOM data files (default is an empty string).
+	custom_latitude_var : str
+		The name of the latitude variable in the CUSTOM data files (default is an empty string).
+	custom_longitude_var : str
+		The name of the longitude variable in the CUSTOM data files (default is an empty string).
 
 	Returns
 	-------
-	hgt : numpy array
-		Array with the data read from the netCDF file.
+	None
 	"""
-	cnc=Dataset(filename)
-	
-	hgt=cnc.variables[varname][:]
-	
-	if len(hgt.shape)>2:
-		hgt=hgt[0,:]
+	count = len(dates) // mpisize
+	remainder = len(dates) % mpisize
+	if rank < remainder:
+		start = rank * (count + 1)
+		stop = start + count + 1
+	else:
+		start = rank * count + remainder
+		stop = start + count
 
+	nproc_dates=dates[start:stop]
+	nproc_hours=hours[start:stop]
+	nproc_files=get_source_files(dates=nproc_dates,hours=nproc_hours,source=source,source_filename_prefix=source_filename_prefix,source_file_date_format=source_file_date_format)
 
-	return hgt
+	for index in range(0,len(nproc_files)):
+		sourcemslp=read_source_mslp(idir=idir,
+					sourcefile=nproc_files[index],
+					source=source,
+					search_limits=search_limits,
+					search_region=search_region,
+					custom_mslp_variable=custom_mslp_variable,
+					custom_latitude_var=custom_latitude_var,
+					custom_longitude_var=custom_longitude_var)
+		np.save(tmpdir+"/mslp_"+nproc_dates[index]+nproc_hours[index]+".npy",np.asarray(sourcemslp))
 
 
-def get_era5_3dvar(idir="./",
-		erafile="",
-		svariable="",
-		varlevel="level",
-		search_limits=[None,None,None,None],
-		search_region="",
+def get_mslp_climatology_index(date="",mslp_climatology_period="monthly"):
+	"""
+	Get the position of a date in a monthly or day-of-year MSLP climatology.
+
+	Parameters
+	----------
+	date : str
+		The date in the format "yyyymmdd".
+	mslp_climatology_period : str
+		Period of the climatology ('monthly' / 'dayofyear'). Default is 'monthly'.
+
+	Returns
+	-------
+	int
+		Month (0-11) or day of year (0-365, always counting February 29) of the date.
+	"""
+	if mslp_climatology_period.lower()=="dayofyear":
+		index=(datetime(2000,int(date[4:6]),int(date[6:8]))-datetime(2000,1,1)).days
+	else:
+		index=int(date[4:6])-1
+	return index
+
+
+def accumulate_mslp_climatology(idir="./",
+			source="",
+			sourcefiles=[""],
+			dates=[""],
+			search_limits=[None,None,None,None],
+			search_region="",
+			custom_mslp_variable="",
+			custom_latitude_var="",
+			custom_longitude_var="",
+			mslp_climatology_period="monthly",
+			verbose=False):
+	"""
+	Accumulate the MSLP of a set of surface files by month or day of year in one streaming pass.
+
+	Parameters
+	----------
+	idir : str
+		Directory path to the data files (default is the current working directory).
+	source : str
+		The source of the data (ERA5, WRF, or CUSTOM).
+	sourcefiles : list of str
+		Names of the surface files.
+	dates : list of str
+		Dates of the surface files in the format "yyyymmdd".
+	search_limits : list of float
+		The limits of the search region (default is [None, None, None, None]).
+	search_region : str
+		The name of the search region (default is an empty string).
+	custom_mslp_variable : str
+		The name of the MSLP variable in the CUSTOM data files (default is an empty string).
+	custom_latitude_var : str
+		The name of the latitude variable in the CUSTOM data files (default is an empty string).
+	custom_longitude_var : str
+		The name of the longitude variable in the CUSTOM data files (default is an empty string).
+	mslp_climatology_period : str
+		Period of the climatology ('monthly' / 'dayofyear'). Default is 'monthly'.
+	verbose : bool
+		Whether to print the processed files (default is False).
+
+	Returns
+	-------
+	tuple
+		Latitudes, longitudes, sum of the MSLP (hPa) and number of fields for each period.
+	"""
+	if mslp_climatology_period.lower()=="dayofyear":
+		nperiods=366
+	else:
+		nperiods=12
+
+	lats=None
+	lons=None
+	mslp_sum=None
+	mslp_count=np.zeros(nperiods)
+	for index in range(0,len(sourcefiles)):
+		if verbose:
+			print("   ---> | Processing "+source.upper()+ ": "+idir+"/"+sourcefiles[index])
+		sourcelat,sourcelon,sourcemslp=read_source_mslp(idir=idir,
+						sourcefile=sourcefiles[index],
+						source=source,
+						search_limits=search_limits,
+						search_region=search_region,
+						custom_mslp_variable=custom_mslp_variable,
+						custom_latitude_var=custom_latitude_var,
+						custom_longitude_var=custom_longitude_var,
+						coords=True)
+		if mslp_sum is None:
+			lats=np.asarray(sourcelat)
+			lons=np.asarray(sourcelon)
+			mslp_sum=np.zeros((nperiods,sourcemslp.shape[0],sourcemslp.shape[1]))
+
+		iperiod=get_mslp_climatology_index(date=dates[index],mslp_climatology_period=mslp_climatology_period)
+		mslp_sum[iperiod,:]=mslp_sum[iperiod,:]+sourcemslp
+		mslp_count[iperiod]=mslp_count[iperiod]+1
+
+	return lats,lons,mslp_sum,mslp_count
+
+
+def write_mslp_climatology(filename="",lats=np.array([None]),lons=np.array([None]),mslp_sum=np.array([None]),mslp_count=np.array([None]),mslp_climatology_period="monthly"):
+	"""
+	Write a monthly or day-of-year MSLP climatology to a netCDF file.
+
+	Parameters
+	----------
+	filename : str
+		Name of the output netCDF file.
+	lats : numpy.ndarray
+		2D latitudes of the grid.
+	lons : numpy.ndarray
+		2D longitudes of the grid.
+	mslp_sum : numpy.ndarray
+		Sum of the MSLP (hPa) for each period.
+	mslp_count : numpy.ndarray
+		Number of fields accumulated for each period.
+	mslp_climatology_period : str
+		Period of the climatology ('monthly' / 'dayofyear'). Default is 'monthly'.
+	"""
+	mslp_mean=np.empty_like(mslp_sum)
+	mslp_mean[:]=np.nan
+	for iperiod in range(0,len(mslp_count)):
+		if mslp_count[iperiod]>0:
+			mslp_mean[iperiod,:]=mslp_sum[iperiod,:]/mslp_count[iperiod]
+
+	ncfile=Dataset(filename,"w")
+	ncfile.description=program_name()+" MSLP climatology"
+	ncfile.period=mslp_climatology_period.lower()
+	ncfile.createDimension("period",mslp_sum.shape[0])
+	ncfile.createDimension("y",mslp_sum.shape[1])
+	ncfile.createDimension("x",mslp_sum.shape[2])
+
+	varlat=ncfile.createVariable("latitude","f8",("y","x"))
+	varlat[:]=lats
+	varlon=ncfile.createVariable("longitude","f8",("y","x"))
+	varlon[:]=lons
+	varcount=ncfile.createVariable("count","i4",("period",))
+	varcount[:]=mslp_count
+	varmslp=ncfile.createVariable("msl","f8",("period","y","x"))
+	varmslp.units="hPa"
+	varmslp[:]=mslp_mean
+	ncfile.close()
+
+
+def read_mslp_climatology(filename="",date="",climatology=None,lats=None,lons=None):
+	"""
+	Read the MSLP climatology of a given date from a file written by write_mslp_climatology.
+
+	Parameters
+	----------
+	filename : str
+		Name of the netCDF climatology file.
+	date : str
+		The date in the format "yyyymmdd".
+	climatology : dict
+		Cache of the periods already read. If given, each period is read only once, and the file
+		is not opened again for a period in the cache (default is None).
+	lats : numpy.ndarray
+		2D latitudes of the data grid. If given with lons, the grid of the file must match it (default is None).
+	lons : numpy.ndarray
+		2D longitudes of the data grid (default is None).
+
+	Returns
+	-------
+	numpy.ndarray
+		Mean sea level pressure climatology in hPa.
+	"""
+	if climatology is None:
+		climatology={}
+
+	if "period" in climatology:
+		iperiod=get_mslp_climatology_index(date=date,mslp_climatology_period=climatology["period"])
+		if iperiod in climatology:
+			return climatology[iperiod]
+
+	ncfile=Dataset(filename)
+	climatology["period"]=ncfile.period
+	if lats is not None and lons is not None:
+		clim_lats=np.asarray(ncfile.variables["latitude"][:])
+		clim_lons=np.asarray(ncfile.variables["longitude"][:])
+		if clim_lats.shape!=np.shape(lats) or not (np.allclose(clim_lats,lats) and np.allclose(normalize_longitudes(clim_lons),normalize_longitudes(lons))):
+			ncfile.close()
+			print_error_message("The grid of the MSLP climatology "+filename+" does not match the grid of the input data\n"+program_name()+" Exit")
+
+	iperiod=get_mslp_climatology_index(date=date,mslp_climatology_period=ncfile.period)
+	if ncfile.variables["count"][iperiod]<=0:
+		ncfile.close()
+		print_error_message("The MSLP climatology "+filename+" has no data for "+date+"\n"+program_name()+" Exit")
+	climatology[iperiod]=np.asarray(ncfile.variables["msl"][iperiod,:])
+	ncfile.close()
+
+	return climatology[iperiod]
+
+
+		
+
+def get_era5_2dvar(idir="./",
+		erafile="",
+		svariables=[""],
+		search_limits=[None,None,None,None],
+		search_region=""):
+	
+	
+	"""
+	Reads ERA5 2D variables from a netCDF file and returns a numpy array
+	with the data. Only the subregion defined by the search_limits and
+	search_region arguments is read from the file.
+
+	Parameters
+	----------
+	idir : str
+		Directory where the ERA5 netCDF file is located.
+	erafile : str
+		Name of the ERA5 netCDF file.
+	svariables : list of str
+		List of variables to be read from the netCDF file.
+	search_limits : list of float
+		Search limits for subregion (lonmin,lonmax,latmin,latmax).
+	search_region : str
+		Region for subregion (e.g. "NA" for North Atlantic).
+
+	Returns
+	-------
+	varlist : numpy array
+		Array with the variables read from the netCDF file.
+	"""
+	ncera=Dataset(idir+"/"+erafile)
+	eralat=ncera.variables["latitude"][:]
+	eralon=ncera.variables["longitude"][:]
+
+	window=get_subregion_window(lat=eralat,lon=eralon,search_limits=search_limits,wrap_lon=search_region.upper() in ("NA","SA","AL","MS"))
+
+	varlist=np.empty((len(svariables)+2,window["lats"].shape[0],window["lats"].shape[1]))
+	varlist[0,:]=window["lats"]
+	varlist[1,:]=window["lons"]
+	for i in range(0,len(svariables)):
+		varlist[i+2,:]=read_subregion(ncvar=ncera.variables[svariables[i]],window=window)
+	ncera.close()	
+	return varlist 
+
+
+
+def get_custom_2dvar(idir="./",
+		customfile="",
+		svariables=[""],
+		search_limits=[None,None,None,None],
+		search_region="",
+		custom_latitude_var="latitude", 
+		custom_longitude_var="longitude"):
+	
+	"""
+	Reads CUSTOM 2D variables from a netCDF file and returns a numpy array
+	with the data. For regular latitude-longitude grids, only the subregion
+	defined by search_limits is read from the file. Longitudes are returned
+	between -180 and 180.
+
+	Parameters
+	----------
+	idir : str
+		Directory where the CUSTOM netCDF file is located.
+	customfile : str
+		Name of the CUSTOM netCDF file.
+	svariables : list of str
+		List of variables to be read from the netCDF file.
+	search_limits : list of float
+		Search limits for subregion (lonmin,latmin,lonmax,latmax).
+	search_region : str
+		Region for subregion (e.g. "NA" for North Atlantic).
+	custom_latitude_var : str
+		Name of the latitude variable.
+	custom_longitude_var : str
+		Name of the longitude variable.
+
+	Returns
+	-------
+	varlist : numpy array
+		Array with the variables read from the netCDF file.
+	"""
+	nc=Dataset(idir+"/"+customfile)
+	customlat=nc.variables[custom_latitude_var][:]
+	customlon=nc.variables[custom_longitude_var][:]
+
+	if len(customlon.shape)==1 and search_limits[0]!=None:
+		window=get_subregion_window(lat=customlat,lon=customlon,search_limits=search_limits,wrap_lon=True)
+
+		varlist=np.empty((len(svariables)+2,window["lats"].shape[0],window["lats"].shape[1]))
+		varlist[0,:]=window["lats"]
+		varlist[1,:]=window["lons"]
+		for i in range(0,len(svariables)):
+			varlist[i+2,:]=read_subregion(ncvar=nc.variables[svariables[i]],window=window)
+		nc.close()
+		return varlist
+
+	data = {}
+
+	for var in svariables:
+		data[var] = nc.variables[var][:]
+
+		# Handle dimensions (e.g., removing 'expver' dimension if it exists)
+		if len(data[var].shape) > 2:
+			data[var] = data[var][0, :]
+
+	if len(customlon.shape)==1:
+		nlon,customlat=np.meshgrid(customlon,customlat)
+	else:
+		nlon=np.copy(customlon)
+	
+	nlon[nlon>=180]=nlon[nlon>=180]-360
+
+	varlist=np.empty((len(svariables)+2,customlat.shape[0],customlat.shape[1]))
+	varlist[0,:]=customlat
+	varlist[1,:]=nlon
+	nc.close()	
+	for i in range(0,len(svariables)):
+		varlist[i+2,:]= data[svariables[i]]
+	return varlist
+
+
+_subregion_windows={}
+
+def get_subregion_window(lat=np.array(None),lon=np.array(None),search_limits=[None,None,None,None],wrap_lon=False):
+	"""
+	Get the index window of a regular latitude-longitude grid covering the search limits.
+
+	Longitudes are selected eastwards from lonmin, so a box crossing the edge of the grid
+	(the Greenwich or the dateline meridian) is read as two slices. Windows are computed
+	once per grid and search limits.
+
+	Parameters
+	----------
+	lat : numpy array
+		1D latitudes of the grid.
+	lon : numpy array
+		1D longitudes of the grid.
+	search_limits : list
+		Limits of the region [lonmin,latmin,lonmax,latmax].
+	wrap_lon : bool
+		If True, the longitudes of the window are returned between -180 and 180.
+
+	Returns
+	-------
+	dict
+		Window with the latitude slice ("lat_slice"), the list of longitude slices ("lon_slices")
+		and the 2D latitudes ("lats") and longitudes ("lons") of the subregion.
+	"""
+	lat=np.asarray(lat)
+	lon=np.asarray(lon)
+	key=(lat.shape[0],float(lat[0]),float(lat[-1]),lon.shape[0],float(lon[0]),float(lon[-1]),tuple(search_limits),wrap_lon)
+	if key in _subregion_windows:
+		return _subregion_windows[key]
+
+	lonmin=search_limits[0]
+	latmin=search_limits[1]
+	lonmax=search_limits[2]
+	latmax=search_limits[3]
+
+	rows=np.where((lat>=latmin)&(lat<=latmax))[0]
+	lat_slice=slice(int(rows[0]),int(rows[-1])+1)
+
+	east=(lon-lonmin)%360
+	columns=np.where(east<=lonmax-lonmin)[0]
+	columns=columns[np.argsort(east[columns],kind="stable")]
+
+	breaks=np.where(np.diff(columns)!=1)[0]+1
+	lon_slices=[]
+	for run in np.split(columns,breaks):
+		lon_slices.append(slice(int(run[0]),int(run[-1])+1))
+
+	nlon=lon[columns].astype(float)
+	if wrap_lon:
+		nlon[nlon>=180]=nlon[nlon>=180]-360
+	nlon,nlat=np.meshgrid(nlon,lat[lat_slice].astype(float))
+
+	window={"lat_slice":lat_slice,"lon_slices":lon_slices,"lats":nlat,"lons":nlon}
+	_subregion_windows[key]=window
+	return window
+
+
+def read_subregion(ncvar=None,window=None):
+	"""
+	Read the subregion of a 2D netCDF variable defined by get_subregion_window.
+
+	Parameters
+	----------
+	ncvar : netCDF4.Variable
+		Variable to read. Extra leading dimensions (e.g. time) are read at index 0.
+	window : dict
+		Window returned by get_subregion_window.
+
+	Returns
+	-------
+	numpy array
+		2D array with the variable over the subregion.
+	"""
+	lead=(0,)*(len(ncvar.shape)-2)
+	parts=[]
+	for lon_slice in window["lon_slices"]:
+		parts.append(ncvar[lead+(window["lat_slice"],lon_slice)])
+	if len(parts)==1:
+		return parts[0]
+	return np.ma.concatenate(parts,axis=-1)
+
+
+def get_cumstom_hgt_data(filename, varname, varlat="", varlon="", search_limits=[None,None,None,None]):
+	"""
+	Reads a custom 2D variable from a netCDF file and returns a numpy array
+	with the data.
+
+	Parameters
+	----------
+	filename : str
+		Name of the netCDF file.
+	varname : str
+		Name of the variable to be read from the netCDF file.
+	varlat : str
+		Name of the latitude variable. If search_limits is given, only the subregion read by
+		get_custom_2dvar is returned. If the file has no variable with this name, the 1-D
+		coordinate variables of the dimensions of varname are used.
+	varlon : str
+		Name of the longitude variable.
+	search_limits : list of float
+		Search limits for subregion (lonmin,latmin,lonmax,latmax).
+
+	Returns
+	-------
+	hgt : numpy array
+		Array with the data read from the netCDF file.
+	"""
+	cnc=Dataset(filename)
+
+	# coordinates of the terrain file, with the names of the data files or the names of its own dimensions
+	if varlat not in cnc.variables or varlon not in cnc.variables:
+		varlat,varlon=cnc.variables[varname].dimensions[-2:]
+
+	if search_limits[0]!=None and varlat in cnc.variables and varlon in cnc.variables and len(cnc.variables[varlon].shape)==1:
+		window=get_subregion_window(lat=cnc.variables[varlat][:],lon=cnc.variables[varlon][:],search_limits=search_limits,wrap_lon=True)
+		hgt=read_subregion(ncvar=cnc.variables[varname],window=window)
+		cnc.close()
+		return hgt
+
+	hgt=cnc.variables[varname][:]
+	cnc.close()
+	
+	if len(hgt.shape)>2:
+		hgt=hgt[0,:]
+
+
+	return hgt
+
+
+def get_era5_3dvar(idir="./",
+		erafile="",
+		svariable="",
+		varlevel="level",
+		search_limits=[None,None,None,None],
+		search_region="",
 		fdate="",
 		full=False,
 		dims=False
@@ -2519,17 +3229,151 @@ def era_subregion(lat=np.array(None),lon=np.array(None),var="",search_limits=[No
 			r=m[:,l].sum()
 			break
 
-	nlon=lon[l1&l2].reshape(r,c)
-	nlat=lat[l1&l2].reshape(r,c)
-	nvar=var[l1&l2].reshape(r,c)
+	nlon=lon[l1&l2].reshape(r,c)
+	nlat=lat[l1&l2].reshape(r,c)
+	nvar=var[l1&l2].reshape(r,c)
+
+
+	return nlat,nlon,nvar
+
+
+		
+
+def get_source_fields(idir="./",
+		sourcefile="",
+		source="",
+		varmslp="",
+		varu="",
+		varv="",
+		varlat="",
+		varlon="",
+		search_limits=[None,None,None,None],
+		search_region="",
+		lazy_winds=False):
+
+	"""
+	Read all the surface fields needed for one time step from a single opening of the source file.
+
+	Parameters
+	----------
+	idir : str
+		Directory path to the source file (default is the current working directory).
+	sourcefile : str
+		Name of the WRF, ERA5 or CUSTOM file to read.
+	source : str
+		Source of the data (WRF, ERA5 or CUSTOM).
+	varmslp : str
+		Name of the mean sea level pressure variable. Not used for WRF, where the MSLP is computed from the 3D fields.
+	varu : str
+		Name of the u-wind variable.
+	varv : str
+		Name of the v-wind variable.
+	varlat : str
+		Name of the latitude variable.
+	varlon : str
+		Name of the longitude variable.
+	search_limits : list of float
+		The limits of the search region (default is [None, None, None, None]).
+	search_region : str
+		The name of the search region (default is an empty string).
+	lazy_winds : bool
+		If True, only the coordinates and the MSLP are read. The winds are read from the source file
+		the first time they are requested with get_field (default is False).
+
+	Returns
+	-------
+	dict
+		Dictionary with the 2D fields "lats", "lons", "mslp" (hPa), "u", "v" and "ff" (wind speed)
+		shared by all the detection stages of the time step, and the arguments needed to read the
+		winds again under "reader".
+	"""
+	svariables=[varmslp] if lazy_winds else [varmslp,varu,varv]
+
+	if source.upper()=="ERA5":
+		varlist=get_era5_2dvar(idir=idir,erafile=sourcefile,svariables=svariables,search_limits=search_limits,search_region=search_region)
+		lats=varlist[0,:]
+		lons=varlist[1,:]
+		mslp=varlist[2,:]/100
 
+	elif source.upper()=="CUSTOM":
+		varlist=get_custom_2dvar(idir=idir,customfile=sourcefile,svariables=svariables,search_limits=search_limits,search_region=search_region, custom_latitude_var=varlat, custom_longitude_var=varlon)
+		lats=varlist[0,:]
+		lons=varlist[1,:]
+		mslp=varlist[2,:]
 
-	return nlat,nlon,nvar
+		if len(str(int(mslp.max())))>=5:
+			mslp=mslp/100
 
+	elif source.upper()=="WRF":
+		ncwrffile=Dataset(idir+"/"+sourcefile)
+		lats=ncwrffile.variables[varlat][0,:]
+		lons=ncwrffile.variables[varlon][0,:]
+		TBASE=ncwrffile.variables["T00"][0]
+
+		wrfvars={}
+		for var in ["PB","P","PHB","PH","T","QVAPOR"]:
+			wrfvars[var]=ncwrffile.variables[var][0,:]
+
+		if not lazy_winds:
+			u=ncwrffile.variables[varu][:]
+			v=ncwrffile.variables[varv][:]
+			if len(u.shape)>2:
+				u=u[0,:]
+				v=v[0,:]
+		ncwrffile.close()
+
+		mslp=slp(PB=wrfvars['PB'], P=wrfvars['P'], PHB=wrfvars['PHB'], PH=wrfvars['PH'], T=wrfvars['T'], QVAPOR=wrfvars['QVAPOR'],TBASE=TBASE)
+
+	fields={"lats":lats,
+		"lons":lons,
+		"mslp":mslp,
+		"reader":{"wfile":sourcefile,
+			"idir":idir,
+			"varu":varu,
+			"varv":varv,
+			"varlat":varlat,
+			"varlon":varlon,
+			"source":source.upper(),
+			"search_limits":search_limits,
+			"search_region":search_region}}
+
+	if not lazy_winds:
+		if source.upper()!="WRF":
+			u=varlist[3,:]
+			v=varlist[4,:]
+		fields["u"]=u
+		fields["v"]=v
+		fields["ff"]=np.sqrt(u**2+v**2)
+
+	return fields
+
+
+def get_field(fields=None,name=""):
+	"""
+	Get a field of the time step. The winds ("u", "v" and "ff") are read from the source file
+	the first time one of them is requested and kept in the dictionary for the next stages.
+
+	Parameters
+	----------
+	fields : dict
+		Fields of the time step returned by get_source_fields.
+	name : str
+		Name of the field.
+
+	Returns
+	-------
+	numpy array
+		The requested 2D field.
+	"""
+	if name not in fields and name in ("u","v","ff"):
+		u,v=get_wind_speed(r_uv=True,**fields["reader"])
+		fields["u"]=u
+		fields["v"]=v
+		fields["ff"]=np.sqrt(u**2+v**2)
+	return fields[name]
 
-		
 
-def get_wind_speed(latsc=[None],lonsc=[None],radius=[None],wfile="",idir="./",varu="U",varv="V",varlat="lat",varlon="lon",source="WRF",search_limits=[None,None,None,None],search_region="",r_uv=False):
+def get_wind_speed(latsc=[None],lonsc=[None],radius=[None],wfile="",idir="./",varu="U",varv="V",varlat="lat",varlon="lon",source="WRF",search_limits=[None,None,None,None],search_region="",r_uv=False,fields=None,grid=None):
 	
 
 	"""
@@ -2563,13 +3407,22 @@ def get_wind_speed(latsc=[None],lonsc=[None],radius=[None],wfile="",idir="./",va
 		The name of the region to search for the wind speed (default is an empty string).
 	r_uv : boolean
 		Whether to return the u and v wind components or the wind speed (default is False).
+	fields : dict
+		Fields of the time step returned by get_source_fields. If given, the file is not read again (default is None).
+	grid : dict
+		Grid metrics returned by get_grid_metrics, used to compute the distances to the centres (default is None).
 
 	Returns
 	-------
 	numpy array
 		Array with the wind speed at the given coordinates.
 	"""
-	if source.upper()=="WRF":
+	if fields is not None:
+		wlat=fields["lats"]
+		wlon=fields["lons"]
+		u=get_field(fields=fields,name="u")
+		v=get_field(fields=fields,name="v")
+	elif source.upper()=="WRF":
 		ncwfile=Dataset(idir+"/"+wfile)
 		u=ncwfile.variables[varu][:]
 		v=ncwfile.variables[varv][:]
@@ -2598,18 +3451,13 @@ def get_wind_speed(latsc=[None],lonsc=[None],radius=[None],wfile="",idir="./",va
 		v=varlist[3,:]
 		
 	if r_uv==False:
-		ff=np.sqrt(u**2+v**2)
-		ffcentres=[]
-		for i in range(0,len(latsc)):
-
-			#dist=compute_grid_distance(lats=wlat,lons=wlon,latc=latsc[i],lonc=lonsc[i])
-			dist=haversine(lon1=lonsc[i], lat1=latsc[i], lon2=wlon, lat2=wlat)
-			if dist.min()>radius[i]:
-				mws=-9999
-			else:
-				mws_=ff[dist<=radius[i]]
-				mws=mws_.max()
-			ffcentres=np.append(ffcentres,mws)
+		if fields is not None:
+			ff=get_field(fields=fields,name="ff")
+		else:
+			ff=np.sqrt(u**2+v**2)
+		if grid is None:
+			grid=get_grid_metrics(lats=wlat,lons=wlon)
+		ffcentres=get_max_wind_speed(latsc=latsc,lonsc=lonsc,radius=radius,ff=ff,grid=grid)
 	
 	if r_uv:
 		return u,v
@@ -2618,6 +3466,93 @@ def get_wind_speed(latsc=[None],lonsc=[None],radius=[None],wfile="",idir="./",va
 
 
 
+def get_max_wind_speed(latsc=[None],lonsc=[None],radius=[None],ff=np.array(None),grid=None):
+	"""
+	Get the maximum wind speed within a given radius of several centres at once.
+
+	The grid points close to every centre are found with a single query of the KD-tree of the grid (see get_grid_tree),
+	and only those points are checked against the exact great-circle distance of haversine_to_grid.
+
+	Parameters
+	----------
+	latsc : numpy array
+		Latitudes of the centres.
+	lonsc : numpy array
+		Longitudes of the centres.
+	radius : numpy array
+		Radius in km around each centre.
+	ff : numpy array
+		2D wind speed field.
+	grid : dict
+		Grid metrics returned by get_grid_metrics.
+
+	Returns
+	-------
+	numpy array
+		Maximum wind speed within the radius of each centre, or -9999 if there are no unmasked grid points within the radius.
+	"""
+	latsc=np.asarray(latsc,dtype=float)
+	ffcentres=np.full(len(latsc),-np.inf)
+	if len(latsc)==0:
+		return ffcentres
+
+	centre,index=get_grid_neighbours(latsc=latsc,lonsc=lonsc,radius=radius,grid=grid)
+	# masked points are ignored, as in the max of a masked array
+	np.maximum.at(ffcentres,centre,np.ma.filled(ff,-np.inf).ravel()[index])
+	ffcentres[np.isneginf(ffcentres)]=-9999
+
+	return ffcentres
+
+
+def get_grid_neighbours(latsc=[None],lonsc=[None],radius=[None],grid=None):
+	"""
+	Get the grid points within a given radius of several centres at once.
+
+	The grid points close to every centre are found with a single query of the KD-tree of the grid (see get_grid_tree),
+	and only those points are checked against the exact great-circle distance of haversine_to_grid.
+
+	Parameters
+	----------
+	latsc : numpy array
+		Latitudes of the centres.
+	lonsc : numpy array
+		Longitudes of the centres.
+	radius : float or numpy array
+		Radius in km around each centre.
+	grid : dict
+		Grid metrics returned by get_grid_metrics.
+
+	Returns
+	-------
+	centre : numpy array
+		Index of the centre of each neighbour, in increasing order.
+	index : numpy array
+		Flat index in the grid of each neighbour.
+	"""
+	latsc=np.asarray(latsc,dtype=float)
+	lonsc=np.asarray(lonsc,dtype=float)
+	radius=np.broadcast_to(np.asarray(radius,dtype=float),latsc.shape)
+	if len(latsc)==0:
+		return np.array([],dtype=int),np.array([],dtype=int)
+
+	# chord of the radius on the unit sphere, slightly enlarged so that the tree does not miss points at the edge
+	chord=2*np.sin(np.minimum(radius/6371,np.pi)/2)
+	neighbours=get_grid_tree(grid).query_ball_point(get_unit_sphere_xyz(lats=latsc,lons=lonsc),r=chord*(1+1e-6)+1e-9)
+	counts=np.array([len(points) for points in neighbours])
+	index=np.concatenate([np.asarray(points,dtype=int) for points in neighbours])
+	centre=np.repeat(np.arange(len(latsc)),counts)
+
+	lonc=np.deg2rad(lonsc)[centre]
+	latc=np.deg2rad(latsc)[centre]
+	dlon=grid["rlons"].ravel()[index] - lonc
+	dlat=grid["rlats"].ravel()[index] - latc
+	a=np.sin(dlat/2)**2 + np.cos(latc) * grid["coslat"].ravel()[index] * np.sin(dlon/2)**2
+	dist=2 * np.arcsin(np.sqrt(a)) * 6371
+
+	inside=dist<=radius[centre]
+	return centre[inside],index[inside]
+
+
 def tracker_cyclones(cyclone_type="",
 		source="",
 		idir="./",
@@ -2666,7 +3601,14 @@ def tracker_cyclones(cyclone_type="",
 		custom_geopotential_var_name="",
 		custom_upper_level_variable_name="",
 		custom_date_file_name="",
-		source_upperprefix=""):
+		source_upperprefix="",
+		mslp_history_dir="",
+		mslp_climatology_file="",
+		extrema_window_km=None,
+		mslp_smoothing_km=0,
+		wind_radii_thresholds=[],
+		calendar="366d",
+		candidate_stats=False):
 
 	
 	"""
@@ -2772,6 +3714,23 @@ def tracker_cyclones(cyclone_type="",
 		Name of the custom date file (default is an empty string).
 	source_upperprefix : str
 		Prefix of the file name for the upper levels (default is an empty string).
+	mslp_history_dir : str
+		Directory with the MSLP history written by precompute_mslp_history (default is an empty string).
+	mslp_climatology_file : str
+		NetCDF file with a static MSLP climatology. If given, it is used as the baseline for the MSLP anomaly
+		instead of the mean of the prev_days previous days (default is an empty string).
+	extrema_window_km : float
+		Size (in km) of the neighbourhood to search the MSLP minima. If None, 25 grid points are used (default is None).
+	mslp_smoothing_km : float
+		Scale (in km) of the Gaussian smoothing of the MSLP before the search of the minima (default is 0, no smoothing).
+	wind_radii_thresholds : list of float
+		Wind speed thresholds (in m/s) of the quadrant wind radii of the critical centers, written to wind_radii_<date>.dat
+		in tmpdir (see write_wind_radii). If empty, they are not computed (default is []).
+	calendar : str
+		The calendar type (366d or 365d) of the averaging window of the MSLP anomaly (default is 366d).
+	candidate_stats : bool
+		If True, the candidate counters of each time step (see get_low_centers) are written to candidate_stats_<date>.dat
+		in tmpdir (see write_candidate_stats) (default is False).
 
 
 	Returns
@@ -2791,58 +3750,69 @@ def tracker_cyclones(cyclone_type="",
 
 						
 		elif source.upper()=="CUSTOM":
-			hgt_field =get_cumstom_hgt_data(custom_terrain_high_filename, custom_terrain_high_var_name)
+			hgt_field =get_cumstom_hgt_data(custom_terrain_high_filename, custom_terrain_high_var_name, varlat=custom_latitude_var, varlon=custom_longitude_var, search_limits=search_limits)
 						
 			hgt_field=hgt_field/9.80665
 
 
+	mslp_climatology=init_mslp_climatology()
+	static_climatology={}
+
 	for index in range(0,len(sourcefiles)):
 
 		fdate=dates[index]+hours[index]
 		if verbose:
 			print("   ---> | Processing "+source.upper()+ ": "+idir+"/"+sourcefiles[index])
 		if source.upper()=="ERA5":
+			varmslp="msl"
 			varu="u10"
 			varv="v10"
 			varlat="latitude"
 			varlon="longitude"
-			
-			varlist=get_era5_2dvar(idir=idir,erafile=sourcefiles[index],svariables=["msl"],search_limits=search_limits,search_region=search_region)
-			sourcelat=varlist[0,:]
-			sourcelon=varlist[1,:]
-			sourcemslp=varlist[2,:]/100
-
-			dx,dy=compute_dx_dy(lons=sourcelon,lats=sourcelat)
 		elif source.upper()=="CUSTOM":
+			varmslp=custom_mslp_variable
 			varu=custom_uwind_variable
 			varv=custom_vwind_variable
 			varlat=custom_latitude_var
 			varlon=custom_longitude_var
-			varlist=get_custom_2dvar(idir=idir,customfile=sourcefiles[index],svariables=[custom_mslp_variable],search_limits=search_limits,search_region=search_region, custom_latitude_var=custom_latitude_var, custom_longitude_var=custom_longitude_var)
-			sourcelat=varlist[0,:]
-			sourcelon=varlist[1,:]
-			sourcemslp=varlist[2,:]
-			
-			if len(str(int(sourcemslp.max())))>=5:
-				sourcemslp=sourcemslp/100
-			
-			dx,dy=compute_dx_dy(lons=sourcelon,lats=sourcelat)
-			
-
 		elif source.upper()=="WRF":
+			varmslp=""
 			varu="U10"
 			varv="V10"
 			varlat="XLAT"
 			varlon="XLONG"
-			
-			sourcelat,sourcelon,sourcemslp=get_wrf_mslp_new(idir=idir,wrffile=sourcefiles[index],variables=["PB","P","PHB","PH","T","QVAPOR"])
-			dx,dy=compute_dx_dy(lons=sourcelon,lats=sourcelat)
+
+		fields=get_source_fields(idir=idir,
+					sourcefile=sourcefiles[index],
+					source=source,
+					varmslp=varmslp,
+					varu=varu,
+					varv=varv,
+					varlat=varlat,
+					varlon=varlon,
+					search_limits=search_limits,
+					search_region=search_region,
+					lazy_winds=True)
+		grid=get_grid_metrics(lats=fields["lats"],lons=fields["lons"])
+		fields["lats"]=grid["lats"]
+		fields["lons"]=grid["lons"]
+		sourcelat=grid["lats"]
+		sourcelon=grid["lons"]
+		sourcemslp=fields["mslp"]
+		dx=grid["dx"]
+		dy=grid["dy"]
 
 		if terrain_filter<=0:
 			hgt_field=np.empty_like(sourcemslp)
 			hgt_field[:,:]=-1
+		elif hgt_field.shape!=sourcemslp.shape:
+			print_error_message("The grid of the terrain height "+str(hgt_field.shape)+" does not match the "+source.upper()+" grid "+str(sourcemslp.shape)+"\n"+program_name()+" Exit")
 
-		if use_mslp_anomaly:	
+		if use_mslp_anomaly and mslp_climatology_file!="":
+			avg_mslp=read_mslp_climatology(filename=mslp_climatology_file,date=dates[index],climatology=static_climatology,lats=sourcelat,lons=sourcelon)
+
+			mslp_anomaly=sourcemslp-avg_mslp
+		elif use_mslp_anomaly:	
 			avg_mslp=get_mslp_anomaly(idir=idir,
 							source=source,
 							search_limits=search_limits,
@@ -2854,13 +3824,23 @@ def tracker_cyclones(cyclone_type="",
 							source_file_date_format=source_file_date_format,
 							custom_mslp_variable=custom_mslp_variable,
 							custom_latitude_var=custom_latitude_var,
-							custom_longitude_var=custom_longitude_var)
+							custom_longitude_var=custom_longitude_var,
+							climatology=mslp_climatology,
+							mslp_history_dir=mslp_history_dir,
+							calendar=calendar)
+
+			add_mslp_climatology_field(climatology=mslp_climatology,date=dates[index],hour=hours[index],mslp=sourcemslp)
 
 			mslp_anomaly=sourcemslp-avg_mslp
 		else:
 			mslp_anomaly=np.empty_like(sourcemslp)
 			mslp_anomaly[:]=-9999
 		
+		if candidate_stats:
+			stats={}
+		else:
+			stats=None
+		cradii=[]
 		if cyclone_type.upper() in ("TC","MC","TLC","SC","EC"):
 			clats,clons,couter_r,cpmin,cmws,cclosedp,croci=get_low_centers(lats=sourcelat,
 							lons=sourcelon,
@@ -2893,16 +3873,37 @@ def tracker_cyclones(cyclone_type="",
 							filter_center_threshold=filter_center_threshold,
 							great_circle_distance=great_circle_distance,
 							dmslp_great_circle_distance=dmslp_great_circle_distance,
-							radius_for_msw=radius_for_msw)
+							radius_for_msw=radius_for_msw,
+							fields=fields,
+							grid=grid,
+							stats=stats,
+							extrema_window_km=extrema_window_km,
+							mslp_smoothing_km=mslp_smoothing_km,
+							wind_radii_thresholds=wind_radii_thresholds,
+							wind_radii=cradii)
 		
-		flats, flons,froci,fpmin,fclosedp,fmws,fouter_r,centers_found=filter_centers(lats=np.array(clats),
+		flats, flons,froci,fpmin,fclosedp,fmws,fouter_r,centers_found,kept=filter_centers(lats=np.array(clats),
 								lons=np.array(clons),
 								roci=np.array(croci),
 								pmin=np.array(cpmin),
 								closedp=np.array(cclosedp),
 								ff=np.array(cmws),
 								outer_r=np.array(couter_r),
-								filter_center_threshold=filter_center_threshold)
+								filter_center_threshold=filter_center_threshold,
+								return_index=True)
+
+		# with no centers, filter_centers returns placeholders, so the counts come from the kept indices
+		if stats is not None:
+			stats["duplicates"]=stats.get("duplicates",0)+len(clats)-len(kept)
+			stats["centers"]=len(kept)
+			write_candidate_stats(filename=tmpdir+"/candidate_stats_"+fdate+".dat",date=dates[index],hour=hours[index],stats=stats)
+		if len(wind_radii_thresholds)>0:
+			write_wind_radii(filename=tmpdir+"/wind_radii_"+fdate+".dat",
+					date=dates[index],
+					hour=hours[index],
+					lats=np.asarray(flats)[:len(kept)],
+					lons=np.asarray(flons)[:len(kept)],
+					radii=np.asarray(cradii).reshape(-1,len(wind_radii_thresholds)*4)[kept])
 
 
 
@@ -2925,10 +3926,7 @@ def tracker_cyclones(cyclone_type="",
 																custom_date_file_name=custom_date_file_name
 																)
 
-			np.savetxt(tmpdir+"/sourcelats.dat", usourcelats)
-			np.savetxt(tmpdir+"/sourcelons.dat", usourcelons)
-			np.savetxt(tmpdir+"/source_levels.dat",source_levels)
-			np.save(tmpdir+"/source_upper_"+fdate+".npy",Zvar[0,:])
+			write_upper_store(tmpdir=tmpdir,fdate=fdate,lats=usourcelats,lons=usourcelons,levels=source_levels,Zvar=Zvar[0,:])
 
 
 			VTL, VTU = compute_VT_series(dates=[dates[index]],
@@ -2990,7 +3988,7 @@ def compute_dx_dy(lons=np.array(None),lats=np.array(None)):
 	Parameters
 	----------
 	lons : numpy.ndarray
-		Array of longitudes in degrees.
+		Array of longitudes in degrees. Longitudes >= 180 are converted to negative values in place.
 	lats : numpy.ndarray
 		Array of latitudes in degrees.
 
@@ -3001,40 +3999,359 @@ def compute_dx_dy(lons=np.array(None),lats=np.array(None)):
 		- dx: Distance between adjacent longitude points in meters.
 		- dy: Distance between adjacent latitude points in meters.
 	"""
-	dy=np.empty_like(lons)
-	dy=dy[:-1,:]
-	dy[:]=0
-	dx=np.empty_like(lats)
-	dx=dx[:,:-1]
-	dx[:]=0
-
-	for i in range(0,lats.shape[0]):
-		for j in range(0,lats.shape[1]):
-			if lons[i,j]>=180:
-				lons[i,j]=lons[i,j]-360
-			
+	lons[lons>=180]=lons[lons>=180]-360
 
+	EARTHRADIUS = 6371 
+	la=(np.pi / 180) * (90 - lats)
+	lo=(np.pi / 180) * (180 + lons)
+	x=np.sin(la)*np.cos(lo)
+	y=np.sin(la)*np.sin(lo)
+	z=np.cos(la)
 
+	dotp=x[:-1,:-1]*x[:-1,1:]+y[:-1,:-1]*y[:-1,1:]+z[:-1,:-1]*z[:-1,1:]
+	dx=np.arccos(np.minimum(dotp,1))*EARTHRADIUS
+	dotp=x[:-1,:-1]*x[1:,:-1]+y[:-1,:-1]*y[1:,:-1]+z[:-1,:-1]*z[1:,:-1]
+	dy=np.arccos(np.minimum(dotp,1))*EARTHRADIUS
+
+	dx=np.pad(dx,((0,1),(0,0)))
+	dy=np.pad(dy,((0,0),(0,1)))
 
-	for i in range(0,lats.shape[0]-1):
-			for j in range(0,lats.shape[1]-1):
-						
-				dist_dx= geo_distance(lat1=lats[i,j],
-										lon1=lons[i,j],
-										lat2=lats[i,j+1],
-										lon2=lons[i,j+1])
-				dist_dy=geo_distance(lat1=lats[i,j],
-										lon1=lons[i,j],
-										lat2=lats[i+1,j],
-										lon2=lons[i+1,j])
-			
-				
-				dx[i,j]=dist_dx
-				dy[i,j]=dist_dy
-					
 	return dx*1000,dy*1000
 
 
+_grid_metrics={}
+
+def get_grid_metrics(lats=np.array(None),lons=np.array(None)):
+	"""
+	Get the metric terms of a grid, computed once per run and cached by a fingerprint of the coordinates.
+
+	Parameters
+	----------
+	lats : numpy.ndarray
+		2D array of latitudes in degrees.
+	lons : numpy.ndarray
+		2D array of longitudes in degrees.
+
+	Returns
+	-------
+	dict
+		Read-only arrays of the grid:
+		- lats, lons: coordinates in degrees, with longitudes between -180 and 180.
+		- rlats, rlons, sinlat: coordinates in radians and sine of the latitude (see get_grid_trig).
+		- dx, dy: distances between adjacent grid points in m (see compute_dx_dy).
+		- vort_dx, vort_dy, coslat: metric terms of calc_relvort.
+		- sgn: hemisphere sign (1 in the Northern Hemisphere, -1 in the Southern Hemisphere).
+		- regular: origin and spacing of the axes if the grid is a regular lat-lon grid (see get_regular_grid_axes), None otherwise.
+	"""
+	lats=np.asarray(lats,dtype=float)
+	lons=np.array(lons,dtype=float)
+	key=(lats.shape,hashlib.md5(lats.tobytes()+lons.tobytes()).hexdigest())
+	if key in _grid_metrics:
+		return _grid_metrics[key]
+
+	dx,dy=compute_dx_dy(lons=lons,lats=lats)
+	vort_dx,vort_dy,coslat=compute_relvort_metrics(lon=lons,lat=lats)
+
+	trig=get_grid_trig(lats=lats,lons=lons)
+
+	sgn=np.ones_like(lats)
+	sgn[lats<0]=-1
+
+	grid={"lats":np.copy(lats),
+		"lons":lons,
+		"rlats":trig["rlats"],
+		"rlons":trig["rlons"],
+		"sinlat":trig["sinlat"],
+		"dx":dx,
+		"dy":dy,
+		"vort_dx":vort_dx,
+		"vort_dy":vort_dy,
+		"coslat":coslat,
+		"sgn":sgn}
+	for name in grid:
+		grid[name].setflags(write=False)
+	grid["regular"]=get_regular_grid_axes(lats=lats,lons=lons)
+
+	_grid_metrics[key]=grid
+	return grid
+
+
+def get_regular_grid_axes(lats=np.array(None),lons=np.array(None),tolerance=1e-4):
+	"""
+	Check whether a grid is a regular lat-lon grid and get the origin and spacing of its axes.
+
+	Parameters
+	----------
+	lats : numpy.ndarray
+		2D array of latitudes in degrees.
+	lons : numpy.ndarray
+		2D array of longitudes in degrees.
+	tolerance : float, optional
+		Tolerance in degrees to consider two coordinates or two spacings as equal (default is 1e-4).
+
+	Returns
+	-------
+	dict or None
+		None if the grid is curvilinear or not evenly spaced. Otherwise:
+		- lat0, dlat, nlat: first latitude, latitude step (may be negative) and number of rows.
+		- lon0, dlon, nlon: first longitude, eastward longitude step and number of columns.
+		- global: True if the longitudes cover the whole circle.
+	"""
+	if lats.ndim!=2 or min(lats.shape)<2:
+		return None
+	lat1d=lats[:,0]
+	lon1d=lons[0,:]
+	if np.abs(lats-lat1d[:,np.newaxis]).max()>tolerance:
+		return None
+	if np.abs(((lons-lon1d[np.newaxis,:]+180)%360)-180).max()>tolerance:
+		return None
+
+	dlats=np.diff(lat1d)
+	dlons=np.diff(lon1d)%360
+	if np.abs(dlats-dlats[0]).max()>tolerance or np.abs(dlons-dlons[0]).max()>tolerance or dlats[0]==0 or dlons[0]==0:
+		return None
+
+	dlat=(lat1d[-1]-lat1d[0])/(len(lat1d)-1)
+	dlon=dlons.sum()/(len(lon1d)-1)
+	return {"lat0":lat1d[0],
+		"dlat":dlat,
+		"nlat":len(lat1d),
+		"lon0":lon1d[0],
+		"dlon":dlon,
+		"nlon":len(lon1d),
+		"global":bool(abs(len(lon1d)*dlon-360)<=tolerance)}
+
+
+def get_regular_grid_position(latp=np.array(None),lonp=np.array(None),regular=None):
+	"""
+	Get the fractional row and column positions of sample points in a regular lat-lon grid.
+
+	Longitudes are measured eastward from the first column. Points west of the grid are placed before the first column,
+	unless the grid covers the whole circle.
+
+	Parameters
+	----------
+	latp : numpy.ndarray
+		Latitudes of the sample points in degrees.
+	lonp : numpy.ndarray
+		Longitudes of the sample points in degrees.
+	regular : dict
+		Axes of the grid returned by get_regular_grid_axes.
+
+	Returns
+	-------
+	numpy.ndarray
+		Fractional row positions.
+	numpy.ndarray
+		Fractional column positions.
+	"""
+	row=(np.asarray(latp,dtype=float)-regular["lat0"])/regular["dlat"]
+	offset=(np.asarray(lonp,dtype=float)-regular["lon0"])%360
+	if not regular["global"]:
+		span=(regular["nlon"]-1)*regular["dlon"]
+		offset=np.where(offset>span+(360-span)/2,offset-360,offset)
+	col=offset/regular["dlon"]
+	return row,col
+
+
+def get_bilinear_grid_weights(latp=np.array(None),lonp=np.array(None),grid=None):
+	"""
+	Get the indices and weights to interpolate bilinearly a regular lat-lon grid at sample points.
+	Sample points outside the grid take the values at the nearest edge.
+
+	Parameters
+	----------
+	latp : numpy.ndarray
+		Latitudes of the sample points in degrees.
+	lonp : numpy.ndarray
+		Longitudes of the sample points in degrees.
+	grid : dict
+		Grid metrics of a regular grid returned by get_grid_metrics.
+
+	Returns
+	-------
+	numpy.ndarray
+		Indices of the four surrounding points in the flattened grid, with shape (npoints, 4).
+	numpy.ndarray
+		Bilinear weights of the four surrounding points, with shape (npoints, 4).
+	"""
+	regular=grid["regular"]
+	nlat=regular["nlat"]
+	nlon=regular["nlon"]
+	row,col=get_regular_grid_position(latp=np.ravel(latp),lonp=np.ravel(lonp),regular=regular)
+
+	row=np.clip(row,0,nlat-1)
+	i0=np.minimum(np.floor(row).astype(int),nlat-2)
+	wi=row-i0
+
+	if regular["global"]:
+		col=col%nlon
+		j0=np.minimum(np.floor(col).astype(int),nlon-1)
+		j1=(j0+1)%nlon
+	else:
+		col=np.clip(col,0,nlon-1)
+		j0=np.minimum(np.floor(col).astype(int),nlon-2)
+		j1=j0+1
+	wj=col-j0
+
+	index=np.column_stack((i0*nlon+j0,i0*nlon+j1,(i0+1)*nlon+j0,(i0+1)*nlon+j1))
+	weights=np.column_stack(((1-wi)*(1-wj),(1-wi)*wj,wi*(1-wj),wi*wj))
+	return index,weights
+
+
+def get_grid_tree(grid=None):
+	"""
+	Get the KD-tree of the grid points on the unit sphere. The tree is built the first time it is requested and kept in the grid metrics.
+
+	Parameters
+	----------
+	grid : dict
+		Grid metrics returned by get_grid_metrics.
+
+	Returns
+	-------
+	scipy.spatial.cKDTree
+		KD-tree of the grid points.
+	"""
+	if "tree" not in grid:
+		grid["tree"]=cKDTree(get_unit_sphere_xyz(lats=grid["lats"],lons=grid["lons"]))
+	return grid["tree"]
+
+
+def get_nearest_grid_points(latp=np.array(None),lonp=np.array(None),grid=None):
+	"""
+	Find the nearest grid point of each sample point.
+
+	On regular lat-lon grids the row and column are computed directly from the origin and spacing of the axes.
+	On curvilinear grids the KD-tree of the grid on the unit sphere is used (great-circle distance).
+
+	Parameters
+	----------
+	latp : numpy.ndarray
+		Latitudes of the sample points in degrees.
+	lonp : numpy.ndarray
+		Longitudes of the sample points in degrees.
+	grid : dict
+		Grid metrics returned by get_grid_metrics.
+
+	Returns
+	-------
+	numpy.ndarray
+		Indices of the nearest grid points in the flattened grid, with the shape of latp.
+	"""
+	regular=grid["regular"]
+	if regular is not None:
+		row,col=get_regular_grid_position(latp=latp,lonp=lonp,regular=regular)
+		row=np.clip(np.rint(row).astype(int),0,regular["nlat"]-1)
+		if regular["global"]:
+			col=np.rint(col).astype(int)%regular["nlon"]
+		else:
+			col=np.clip(np.rint(col).astype(int),0,regular["nlon"]-1)
+		return row*regular["nlon"]+col
+
+	distance,index=get_grid_tree(grid).query(get_unit_sphere_xyz(lats=latp,lons=lonp))
+	return index.reshape(np.shape(latp))
+
+
+def get_grid_sampler(latp=np.array(None),lonp=np.array(None),grid=None,method="nearest"):
+	"""
+	Build the operator that samples any field of the grid at the given points.
+	The operator is built once and can then be applied to several fields with sample_grid_field.
+
+	Parameters
+	----------
+	latp : numpy.ndarray
+		Latitudes of the sample points in degrees.
+	lonp : numpy.ndarray
+		Longitudes of the sample points in degrees.
+	grid : dict
+		Grid metrics returned by get_grid_metrics.
+	method : str, optional
+		'nearest' to take the value of the nearest grid point, or 'bilinear' to interpolate bilinearly (default is 'nearest').
+		Bilinear interpolation is only available on regular lat-lon grids, curvilinear grids always use the nearest grid point.
+
+	Returns
+	-------
+	dict
+		- index: indices in the flattened grid, with the shape of latp (nearest) or with an extra axis of length 4 (bilinear).
+		- weights: bilinear weights with the shape of index, or None for the nearest grid point.
+	"""
+	if method=="bilinear" and grid["regular"] is not None:
+		index,weights=get_bilinear_grid_weights(latp=latp,lonp=lonp,grid=grid)
+		shape=np.shape(latp)+(4,)
+		return {"index":index.reshape(shape),"weights":weights.reshape(shape)}
+	return {"index":get_nearest_grid_points(latp=latp,lonp=lonp,grid=grid),"weights":None}
+
+
+def sample_grid_field(field=np.array(None),sampler=None):
+	"""
+	Sample a field of the grid with an operator built by get_grid_sampler or get_polar_sampler.
+
+	Parameters
+	----------
+	field : numpy.ndarray
+		2D field with the shape of the grid.
+	sampler : dict
+		Sampling operator.
+
+	Returns
+	-------
+	numpy.ndarray
+		Values of the field at the sample points.
+	"""
+	values=np.asarray(field).ravel()[sampler["index"]]
+	if sampler["weights"] is None:
+		return values
+	return np.sum(values*sampler["weights"],axis=-1)
+
+
+def get_polar_sampler(latc=None,lonc=None,dang=10,dradius=100,search_radius=2000,grid=None,method="nearest"):
+	"""
+	Build the operator that samples any field of the grid on the polar coordinates around a center (see polar_cords).
+	MSLP, u and v profiles around the same center are taken from the same precomputed indices.
+	Several centers can be given at once to sample (centers x theta x radius) cubes.
+
+	Parameters
+	----------
+	latc : float or numpy.ndarray
+		Latitude of the center, or latitudes of several centers.
+	lonc : float or numpy.ndarray
+		Longitude of the center, or longitudes of several centers.
+	dang : int
+		Angular distance in degrees between two consecutive legs.
+	dradius : int
+		Radial distance in km between two consecutive points of a leg.
+	search_radius : int
+		Length of the legs in km.
+	grid : dict
+		Grid metrics returned by get_grid_metrics.
+	method : str, optional
+		Sampling method, 'nearest' or 'bilinear' (default is 'nearest', see get_grid_sampler).
+
+	Returns
+	-------
+	dict
+		The sampling operator of get_grid_sampler, plus:
+		- lats, lons: polar coordinates with shape (len(theta), len(radius)), or (ncenters, len(theta), len(radius)).
+		- radius, theta: radial and angular coordinates.
+		- dang, dradius, search_radius: parameters used to build the polar coordinates.
+	"""
+	latp,lonp,radius,theta=polar_cords(latc=latc,
+					lonc=lonc,
+					dth=math.radians(dang),
+					dr=dradius,
+					search_radius=search_radius)
+	sampler=get_grid_sampler(latp=latp,lonp=lonp,grid=grid,method=method)
+	sampler.update({"lats":latp,
+			"lons":lonp,
+			"radius":radius,
+			"theta":theta,
+			"dang":dang,
+			"dradius":dradius,
+			"search_radius":search_radius})
+	return sampler
+
+
 def create_map(search_limits=[None, None, None, None], 
 			 search_region="",):
 	"""
@@ -3361,6 +4678,7 @@ def make_take(ndims, slice_dim):
 def compute_grid_distance(lats=np.array(None),lons=np.array(None),latc=None,lonc=None):
 	"""
 	Compute the distance between a grid point and a center point.
+	Kept only for backward compatibility, CyTRACK itself calls central_angle_distance from cytrack_geodesic.
 
 	Parameters
 	----------
@@ -3378,23 +4696,10 @@ def compute_grid_distance(lats=np.array(None),lons=np.array(None),latc=None,lonc
 	dist : numpy array
 		Array with the distances between the grid points and the center point in meters.
 	"""
-	dist=np.empty_like(lats)
-	
-	if lonc>180:
-		lonc=lonc-360
-	
-	for i in range(0,lats.shape[0]):
-		for j in range(0,lats.shape[1]):
-			
-			if lons[i,j]>180:
-				lons[i,j]=lons[i,j]-360
-			
-			
-			dist[i,j]=geo_distance(lat1=latc,
-							lon1=lonc,
-							lat2=lats[i,j],
-							lon2=lons[i,j])
-			
+	dist=central_angle_distance(lat1=latc,
+				lon1=normalize_longitudes(lonc),
+				lat2=np.asarray(lats),
+				lon2=normalize_longitudes(lons))
 
 	return dist
 
@@ -3407,7 +4712,8 @@ def filter_centers(lats=np.array(None),
 			closedp=np.array(None),
 			ff=np.array([None]),
 			outer_r=np.array([None]),
-			filter_center_threshold=1000):
+			filter_center_threshold=1000,
+			return_index=False):
 	
 	"""
 	Filter cyclone centers based on proximity and minimum pressure.
@@ -3430,6 +4736,8 @@ def filter_centers(lats=np.array(None),
 		Array of outer radii. Defaults to an empty array.
 	filter_center_threshold : float, optional
 		Maximum distance in meters to consider centers as duplicates. Default is 1000.
+	return_index : bool, optional
+		If True, the indices of the kept centers in the input arrays are also returned. Default is False.
 
 	Returns
 	-------
@@ -3449,13 +4757,16 @@ def filter_centers(lats=np.array(None),
 		Filtered array of outer radii.
 	centers_found : bool
 		Indicator whether centers were found.
+	kept : list
+		Indices of the kept centers in the input arrays. Only if return_index is True.
 
 	Notes
 	-----
 	This function eliminates duplicate cyclone centers by comparing distances
 	and selecting the center with the lowest minimum pressure within a specified
 	threshold. It returns the filtered set of centers and a flag indicating whether
-	any centers were found.
+	any centers were found. The neighbours of each center are found with a KD-tree,
+	and the input arrays are not modified.
 	"""
 	if len(lats)>0:
 		if ff[0]==None:
@@ -3465,86 +4776,48 @@ def filter_centers(lats=np.array(None),
 			outer_r=np.empty_like(lons)
 			outer_r[:]=0
 
-
-
-		flats=[]
-		flons=[]
-		froci=[]
-		fpmin=[]
-		fclosedp=[]
-		fmws=[]
-		fouter_r=[]
-
+		lats=np.array(lats,dtype=float)
+		lons=np.array(lons,dtype=float)
+		lons[lons>180]=lons[lons>180]-360
+		pmin=np.asarray(pmin)
+		alive=np.isfinite(pmin)&np.isfinite(lats)&np.isfinite(lons)
+
+		# neighbours within filter_center_threshold, found with the KD-tree of the centres on the unit sphere
+		# (the chord is slightly enlarged, and the distances are then checked with geo_distance)
+		ialive=np.where(alive)[0]
+		neighbours=[[] for i in range(0,len(lats))]
+		if len(ialive)>0:
+			xyz=get_unit_sphere_xyz(lats=lats[ialive],lons=lons[ialive])
+			chord=2*np.sin(min(filter_center_threshold/6371,np.pi)/2)
+			for k,points in enumerate(cKDTree(xyz).query_ball_point(xyz,r=chord*(1+1e-6)+1e-9)):
+				points=ialive[np.sort(points)]
+				dist=central_angle_distance(lat1=lats[ialive[k]],lon1=lons[ialive[k]],lat2=lats[points],lon2=lons[points])
+				neighbours[ialive[k]]=points[dist<filter_center_threshold]
+
+		# each remaining centre keeps the lowest pmin among itself and its remaining neighbours,
+		# and all of them are removed from the following comparisons
+		kept=[]
 		for i in range(0,len(lats)):
-			
-			dist=[]
-			if np.isfinite(pmin[i]) and np.isfinite(lats[i]) and np.isfinite(lons[i]):
-				if lons[i]>180:
-					lons[i]=lons[i]-360
-				coord_indices=[]
-				npmin=[]
-				check_roci=roci[i]
-				dist_check=False
-				for j in range(0,len(lats)):
-					if lons[j]>180:
-						lons[j]=lons[j]-360
-
-					
-					if np.isfinite(pmin[j]) and np.isfinite(lats[j]) and np.isfinite(lons[j]) :
-						pdist= geo_distance(lat1=lats[i],
-							lon1=lons[i],
-							lat2=lats[j],
-							lon2=lons[j])
-						dist=np.append(dist,pdist)
-						coord_indices=np.append(coord_indices,j)
-						npmin=np.append(npmin,pmin[j])
-						check_roci=np.append(check_roci,roci[j])
-						dist_check=True
-
-			dist=np.array(dist)
-			if len(dist)>0 and dist_check==True:
-
-				indices=np.where(dist<filter_center_threshold)
-				if len(indices[0])==0 or len(indices[0])==1:
-					flats=np.append(flats, lats[i])
-					flons=np.append(flons,lons[i])
-					froci=np.append(froci, roci[i])
-					fpmin=np.append(fpmin, pmin[i])
-					fclosedp=np.append(fclosedp,closedp[i])
-					fmws=np.append(fmws,ff[i])
-					fouter_r=np.append(fouter_r,outer_r[i])
-					
-
-				elif len(indices[0])>1:
-					indices=indices[0]
-					check_pmin=pmin[i]
-					check_indices=i
-					for m in range(0,len(indices)):
-						check_pmin=np.append(check_pmin,npmin[int(indices[m])])
-						check_indices=np.append(check_indices,coord_indices[int(indices[m])])
-					check_pmin=np.array(check_pmin)
-					i_npmin=np.where(check_pmin==check_pmin.min())
-					pindex=int(i_npmin[0][0])
-					flats=np.append(flats, lats[int(check_indices[pindex])])
-					flons=np.append(flons, lons[int(check_indices[pindex])])
-					froci=np.append(froci, roci[int(check_indices[pindex])])
-					fpmin=np.append(fpmin, pmin[int(check_indices[pindex])])
-					fclosedp=np.append(fclosedp,closedp[int(check_indices[pindex])])
-					fmws=np.append(fmws,ff[int(check_indices[pindex])])
-					fouter_r=np.append(fouter_r,outer_r[int(check_indices[pindex])])
-					
-					pmin[int(check_indices[pindex])]=np.nan
-					lats[int(check_indices[pindex])]=np.nan
-					lons[int(check_indices[pindex])]=np.nan
-					for k in range(0,len(indices)):
-						pmin[int(coord_indices[int(indices[k])])] = np.nan
-						lats[int(coord_indices[int(indices[k])])] = np.nan
-						lons[int(coord_indices[int(indices[k])])] = np.nan
-			pmin[i]=np.nan
-			lats[i]=np.nan
-			lons[i]=np.nan
-			dist=[]
-			centers_found=True
+			if alive[i]:
+				near=neighbours[i][alive[neighbours[i]]]
+				if len(near)<=1:
+					kept.append(i)
+				else:
+					check_indices=np.append(i,near)
+					pindex=check_indices[np.argmin(pmin[check_indices])]
+					kept.append(pindex)
+					alive[pindex]=False
+					alive[near]=False
+			alive[i]=False
+
+		flats=lats[kept]
+		flons=lons[kept]
+		froci=np.asarray(roci,dtype=float)[kept]
+		fpmin=pmin.astype(float)[kept]
+		fclosedp=np.asarray(closedp,dtype=float)[kept]
+		fmws=np.asarray(ff,dtype=float)[kept]
+		fouter_r=np.asarray(outer_r,dtype=float)[kept]
+		centers_found=True
 	else:
 			flats=[0]
 			flons=[0]
@@ -3554,7 +4827,10 @@ def filter_centers(lats=np.array(None),
 			fmws=[0]
 			fouter_r=[0]
 			fctype=[0]
+			kept=[]
 			centers_found=False
+	if return_index:
+		return flats, flons,froci,fpmin, fclosedp,fmws,fouter_r, centers_found, kept
 	return flats, flons,froci,fpmin, fclosedp,fmws,fouter_r, centers_found
 
 
@@ -3922,7 +5198,7 @@ def compute_mslp(psfc=np.array(None),T2=np.array(None),phb=np.array(None),ph=np.
 
 
 
-def calc_relvort(u=np.array([None]), v=np.array([None]), lon=np.array([None]), lat=np.array([None])):
+def calc_relvort(u=np.array([None]), v=np.array([None]), lon=np.array([None]), lat=np.array([None]), grid=None):
 
 	"""
 	Calculate relative vorticity from u and v wind components on a latitude-longitude grid.
@@ -3937,6 +5213,8 @@ def calc_relvort(u=np.array([None]), v=np.array([None]), lon=np.array([None]), l
 		2D array of longitudes in degrees.
 	lat : numpy.ndarray
 		2D array of latitudes in degrees.
+	grid : dict
+		Grid metrics returned by get_grid_metrics. If given, the metric terms are not computed again (default is None).
 
 	Returns
 	-------
@@ -3949,6 +5227,98 @@ def calc_relvort(u=np.array([None]), v=np.array([None]), lon=np.array([None]), l
 	of the v component and the y-derivative of the u component. The calculation
 	accounts for the Earth's curvature by using latitude-dependent scaling factors.
 	"""
+	if grid is None:
+		dx,dy,coslat=compute_relvort_metrics(lon=lon, lat=lat)
+	else:
+		dx=grid["vort_dx"]
+		dy=grid["vort_dy"]
+		coslat=grid["coslat"]
+
+	# Calculate derivatives of v in x direction
+	dvdx = np.zeros([v.shape[0], v.shape[1]])
+	dvdx[ :,    0] = (v[ :,  1] - v[ :,   0])/dx[ :,  0]
+	dvdx[:,   -1] = (v[ :, -1] - v[ :,  -2])/dx[ :, -1]
+	dvdx[ :, 1:-1] = (v[ :, 2:] - v[ :, :-2])/(2.*dx[:, 1:-1])
+
+	# Calculate derivatives of u in y direction
+	dudy = np.zeros([u.shape[0], u.shape[1]])
+
+	dudy[  0, :] = (u[1, :]*coslat[1, :] \
+					-u[ 0, :]*coslat[0, :])/(dy[0, :]*coslat[0, :])
+	dudy[  -1, :] = (u[ -1, :]*coslat[-1, :] \
+					-u[ -2, :]*coslat[-2, :])/(dy[-1, :]*coslat[-1, :])
+	dudy [1:-1, :] = (u[ 2:, :]*coslat[2:, :] \
+					-u[ :-2, :]*coslat[:-2, :])/(2.*dy[1:-1, :]*coslat[1:-1, :])
+	return dvdx - dudy
+
+
+def calc_relvort_points(u=np.array([None]), v=np.array([None]), iy=np.array([None]), ix=np.array([None]), lon=np.array([None]), lat=np.array([None]), grid=None):
+
+	"""
+	Calculate relative vorticity only at a set of grid points, with the same stencil as calc_relvort.
+
+	Parameters
+	----------
+	u : numpy.ndarray
+		Zonal wind component (east-west) in m/s.
+	v : numpy.ndarray
+		Meridional wind component (north-south) in m/s.
+	iy : numpy.ndarray
+		Row indices of the points.
+	ix : numpy.ndarray
+		Column indices of the points.
+	lon : numpy.ndarray
+		2D array of longitudes in degrees.
+	lat : numpy.ndarray
+		2D array of latitudes in degrees.
+	grid : dict
+		Grid metrics returned by get_grid_metrics. If given, the metric terms are not computed again (default is None).
+
+	Returns
+	-------
+	numpy.ndarray
+		Relative vorticity at the points, in s^-1. The values are equal to calc_relvort(u, v, lon, lat)[iy, ix].
+	"""
+	if grid is None:
+		dx,dy,coslat=compute_relvort_metrics(lon=lon, lat=lat)
+	else:
+		dx=grid["vort_dx"]
+		dy=grid["vort_dy"]
+		coslat=grid["coslat"]
+
+	iy=np.asarray(iy,dtype=int)
+	ix=np.asarray(ix,dtype=int)
+	ny,nx=u.shape
+
+	# one-sided differences at the edges of the domain, centred differences elsewhere
+	ixw=np.where(ix==0,0,ix-1)
+	ixe=np.where(ix==nx-1,nx-1,ix+1)
+	fx=np.where((ix==0)|(ix==nx-1),1.,2.)
+	dvdx=(v[iy,ixe] - v[iy,ixw])/(fx*dx[iy,ix])
+
+	iys=np.where(iy==0,0,iy-1)
+	iyn=np.where(iy==ny-1,ny-1,iy+1)
+	fy=np.where((iy==0)|(iy==ny-1),1.,2.)
+	dudy=(u[iyn,ix]*coslat[iyn,ix] - u[iys,ix]*coslat[iys,ix])/(fy*dy[iy,ix]*coslat[iy,ix])
+	return dvdx - dudy
+
+
+def compute_relvort_metrics(lon=np.array([None]), lat=np.array([None])):
+	"""
+	Compute the metric terms used by calc_relvort on a latitude-longitude grid.
+
+	Parameters
+	----------
+	lon : numpy.ndarray
+		2D array of longitudes in degrees.
+	lat : numpy.ndarray
+		2D array of latitudes in degrees.
+
+	Returns
+	-------
+	tuple
+		Horizontal distances dx and dy in m for centred differences, and cos(lat).
+	"""
 	pi = math.pi;
 	pid = pi/180.;
 	R_earth = 6371200.;
@@ -3967,26 +5337,107 @@ def calc_relvort(u=np.array([None]), v=np.array([None]), lon=np.array([None]), l
 	dy[  -1, :] = a_d2r*(lat2d[-1, :] - lat2d[ -2, :])
 	dy[1:-1, :] = a_d2r*(lat2d[2:, :] - lat2d[:-2, :])/2.
 
-	# Calculate derivatives of v in x direction
-	dvdx = np.zeros([v.shape[0], v.shape[1]])
-	dvdx[ :,    0] = (v[ :,  1] - v[ :,   0])/dx[ :,  0]
-	dvdx[:,   -1] = (v[ :, -1] - v[ :,  -2])/dx[ :, -1]
-	dvdx[ :, 1:-1] = (v[ :, 2:] - v[ :, :-2])/(2.*dx[:, 1:-1])
+	coslat = np.cos(lat2d*pid)
+	return dx, dy, coslat
 
-	# Calculate derivatives of u in y direction
-	dudy = np.zeros([u.shape[0], u.shape[1]])
 
-	dudy[  0, :] = (u[1, :]*np.cos(lat2d[1, :]*pid) \
-					-u[ 0, :]*np.cos(lat2d[0, :]*pid))/(dy[0, :]*np.cos(lat2d[0, :]*pid))
-	dudy[  -1, :] = (u[ -1, :]*np.cos(lat2d[-1, :]*pid) \
-					-u[ -2, :]*np.cos(lat2d[-2, :]*pid))/(dy[-1, :]*np.cos(lat2d[-1, :]*pid))
-	dudy [1:-1, :] = (u[ 2:, :]*np.cos(lat2d[2:, :]*pid) \
-					-u[ :-2, :]*np.cos(lat2d[:-2, :]*pid))/(2.*dy[1:-1, :]*np.cos(lat2d[1:-1, :]*pid))
-	return dvdx - dudy
+def get_extrema_window(extrema_window_km=750, model_res=30):
+	"""
+	Convert the size of the neighbourhood used to search the MSLP minima from km to grid points.
+
+	Parameters
+	----------
+	extrema_window_km : float
+		Size of the neighbourhood in km.
+	model_res : float
+		Horizontal resolution of the source data in km.
+
+	Returns
+	-------
+	int
+		Odd number of grid points, at least 3.
+	"""
+	nsize=int(round(extrema_window_km/model_res))
+	if nsize%2==0:
+		nsize=nsize+1
+	return max(nsize,3)
+
+
+def get_masked_minima(field=np.array([None]), mask=np.array([None]), nsize=25):
+	"""
+	Find the local minima of a field that fall inside a mask. The minimum filter only runs on the bounding box of
+	each connected region of the mask, enlarged by half the window, so the result is the same as
+	np.where((minimum_filter(field, nsize, mode='nearest') == field) & mask).
+
+	Parameters
+	----------
+	field : numpy array
+		2D field.
+	mask : numpy array
+		2D boolean array with the points where a minimum is accepted.
+	nsize : int
+		Size of the neighbourhood for the minimum_filter function.
+
+	Returns
+	-------
+	mxy : numpy array
+		Row indices of the minima, in row-major order.
+	mxx : numpy array
+		Column indices of the minima, in row-major order.
+	"""
+	labels, nlabels = sp.label(np.asarray(mask))
+	ny, nx = field.shape
+	half = nsize//2
+
+	mxy=[np.array([],dtype=int)]
+	mxx=[np.array([],dtype=int)]
+	for ilabel, box in enumerate(sp.find_objects(labels), start=1):
+		y0=max(box[0].start-half,0)
+		y1=min(box[0].stop+half,ny)
+		x0=max(box[1].start-half,0)
+		x1=min(box[1].stop+half,nx)
 
+		crop=field[y0:y1,x0:x1]
+		data_ext=minimum_filter(crop, nsize, mode='nearest')
+		iy, ix = np.where((data_ext == crop) & (labels[y0:y1,x0:x1] == ilabel))
+		mxy.append(iy+y0)
+		mxx.append(ix+x0)
 
+	mxy=np.concatenate(mxy)
+	mxx=np.concatenate(mxx)
+	order=np.argsort(mxy*nx+mxx)
+	return mxy[order], mxx[order]
 
-def get_maxmin_mslp_points(lats=np.array([None]), lons=np.array([None]),  mslp=np.array([None]), mslp_anomaly=np.array([None]), hgt_field=np.array([None]), rel_vort=np.array([None]), extrema="min", nsize=25):
+
+def count_threshold_rejections(field=np.array([None]), thresholds=[], nsize=25, stats=None):
+	"""
+	Count the local minima of the whole field and the minima rejected by each threshold, in the order of the list.
+	The minima rejected by a threshold are not counted again by the following ones, so together with the minima
+	found by get_masked_minima inside the combined mask, the counts add up to all the minima of the field.
+
+	Parameters
+	----------
+	field : numpy array
+		2D field.
+	thresholds : list of tuple
+		(name, mask) of each threshold, the mask being a 2D boolean array with the points that pass it.
+	nsize : int
+		Size of the neighbourhood for the minimum_filter function.
+	stats : dict
+		Counters updated in place: "minima" with all the local minima of the field, and the name of each threshold
+		with the number of minima it rejected.
+	"""
+	mxy, mxx = np.where(minimum_filter(field, nsize, mode='nearest') == field)
+	stats["minima"]=stats.get("minima",0)+len(mxy)
+
+	alive=np.ones(len(mxy),dtype=bool)
+	for name, mask in thresholds:
+		passed=alive & mask[mxy, mxx]
+		stats[name]=stats.get(name,0)+int(np.sum(alive))-int(np.sum(passed))
+		alive=passed
+
+
+def get_maxmin_mslp_points(lats=np.array([None]), lons=np.array([None]),  mslp=np.array([None]), mslp_anomaly=np.array([None]), hgt_field=np.array([None]), rel_vort=None, extrema="min", nsize=25, return_index=False, mask=None, search_field=None):
 	"""
 	Get the locations of the minimum points of the MSLP field.
 
@@ -4003,11 +5454,19 @@ def get_maxmin_mslp_points(lats=np.array([None]), lons=np.array([None]),  mslp=n
 	hgt_field : numpy array
 		Array of terrain height values.
 	rel_vort : numpy array
-		Array of relative vorticity values.
+		Array of relative vorticity values. If None, the vorticity is not sampled and nrelvort is filled with NaN (default is None).
 	extrema : str
 		"min" or "max", indicating whether to look for minima or maxima.
 	nsize : int
 		Size of the neighbourhood for the minimum_filter function.
+	return_index : bool
+		If True, the row and column indices of the min/max points are also returned (default is False).
+	mask : numpy array
+		Boolean array with the grid points where a minimum is accepted. If given, the minima are only searched
+		inside the connected regions of the mask (see get_masked_minima). If None, the whole grid is scanned (default is None).
+	search_field : numpy array
+		Field where the minima are searched, e.g. a smoothed MSLP. The values returned are still taken from mslp.
+		If None, the minima of mslp are searched (default is None).
 
 	Returns
 	-------
@@ -4023,29 +5482,151 @@ def get_maxmin_mslp_points(lats=np.array([None]), lons=np.array([None]),  mslp=n
 		Array of terrain height values at the min/max points.
 	nrelvort : numpy array
 		Array of relative vorticity values at the min/max points.
+	mxy, mxx : numpy array
+		Row and column indices of the min/max points, only if return_index is True.
 
 	"""
-	data_ext = minimum_filter(mslp, nsize, mode='nearest')
-	mxy, mxx = np.where(data_ext == mslp)
+	if search_field is None:
+		search_field = mslp
 
+	if mask is None:
+		data_ext = minimum_filter(search_field, nsize, mode='nearest')
+		mxy, mxx = np.where(data_ext == search_field)
+	else:
+		mxy, mxx = get_masked_minima(field=search_field, mask=mask, nsize=nsize)
+
+	nlats=lats[mxy, mxx].astype(float)
+	nlons=lons[mxy, mxx].astype(float)
+	nmslp=mslp[mxy, mxx].astype(float)
+	nmslp_anoms=mslp_anomaly[mxy, mxx].astype(float)
+	nterrain=hgt_field[mxy, mxx].astype(float)
+	if rel_vort is None:
+		nrelvort=np.full(len(mxy), np.nan)
+	else:
+		nrelvort=rel_vort[mxy, mxx].astype(float)
 
-	nlats=[]
-	nlons=[]
-	nmslp=[]
-	nmslp_anoms=[]
-	nterrain=[]
-	nrelvort=[]
-	for i in range(len(mxy)):
-		nlats=np.append(nlats, lats[mxy[i], mxx[i]])
-		nlons=np.append(nlons, lons[mxy[i], mxx[i]])
-		nmslp=np.append(nmslp, mslp[mxy[i], mxx[i]])
-		nmslp_anoms=np.append(nmslp_anoms, mslp_anomaly[mxy[i], mxx[i]])
-		nterrain=np.append(nterrain, hgt_field[mxy[i], mxx[i]])
-		nrelvort=np.append(nrelvort, rel_vort[mxy[i], mxx[i]])
-		
+	if return_index:
+		return nlats, nlons, nmslp, nmslp_anoms, nterrain, nrelvort, mxy, mxx
 	return nlats, nlons, nmslp, nmslp_anoms, nterrain, nrelvort
 
 
+def run_filter_cascade(stages=[],state=None,icand=np.array([],dtype=int),stats=None):
+	"""
+	Run a cascade of criteria over a set of candidates, cheapest first, and stop as soon as no candidate is left.
+
+	Parameters
+	----------
+	stages : list of dict
+		Criteria of the cascade. Each stage has a "name", a rough relative "cost" and a "criterion" function,
+		and optionally the list of stage names it "requires". Among the stages whose requirements are met,
+		the cheapest one runs first (ties keep the order of the list). A criterion is called as
+		criterion(state=state, icand=icand) and returns a boolean mask of the candidates that pass it.
+	state : dict
+		Fields, parameters and per-candidate results shared by the criteria.
+	icand : numpy array
+		Indices of the candidates.
+	stats : dict
+		Counters of rejected candidates per stage name, updated in place. If None, nothing is counted (default is None).
+
+	Returns
+	-------
+	numpy array
+		Indices of the candidates that passed all the stages, in their original order.
+	"""
+	pending=list(stages)
+	done=[]
+	while len(pending)>0:
+		ready=[stage for stage in pending if all(name in done for name in stage.get("requires",[]))]
+		stage=min(ready,key=lambda stage: stage["cost"])
+		pending.remove(stage)
+		done.append(stage["name"])
+
+		nbefore=len(icand)
+		if nbefore>0:
+			icand=icand[stage["criterion"](state=state,icand=icand)]
+		if stats is not None:
+			stats[stage["name"]]=stats.get(stage["name"],0)+nbefore-len(icand)
+	return icand
+
+
+def criterion_vorticity(state=None,icand=np.array([],dtype=int)):
+	"""
+	Keep the minima whose relative vorticity, signed for the hemisphere, is not below vorticity_threshold.
+	With the point-wise evaluation, the vorticity is computed here with calc_relvort_points. See run_filter_cascade.
+	"""
+	if state["pointwise_vorticity"]:
+		iy=state["iy"][icand]
+		ix=state["ix"][icand]
+		state["relvort"][icand]=calc_relvort_points(u=get_field(fields=state["fields"],name="u"),
+							v=get_field(fields=state["fields"],name="v"),
+							iy=iy,
+							ix=ix,
+							grid=state["grid"])*state["sgn"][iy,ix]
+	return ~(state["relvort"][icand]<state["vorticity_threshold"])
+
+
+def criterion_dmslp(state=None,icand=np.array([],dtype=int)):
+	"""
+	Relocate the centres with compute_dmslp_batch and keep those whose MSLP rises by at least
+	dmslp_great_circle_distance (Pa) from the centre to the surrounding ring. See run_filter_cascade.
+	"""
+	dmslp,latc,lonc,pmin=compute_dmslp_batch(latc=state["lats"][icand],
+					lonc=state["lons"][icand],
+					lats=state["grid"]["lats"],
+					lons=state["grid"]["lons"],
+					mslp=state["mslp"],
+					pmin=state["pmin"][icand],
+					dang=state["d_ang"],
+					dradius=state["model_res"],
+					search_radius=state["great_circle_distance"]+100,
+					model_res=state["model_res"],
+					great_circle_distance=state["great_circle_distance"],
+					filter_center_threshold=.45*state["filter_center_threshold"],
+					search_limits=state["search_limits"],
+					grid=state["grid"])
+	state["latc"][icand]=latc
+	state["lonc"][icand]=lonc
+	state["npmin"][icand]=pmin
+	return dmslp*100 - pmin*100 >= state["dmslp_great_circle_distance"]
+
+
+def criterion_max_wind(state=None,icand=np.array([],dtype=int)):
+	"""
+	Keep the relocated centres whose maximum wind speed within radius_for_msw reaches max_wind_speed_threshold.
+	See run_filter_cascade.
+	"""
+	mws=get_max_wind_speed(latsc=state["latc"][icand],
+				lonsc=state["lonc"][icand],
+				radius=[state["radius_for_msw"]]*len(icand),
+				ff=get_field(fields=state["fields"],name="ff"),
+				grid=state["grid"])
+	state["mws"][icand]=mws
+	return mws >= state["max_wind_speed_threshold"]
+
+
+def criterion_roci(state=None,icand=np.array([],dtype=int)):
+	"""
+	Keep the relocated centres with an outermost closed isobar at least critical_outer_radius away
+	or a closed pressure, computed with compute_roci_RU_batch. See run_filter_cascade.
+	"""
+	roci,closedp=compute_roci_RU_batch(latc=state["latc"][icand],
+					lonc=state["lonc"][icand],
+					lats=state["grid"]["lats"],
+					lons=state["grid"]["lons"],
+					mslp=state["mslp"],
+					pmin=state["npmin"][icand],
+					dang=state["d_ang"],
+					dradius=state["dr_res"],
+					search_radius=state["rout"],
+					model_res=state["model_res"],
+					grid=state["grid"])
+	roci[np.isnan(roci)]=0
+	closedp[np.isnan(closedp)]=0
+	state["roci"][icand]=roci
+	state["closedp"][icand]=closedp
+	return (roci>=state["critical_outer_radius"]) | (closedp>=0)
+
+
 def get_low_centers(lats=np.array([None]),
 		lons=np.array([None]), 
 		mslp=np.array([None]),
@@ -4077,7 +5658,15 @@ def get_low_centers(lats=np.array([None]),
 		filter_center_threshold=800,
 		great_circle_distance=5.5,
 		dmslp_great_circle_distance=200,
-		radius_for_msw=100):
+		radius_for_msw=100,
+		fields=None,
+		grid=None,
+		pointwise_vorticity=True,
+		stats=None,
+		extrema_window_km=None,
+		mslp_smoothing_km=0,
+		wind_radii_thresholds=None,
+		wind_radii=None):
 
 
 	"""
@@ -4147,6 +5736,28 @@ def get_low_centers(lats=np.array([None]),
 		great circle distance for the mean sea level pressure anomaly (in km)
 	radius_for_msw : int
 		radius for the maximum sustained wind (in km)
+	fields : dict
+		fields of the time step returned by get_source_fields. If None, the winds are read from the source file when a candidate needs them
+	grid : dict
+		grid metrics returned by get_grid_metrics. If None, the metric terms are computed from lats and lons
+	pointwise_vorticity : bool
+		if True, the relative vorticity is only computed at the minima that pass the pressure, terrain and region filters.
+		If False, it is computed over the whole grid with calc_relvort (default is True)
+	stats : dict
+		counters of the time step updated in place: all the "minima" of the field and those rejected by each threshold of the mask
+		(see count_threshold_rejections, this needs a scan of the whole grid), candidates rejected by each stage of the cascade
+		(see run_filter_cascade), "duplicates" removed by filter_centers. If None, nothing is counted
+	extrema_window_km : float
+		size (in km) of the neighbourhood to search the MSLP minima, converted to grid points with get_extrema_window.
+		If None, 25 grid points are used
+	mslp_smoothing_km : float
+		scale (in km) of the Gaussian smoothing of the MSLP before the search of the minima. The thresholds and
+		the values at the minima use the original MSLP. 0 to not smooth (default is 0)
+	wind_radii_thresholds : list of float
+		wind speed thresholds (in m/s) of the quadrant wind radii, computed with the outer radius (see compute_TC_size_batch)
+	wind_radii : list
+		if a list is given and wind_radii_thresholds is not empty, the wind radii of the low centers are appended to it,
+		one array with shape (len(wind_radii_thresholds), 4) per center. If None, the wind radii are not computed
 
 	Returns
 	-------
@@ -4177,31 +5788,33 @@ def get_low_centers(lats=np.array([None]),
 	npi=int(111/model_res)
 	great_circle_distance=great_circle_distance*111
 
-	u,v=get_wind_speed(latsc=[0],
-					lonsc=[0],
-					radius=[critical_outer_radius],
-					wfile=sourcefile,
-					idir=idir,
-					varu=varu,
-					varv=varv,
-					varlat=varlat,
-					varlon=varlon,
-					source=source.upper(),
-					search_limits=search_limits,
-					search_region=search_region,
-					r_uv=True)
-	
-
-
-	rel_vort=calc_relvort(u=u, v=v, lon=lons, lat=lats)
-	
-	aux_sgn=np.copy(lats)
-	
-	aux_sgn[aux_sgn>=0]=1
-	aux_sgn[aux_sgn<0]=-1
+	# the winds are only read when a candidate needs them
+	if fields is None:
+		fields={"lats":lats,
+			"lons":lons,
+			"reader":{"wfile":sourcefile,
+				"idir":idir,
+				"varu":varu,
+				"varv":varv,
+				"varlat":varlat,
+				"varlon":varlon,
+				"source":source.upper(),
+				"search_limits":search_limits,
+				"search_region":search_region}}
+
+	if grid is not None:
+		aux_sgn=grid["sgn"]
+	else:
+		aux_sgn=np.copy(lats)
+		
+		aux_sgn[aux_sgn>=0]=1
+		aux_sgn[aux_sgn<0]=-1
 	
-
-	rel_vort=rel_vort*aux_sgn
+	if pointwise_vorticity:
+		rel_vort=None
+	else:
+		rel_vort=calc_relvort(u=get_field(fields=fields,name="u"), v=get_field(fields=fields,name="v"), lon=lons, lat=lats, grid=grid)
+		rel_vort=rel_vort*aux_sgn
 	
 	
 	#if search_region in ("SA","SH","SI","SP"):
@@ -4216,68 +5829,62 @@ def get_low_centers(lats=np.array([None]),
 	
 	
 	
-	minlats, minlons, minmslp, minmslp_anoms, minterrain, minrelvort =get_maxmin_mslp_points(lats=lats, lons=lons,  mslp=mslp, mslp_anomaly=mslp_anomaly, hgt_field=hgt_field, rel_vort=rel_vort, extrema="min", nsize=25)
+	# the minima are only searched where the pressure, anomaly, terrain and region thresholds are met
+	if search_limits[0]> 180 or search_limits[2]>180:
+		lons_=np.where(lons<0,lons+360,lons)
+	else:
+		lons_=lons
+	thresholds=[("min_slp",mslp<=min_slp_threshold)]
+	if use_mslp_anomaly:
+		thresholds.append(("mslp_anomaly",~(mslp_anomaly>mslp_anomaly_threshold)))
+	if terrain_filter>0:
+		thresholds.append(("terrain",~(hgt_field>terrain_filter)))
+	thresholds.append(("search_limits",(lats<=search_limits[3]) & (lats>=search_limits[1]) & (lons_<=search_limits[2]) & (lons_>=search_limits[0])))
+	mask=np.logical_and.reduce([threshold for name,threshold in thresholds])
+
+	if extrema_window_km is None:
+		nsize=25
+	else:
+		nsize=get_extrema_window(extrema_window_km=extrema_window_km,model_res=model_res)
+
+	if mslp_smoothing_km>0:
+		search_mslp=sp.gaussian_filter(mslp,sigma=mslp_smoothing_km/model_res,mode='nearest')
+	else:
+		search_mslp=None
+
+	minlats, minlons, minmslp, minmslp_anoms, minterrain, minrelvort, miny, minx =get_maxmin_mslp_points(lats=lats, lons=lons,  mslp=mslp, mslp_anomaly=mslp_anomaly, hgt_field=hgt_field, rel_vort=rel_vort, extrema="min", nsize=nsize, return_index=True, mask=mask, search_field=search_mslp)
 	
 	
 
 	
 
 	
-	#print(minmslp)
-	if len(minmslp)>=1:
-	
-		bulk_amslp=np.copy(minmslp)
-		
-		bulk_amslp[minmslp>min_slp_threshold]=np.nan
-		if use_mslp_anomaly:
-			bulk_amslp[minmslp_anoms>mslp_anomaly_threshold]=np.nan
-		if terrain_filter>0:
-			bulk_amslp[minterrain>terrain_filter]=np.nan
-		
-		
-		if search_limits[0]> 180 or search_limits[2]>180:
-			minlons_=[]
-			for i in range(0, len(minlons)):
-				if minlons[i]<0:
-					minlons_=np.append(minlons_, minlons[i]+360)
-				else:
-					minlons_=np.append(minlons_, minlons[i])
-		else:
-			minlons_=np.copy(minlons)
-		
-		
-		bulk_amslp[minrelvort<vorticity_threshold]=np.nan
-		bulk_amslp[minlats>search_limits[3]]=np.nan
-		bulk_amslp[minlats<search_limits[1]]=np.nan
-		bulk_amslp[minlons_>search_limits[2]]=np.nan
-		bulk_amslp[minlons_<search_limits[0]]=np.nan
-		
-		
-		
-		nnmslp=minmslp[np.isfinite(bulk_amslp)]
-		nnlats=minlats[np.isfinite(bulk_amslp)]
-		nnlons=minlons[np.isfinite(bulk_amslp)]
-		
-		
-		
-		#bulk_amslp=np.copy(mslp_anomaly)
-		
-		#bulk_amslp[bulk_amslp>mslp_anomaly_threshold]=np.nan
-		#bulk_amslp[mslp>min_slp_threshold]=np.nan
-		#if terrain_filter>0:
-		#	bulk_amslp[hgt_field>terrain_filter]=np.nan
-		#bulk_amslp[rel_vort<vorticity_threshold]=np.nan
-		#bulk_amslp[lats>search_limits[3]]=np.nan
-		#bulk_amslp[lats<search_limits[1]]=np.nan
-		#bulk_amslp[lons>search_limits[2]]=np.nan
-		#bulk_amslp[lons<search_limits[0]]=np.nan
-		
+	if grid is None:
+		grid=get_grid_metrics(lats=lats,lons=lons)
 
+	# the minima outside the mask are only looked for to count the rejections of each threshold
+	if stats is not None:
+		count_threshold_rejections(field=mslp if search_mslp is None else search_mslp, thresholds=thresholds, nsize=nsize, stats=stats)
 
-		#nnmslp=mslp[np.isfinite(bulk_amslp)]
-		#nnlats=lats[np.isfinite(bulk_amslp)]
-		#nnlons=lons[np.isfinite(bulk_amslp)]
+	if len(minmslp)>=1:
 		
+		# the minima already meet the thresholds of the mask, the vorticity reads the winds
+		minima={"relvort":minrelvort,
+			"iy":miny,
+			"ix":minx,
+			"sgn":aux_sgn,
+			"fields":fields,
+			"grid":grid,
+			"pointwise_vorticity":pointwise_vorticity,
+			"vorticity_threshold":vorticity_threshold}
+
+		stages=[{"name":"vorticity","cost":20 if pointwise_vorticity else 1,"criterion":criterion_vorticity}]
+
+		icand=run_filter_cascade(stages=stages,state=minima,icand=np.arange(len(minmslp)),stats=stats)
+
+		nnmslp=minmslp[icand]
+		nnlats=minlats[icand]
+		nnlons=minlons[icand]
 		
 		nnroci=np.empty_like(nnlats)
 		nnroci[:]=0
@@ -4291,90 +5898,80 @@ def get_low_centers(lats=np.array([None]),
 		nncouter_r=np.empty_like(nnlats)
 		nncouter_r[:]=0
 
-		nlats, nlons,nroci,nmslp,nclosedp,nmws,nouter_r,centers_found=filter_centers(lats=nnlats,
+		nlats, nlons,nroci,nmslp,nclosedp,nmws,nouter_r,centers_found,kept=filter_centers(lats=nnlats,
 										lons=nnlons,
 										roci=nnroci,
 										pmin=nnmslp,
 										closedp=nnclosedp,
 										ff=nnmws,
 										outer_r=nncouter_r,
-										filter_center_threshold=filter_center_threshold)
-
-		for i in range(0, len(nmslp)):
-			dmslp,nlatc, nlonc, npmin=compute_dmslp(latc=nlats[i],
-								lonc=nlons[i],
-								lats=lats,
-								lons=lons,
-								mslp=mslp,
-								pmin=nmslp[i],
-								dang=d_ang,
-								dradius=model_res,
-								search_radius=great_circle_distance+100,
-								model_res=model_res,
-								great_circle_distance=great_circle_distance,
-								filter_center_threshold=.45*filter_center_threshold,
-								search_limits=search_limits)
-
-			
-			if dmslp*100 - npmin*100 >= dmslp_great_circle_distance:
-				
-				fwind_speed=get_wind_speed(latsc=[nlatc],
-						lonsc=[nlonc],
-						radius=[radius_for_msw],
-						wfile=sourcefile,
-						idir=idir,
-						varu=varu,
-						varv=varv,
-						varlat=varlat,
-						varlon=varlon,
-						source=source.upper(),
-						search_limits=search_limits,
-						search_region=search_region,
-						r_uv=False)
-
-
-				if fwind_speed[0] >= max_wind_speed_threshold:
-					
-					outer_size=compute_TC_size(latc=nlatc,
-							lonc=nlonc,
-							lats=lats,
-							lons=lons,
-							u=u,
-							v=v,
-							dradius=dr_res,
-							dang=d_ang,
-							search_radius=rout,
-							model_res=model_res,
-							outer_wind_speed_threshold=outer_wind_speed_threshold,
-							)
-
-					roci,closedp=compute_roci_RU(latc=nlatc,
-						lonc=nlonc,
-						lats=lats,
-						lons=lons,
-						mslp=mslp,
-						pmin=npmin,
-						dang=d_ang,
-						dradius=dr_res,
-						search_radius=rout,
-						model_res=model_res)
-				
-				
-					
-					if np.isnan(roci):roci=0
-					if np.isnan(closedp):closedp=0
-				
-				
-
-					if roci>=critical_outer_radius or closedp>=0:
-						center_lats=np.append(center_lats,nlatc)
-						center_lons=np.append(center_lons,nlonc)
-						outer_r=np.append(outer_r,outer_size)
-						mcp=np.append(mcp,npmin)
-						mws=np.append(mws,fwind_speed[0])
-						outer_p=np.append(outer_p,closedp)
-						croci=np.append(croci,roci)
-
+										filter_center_threshold=filter_center_threshold,
+										return_index=True)
+		if stats is not None:
+			stats["duplicates"]=stats.get("duplicates",0)+len(nnlats)-len(kept)
+
+		# criteria on the centres, each one only sees the candidates that passed the previous ones
+		ncenters=len(nlats)
+		centres={"lats":nlats,
+			"lons":nlons,
+			"pmin":nmslp,
+			"latc":np.full(ncenters,np.nan),
+			"lonc":np.full(ncenters,np.nan),
+			"npmin":np.full(ncenters,np.nan),
+			"mws":np.full(ncenters,np.nan),
+			"roci":np.full(ncenters,np.nan),
+			"closedp":np.full(ncenters,np.nan),
+			"mslp":mslp,
+			"fields":fields,
+			"grid":grid,
+			"model_res":model_res,
+			"d_ang":d_ang,
+			"dr_res":dr_res,
+			"rout":rout,
+			"great_circle_distance":great_circle_distance,
+			"dmslp_great_circle_distance":dmslp_great_circle_distance,
+			"filter_center_threshold":filter_center_threshold,
+			"search_limits":search_limits,
+			"radius_for_msw":radius_for_msw,
+			"max_wind_speed_threshold":max_wind_speed_threshold,
+			"critical_outer_radius":critical_outer_radius}
+
+		stages=[{"name":"dmslp","cost":10,"criterion":criterion_dmslp},
+			{"name":"max_wind","cost":2,"criterion":criterion_max_wind,"requires":["dmslp"]},
+			{"name":"roci","cost":5,"criterion":criterion_roci,"requires":["dmslp"]}]
+
+		icenters=run_filter_cascade(stages=stages,state=centres,icand=np.arange(ncenters),stats=stats)
+
+		if len(icenters)>0:
+			# the size is only measured for the centres that are kept
+			if wind_radii is None or not wind_radii_thresholds:
+				thresholds=None
+			else:
+				thresholds=wind_radii_thresholds
+			outer_size=compute_TC_size_batch(latc=centres["latc"][icenters],
+					lonc=centres["lonc"][icenters],
+					lats=lats,
+					lons=lons,
+					u=get_field(fields=fields,name="u"),
+					v=get_field(fields=fields,name="v"),
+					dradius=dr_res,
+					dang=d_ang,
+					search_radius=rout,
+					model_res=model_res,
+					outer_wind_speed_threshold=outer_wind_speed_threshold,
+					grid=grid,
+					wind_radii_thresholds=thresholds)
+			if thresholds is not None:
+				outer_size,radii=outer_size
+				wind_radii.extend(radii)
+
+			center_lats=np.append(center_lats,centres["latc"][icenters])
+			center_lons=np.append(center_lons,centres["lonc"][icenters])
+			outer_r=np.append(outer_r,outer_size)
+			mcp=np.append(mcp,centres["npmin"][icenters])
+			mws=np.append(mws,centres["mws"][icenters])
+			outer_p=np.append(outer_p,centres["closedp"][icenters])
+			croci=np.append(croci,centres["roci"][icenters])
 
 	return center_lats,center_lons,outer_r,mcp,mws,outer_p,croci
 
@@ -4384,6 +5981,7 @@ def haversine(lon1, lat1, lon2, lat2):
 	"""
 	Calculate the great circle distance between two points 
 	on the earth (specified in decimal degrees)
+	Kept only for backward compatibility, CyTRACK itself calls haversine_distance from cytrack_geodesic.
 
 	Parameters
 	----------
@@ -4401,18 +5999,7 @@ def haversine(lon1, lat1, lon2, lat2):
 	distance : float
 		Great circle distance in kilometers
 	"""
-	lon1 = np.deg2rad(lon1)
-	lon2 = np.deg2rad(lon2)
-	lat1 = np.deg2rad(lat1)
-	lat2 = np.deg2rad(lat2)
-
-	# haversine formula 
-	dlon = lon2 - lon1 
-	dlat = lat2 - lat1 
-	a = np.sin(dlat/2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon/2)**2
-	c = 2 * np.arcsin(np.sqrt(a)) 
-	r = 6371
-	return c * r
+	return haversine_distance(lat1=lat1,lon1=lon1,lat2=lat2,lon2=lon2)
 
 
 
@@ -4421,6 +6008,7 @@ def get_GCD(lon1, lat1, lonc, latc):
 	"""
 	Calculate the great circle distance between two points 
 	on the earth (specified in decimal degrees)
+	Kept only for backward compatibility, CyTRACK itself calls central_angle_distance from cytrack_geodesic.
 
 	Parameters
 	----------
@@ -4438,18 +6026,7 @@ def get_GCD(lon1, lat1, lonc, latc):
 	distance : float
 		Great circle distance in kilometers
 	"""
-	r = 6371
-	radlatc=latc*np.pi/180
-	radlonc=lonc*np.pi/180
-
-	radlat1=lat1*np.pi/180
-	radlon1=lon1*np.pi/100
-
-	a=np.sin(radlatc)*np.sin(radlat1) + np.cos(radlatc)*np.cos(radlat1)*np.cos(radlonc-radlon1)
-
-	gcd=r*np.arccos(a)
-
-	return gcd
+	return central_angle_distance(lat1=lat1,lon1=lon1,lat2=latc,lon2=lonc)
 
 
 
@@ -4655,7 +6232,8 @@ def compute_dmslp(latc=None,
 				model_res=20,
 				great_circle_distance=650,
 				filter_center_threshold=350,
-				search_limits=[None,None,None,None]
+				search_limits=[None,None,None,None],
+				grid=None
 				):
 
 
@@ -4690,6 +6268,8 @@ def compute_dmslp(latc=None,
 		Threshold for the MSLP difference to exclude points from the computation of the MSLP difference.
 	search_limits : list of float
 		The limits of the region to search for the minimum MSLP value.
+	grid : dict
+		Grid metrics returned by get_grid_metrics, used to find the grid points nearest to the polar coordinates (default is None).
 
 	Returns
 	-------
@@ -4702,76 +6282,129 @@ def compute_dmslp(latc=None,
 	float
 		The minimum MSLP value.
 	"""
-	distance=haversine(lon1=lons, lat1=lats, lon2=lonc, lat2=latc)
+	dmslp,latc,lonc,pmin=compute_dmslp_batch(latc=[latc],
+						lonc=[lonc],
+						lats=lats,
+						lons=lons,
+						mslp=mslp,
+						pmin=[pmin],
+						dang=dang,
+						dradius=dradius,
+						search_radius=search_radius,
+						model_res=model_res,
+						great_circle_distance=great_circle_distance,
+						filter_center_threshold=filter_center_threshold,
+						search_limits=search_limits,
+						grid=grid)
 
+	return dmslp[0], latc[0], lonc[0], pmin[0]
 
-	
-	#distance=get_GCD(lon1=lons, lat1=lats, lonc=lonc, latc=latc)
-	
-	
-	aux_mslp=np.copy(mslp)
-	
-	aux_mslp[distance<great_circle_distance]=np.nan
-	aux_mslp[distance>search_radius]=np.nan
 
-	dmslp=mslp[np.isfinite(aux_mslp)]
+def compute_dmslp_batch(latc=np.array(None),
+				lonc=np.array(None),
+				lats=np.array(None),
+				lons=np.array(None),
+				mslp=np.array(None),
+				pmin=np.array(None),
+				dang=10,
+				dradius=50,
+				search_radius=750,
+				model_res=20,
+				great_circle_distance=650,
+				filter_center_threshold=350,
+				search_limits=[None,None,None,None],
+				grid=None
+				):
+	"""
+	Compute the MSLP of the circular ring around several storm centers at once (see compute_dmslp).
 
+	The centers still moving are sampled together in a (centers x theta x radius) cube at each relocation step.
 
-	storm_centre=False
-	while storm_centre==False:
-		latp,lonp,radius,theta=polar_cords(latc=latc,
-					lonc=lonc,
-					dth=math.radians(dang),
-					dr=dradius,
-					search_radius=search_radius)
-		pointint=np.empty((len(latp.flatten()),2))
-		pointint[:,0]=lonp.flatten()
-		pointint[:,1]=latp.flatten()
+	Parameters
+	----------
+	latc : numpy array
+		Latitudes of the storm centers.
+	lonc : numpy array
+		Longitudes of the storm centers.
+	lats : numpy array
+		Array of latitudes of the grid.
+	lons : numpy array
+		Array of longitudes of the grid.
+	mslp : numpy array
+		Array of MSLP values.
+	pmin : numpy array
+		Minimum MSLP values of the storm centers.
+	dang : int
+		Angular distance between two consecutive points in the circular ring.
+	dradius : int
+		Radial distance between two consecutive points in the circular ring in the first step.
+	search_radius : int
+		Radius of the circular ring to search for the minimum MSLP value.
+	model_res : int
+		Resolution of the model, used as radial distance after the first relocation.
+	great_circle_distance : int
+		Radius of the circular ring to exclude from the computation of the MSLP difference.
+	filter_center_threshold : int
+		Maximum distance to relocate the centers.
+	search_limits : list of float
+		The limits of the region to search for the minimum MSLP value.
+	grid : dict
+		Grid metrics returned by get_grid_metrics (default is None).
+
+	Returns
+	-------
+	numpy array
+		The mean MSLP of the circular ring around each storm center.
+	numpy array
+		The latitudes of the storm centers.
+	numpy array
+		The longitudes of the storm centers.
+	numpy array
+		The minimum MSLP values.
+	"""
+	if grid is None:
+		grid=get_grid_metrics(lats=lats,lons=lons)
+
+	latc=np.array(latc,dtype=float)
+	lonc=np.array(lonc,dtype=float)
+	pmin=np.array(pmin,dtype=np.promote_types(np.asarray(pmin).dtype,np.asarray(mslp).dtype))
+	dmslp=np.full(len(latc),np.nan,dtype=pmin.dtype)
+
+	# the centres are moved to the lowest MSLP within filter_center_threshold until they stop moving
+	# (pmin decreases at each step), and the ring is then sampled around the final centres
+	active=np.arange(len(latc))
+	while len(active)>0:
+		sampler=get_polar_sampler(latc=latc[active],
+					lonc=lonc[active],
+					dang=dang,
+					dradius=dradius,
+					search_radius=search_radius,
+					grid=grid)
+		radius=sampler["radius"]
+		pminp=sample_grid_field(field=mslp,sampler=sampler)
 
-		pointdata=np.empty((len(lats.flatten()),2))
-		pointdata[:,0]=lons.flatten()
-		pointdata[:,1]=lats.flatten()
+		npminp=np.copy(pminp)
+		npminp[:,:,radius>filter_center_threshold]=10000
+		npminp=npminp.reshape(len(active),-1)
 
-		pminp=griddata(pointdata, mslp.flatten(), pointint, method='nearest')
-		pminp=pminp.reshape(int(latp.shape[0]),int(latp.shape[1]))
+		rows=np.arange(len(active))
+		imin=np.argmin(npminp,axis=1)
+		npmin=npminp[rows,imin]
+		nlatc=sampler["lats"].reshape(len(active),-1)[rows,imin]
+		nlonc=sampler["lons"].reshape(len(active),-1)[rows,imin]
 
+		moved=(npmin<pmin[active])&(search_limits[1]<nlatc)&(nlatc<search_limits[3])&(search_limits[0]<nlonc)&(nlonc<search_limits[2])
 
-		nradius,ntheta=np.meshgrid(radius,theta)
-		npminp=np.copy(pminp)
-		npminp[nradius>filter_center_threshold]=10000
-
-		ii,jj=np.where(npminp==npminp.min())
-		ii=int(ii[0])
-		jj=int(jj[0])
-		npmin=npminp[ii,jj]
-		nlatc=latp[ii,jj]
-		nlonc=lonp[ii,jj]
-
-		if  npmin<pmin and search_limits[1]<nlatc<search_limits[3] and search_limits[0]<nlonc<search_limits[2]:
-			pmin=npmin
-			latc=nlatc
-			lonc=nlonc
-			storm_centre=True
-			dmslp,latc, lonc, pmin=compute_dmslp(latc=latc,
-												lonc=lonc,
-												lats=lats,
-												lons=lons,
-												mslp=mslp,
-												pmin=pmin,
-												dang=dang,
-												dradius=model_res,
-												search_radius=search_radius,
-												model_res=model_res,
-												great_circle_distance=great_circle_distance,
-												filter_center_threshold=filter_center_threshold,
-												search_limits=search_limits
-							)
-		else:
+		ring=pminp[~moved][:,:,radius>great_circle_distance]
+		dmslp[active[~moved]]=np.mean(ring.reshape(ring.shape[0],ring.shape[1]*ring.shape[2]),axis=1)
 
-			storm_centre=True
-			dmslp=pminp[nradius>great_circle_distance]
+		pmin[active[moved]]=npmin[moved]
+		latc[active[moved]]=nlatc[moved]
+		lonc[active[moved]]=nlonc[moved]
+		active=active[moved]
+		dradius=model_res
 
-	return np.mean(dmslp), latc, lonc, pmin
+	return dmslp, latc, lonc, pmin
 
 
 def relocate_critical_centres(latc=None,
@@ -4786,7 +6419,8 @@ def relocate_critical_centres(latc=None,
 							model_res=20,
 							great_circle_distance=650,
 							filter_center_threshold=350,
-							search_limits=[None,None,None,None]):
+							search_limits=[None,None,None,None],
+							grid=None):
 
 	
 	"""
@@ -4820,6 +6454,8 @@ def relocate_critical_centres(latc=None,
 		Threshold for the MSLP difference to exclude points from the computation of the MSLP difference.
 	search_limits : list of float
 		The limits of the region to search for the minimum MSLP value.
+	grid : dict
+		Grid metrics returned by get_grid_metrics, used to find the grid points nearest to the polar coordinates (default is None).
 
 	Returns
 	-------
@@ -4830,21 +6466,17 @@ def relocate_critical_centres(latc=None,
 	float
 		The longitude of the storm center.
 	"""
-	latp,lonp,radius,theta=polar_cords(latc=latc,
-					lonc=lonc,
-					dth=math.radians(dang),
-					dr=dradius,
-					search_radius=search_radius)
-	pointint=np.empty((len(latp.flatten()),2))
-	pointint[:,0]=lonp.flatten()
-	pointint[:,1]=latp.flatten()
+	if grid is None:
+		grid=get_grid_metrics(lats=lats,lons=lons)
 
-	pointdata=np.empty((len(lats.flatten()),2))
-	pointdata[:,0]=lons.flatten()
-	pointdata[:,1]=lats.flatten()
-
-	pminp=griddata(pointdata, mslp.flatten(), pointint, method='nearest')
-	pminp=pminp.reshape(int(latp.shape[0]),int(latp.shape[1]))
+	sampler=get_polar_sampler(latc=latc,
+				lonc=lonc,
+				dang=dang,
+				dradius=dradius,
+				search_radius=search_radius,
+				grid=grid)
+	latp,lonp,radius,theta=sampler["lats"],sampler["lons"],sampler["radius"],sampler["theta"]
+	pminp=sample_grid_field(field=mslp,sampler=sampler)
 
 
 	nradius,ntheta=np.meshgrid(radius,theta)
@@ -4873,7 +6505,9 @@ def compute_TC_size(latc=None,
 		dang=5,
 		search_radius=2000,
 		model_res=20,
-		outer_wind_speed_threshold=2.5
+		outer_wind_speed_threshold=2.5,
+		grid=None,
+		sampler=None
 		):
 	
 	"""
@@ -4903,81 +6537,228 @@ def compute_TC_size(latc=None,
 		Resolution of the model.
 	outer_wind_speed_threshold : float
 		Wind speed threshold to consider as the outermost closed wind speed contour.
+	grid : dict
+		Grid metrics returned by get_grid_metrics, used to find the grid points nearest to the polar coordinates (default is None).
+	sampler : dict
+		Polar sampling operator around the center returned by get_polar_sampler, built with dang, dradius and search_radius.
+		If None, it is built here (default is None).
 
 	Returns
 	-------
 	float
 		Size of the tropical cyclone.
 	"""
-	latp,lonp,radius,theta=polar_cords(latc=latc,
-					lonc=lonc,
-					dth=math.radians(dang),
-					dr=dradius,
-					search_radius=search_radius)
-	pointint=np.empty((len(latp.flatten()),2))
-	pointint[:,0]=lonp.flatten()
-	pointint[:,1]=latp.flatten()
-
-	pointdata=np.empty((len(lats.flatten()),2))
-	pointdata[:,0]=lons.flatten()
-	pointdata[:,1]=lats.flatten()
-
-	uint=griddata(pointdata, u.flatten(), pointint, method='nearest')
-	uint=uint.reshape(int(latp.shape[0]),int(latp.shape[1]))
+	outer_size=compute_TC_size_batch(latc=[latc],
+					lonc=[lonc],
+					lats=lats,
+					lons=lons,
+					u=u,
+					v=v,
+					dradius=dradius,
+					dang=dang,
+					search_radius=search_radius,
+					model_res=model_res,
+					outer_wind_speed_threshold=outer_wind_speed_threshold,
+					grid=grid,
+					sampler=sampler)
+
+	return outer_size[0]
+
+
+def compute_TC_size_batch(latc=np.array(None),
+		lonc=np.array(None),
+		lats=np.array(None),
+		lons=np.array(None),
+		u=np.array(None),
+		v=np.array(None),
+		dradius=100,
+		dang=5,
+		search_radius=2000,
+		model_res=20,
+		outer_wind_speed_threshold=2.5,
+		grid=None,
+		sampler=None,
+		wind_radii_thresholds=None
+		):
+	"""
+	Compute the size of several tropical cyclones at once (see compute_TC_size). The size is measured
+	on the cyclonic tangential wind (see get_storm_relative_winds), and the quadrant wind radii are
+	computed from the same samples when wind_radii_thresholds is given.
 
-	vint=griddata(pointdata, v.flatten(), pointint, method='nearest')
-	vint=vint.reshape(int(latp.shape[0]),int(latp.shape[1]))
+	Parameters
+	----------
+	latc : numpy array
+		Latitudes of the cyclone centers.
+	lonc : numpy array
+		Longitudes of the cyclone centers.
+	lats : numpy array
+		Array of latitudes of the grid.
+	lons : numpy array
+		Array of longitudes of the grid.
+	u : numpy array
+		Array of u-wind components.
+	v : numpy array
+		Array of v-wind components.
+	dradius : int
+		Radial distance between two consecutive points in the circular ring.
+	dang : int
+		Angular distance between two consecutive points in the circular ring.
+	search_radius : int
+		Radius of the circular ring to search for the minimum wind speed.
+	model_res : int
+		Resolution of the model.
+	outer_wind_speed_threshold : float
+		Wind speed threshold to consider as the outermost closed wind speed contour.
+	grid : dict
+		Grid metrics returned by get_grid_metrics (default is None).
+	sampler : dict
+		Polar sampling operator around the centers returned by get_polar_sampler, built with dang, dradius and search_radius.
+		If None, it is built here (default is None).
+	wind_radii_thresholds : list of float
+		Wind speed thresholds in m/s of the quadrant wind radii, e.g. [17, 26, 33] (default is None, no wind radii).
 
-	nradius,ntheta=np.meshgrid(radius,theta)
+	Returns
+	-------
+	numpy array
+		Size of each tropical cyclone.
+	numpy array
+		Only if wind_radii_thresholds is given. Wind radii in km with shape (ncenters, len(wind_radii_thresholds), 4),
+		see get_wind_radii.
+	"""
+	if sampler is None:
+		if grid is None:
+			grid=get_grid_metrics(lats=lats,lons=lons)
+		sampler=get_polar_sampler(latc=latc,
+					lonc=lonc,
+					dang=dang,
+					dradius=dradius,
+					search_radius=search_radius,
+					grid=grid)
+	radius,theta=sampler["radius"],sampler["theta"]
+	uint=sample_grid_field(field=u,sampler=sampler).reshape(-1,len(theta),len(radius))
+	vint=sample_grid_field(field=v,sampler=sampler).reshape(-1,len(theta),len(radius))
+	ncenters=uint.shape[0]
 
 	ffint=np.sqrt(uint**2+vint**2)
+	va,vr=get_storm_relative_winds(u=uint,
+				v=vint,
+				latc=latc,
+				lonc=lonc,
+				latp=sampler["lats"],
+				lonp=sampler["lons"])
+
+	# each leg is searched from its wind maximum outwards
+	legs=va.reshape(-1,len(radius))
+	imax=np.argmax(legs,axis=1)
+	outwards=np.arange(len(radius))>=imax[:,np.newaxis]
+	navmin=np.where(outwards,legs,np.inf).min(axis=1)
+	navmax=np.where(outwards,legs,-np.inf).max(axis=1)
+	thr=outer_wind_speed_threshold
+
+	crossing=(navmin<=thr)&(thr<=navmax)
+	radius_out=interpolate_legs(x=np.where(outwards,legs,np.inf),y=radius,xnew=np.full(len(legs),float(thr)))
+	below=outwards&(legs<=thr)
+	first_below=radius[np.argmax(below,axis=1)]
+
+	radial_i=np.where(crossing,radius_out,np.where(legs[:,-1]>thr,radius[-1],first_below))
+	valid=np.where(crossing,imax<len(radius)-1,(legs[:,-1]>thr)|below.any(axis=1))
+	radial_i=np.where(valid,radial_i,np.nan).reshape(ncenters,len(theta))
+
+	outer_size=np.nanmean(radial_i,axis=1)
+	outer_size[outer_size<=0]=-9999
+
+	if wind_radii_thresholds:
+		return outer_size, get_wind_radii(ff=ffint,radius=radius,theta=theta,thresholds=wind_radii_thresholds)
+	return outer_size
+
+
+def get_storm_relative_winds(u=np.array(None),
+		v=np.array(None),
+		latc=np.array(None),
+		lonc=np.array(None),
+		latp=np.array(None),
+		lonp=np.array(None)):
+	"""
+	Split the wind sampled around several centres into its tangential and radial components.
+	The radial direction at each sample is the bearing from the centre to the sample, taken at the sample.
 
+	Parameters
+	----------
+	u : numpy array
+		u-wind components at the samples, with shape (ncenters, ...).
+	v : numpy array
+		v-wind components at the samples, with the shape of u.
+	latc : numpy array
+		Latitudes of the centres.
+	lonc : numpy array
+		Longitudes of the centres.
+	latp : numpy array
+		Latitudes of the samples, with the shape of u.
+	lonp : numpy array
+		Longitudes of the samples, with the shape of u.
 
-	va=np.empty_like(vint)
-	for i in range(0,uint.shape[0]):
-		for j in range(0,uint.shape[1]):
-			wind_vec_dir=math.atan(uint[i,j]/vint[i,j])
-			va[i,j]=ffint[i,j]*math.cos(wind_vec_dir)
-
+	Returns
+	-------
+	vt : numpy array
+		Tangential wind, positive for cyclonic rotation (counterclockwise in the Northern Hemisphere
+		and clockwise in the Southern Hemisphere).
+	vr : numpy array
+		Radial wind, positive outwards.
+	"""
+	latp=np.asarray(latp,dtype=float)
+	latc=np.asarray(latc,dtype=float)
+	latc=latc.reshape(latc.shape+(1,)*(latp.ndim-latc.ndim))
+	lonc=np.asarray(lonc,dtype=float).reshape(latc.shape)
 
+	outward=np.deg2rad(initial_bearing(lat1=latp,lon1=lonp,lat2=latc,lon2=lonc)+180)
+	sinb=np.sin(outward)
+	cosb=np.cos(outward)
 
+	vr=u*sinb+v*cosb
+	vt=(v*sinb-u*cosb)*np.where(latc<0,-1,1)
+	return vt, vr
 
-	radial_i=[]
-	for i in range(0,nradius.shape[0]):
-		leg=va[i,:]
-		
-		
-		imax=np.where(leg==leg.max())
-		imax=int(imax[0][0])
-	
-		nav=leg[imax:]
-		radii=nradius[i,imax:]
-	
-		if nav.min()<=outer_wind_speed_threshold<=nav.max():
-			try:
-				finterpolate = interpolate.interp1d(nav, radii)
-				radius_out=finterpolate(outer_wind_speed_threshold)
-				radial_i=np.append(radial_i,radius_out) 
-			except:
-				pass
-		elif nav[-1]>outer_wind_speed_threshold:
-			radial_i=np.append(radial_i,radii[-1])
 
-		else:
-			ii=np.where(nav<=outer_wind_speed_threshold)
+def get_wind_radii(ff=np.array(None),radius=np.array(None),theta=np.array(None),thresholds=[17,26,33]):
+	"""
+	Compute the quadrant wind radii of several centres from the wind speed sampled on polar legs.
+	The radius of a leg is the outermost distance at which the wind speed reaches the threshold, linearly
+	interpolated to the next sample, and the radius of a quadrant is the largest radius of its legs.
 
-			if len(ii[0])>=1:
-		
-				radial_i=np.append(radial_i,radii[int(ii[0][0])])
-		
-	outer_size= np.mean(radial_i)
-	
-	
+	Parameters
+	----------
+	ff : numpy array
+		Wind speed in m/s with shape (ncenters, len(theta), len(radius)).
+	radius : numpy array
+		Distances of the samples to the centre in km.
+	theta : numpy array
+		Angles of the legs in radians, counterclockwise from east (see polar_cords).
+	thresholds : list of float
+		Wind speed thresholds in m/s (default is [17, 26, 33]).
 
-	if outer_size<=0:
-		outer_size=-9999
+	Returns
+	-------
+	numpy array
+		Wind radii in km with shape (ncenters, len(thresholds), 4). The quadrants are NE, SE, SW and NW,
+		by the bearing of the legs from the centre, and are 0 where the wind does not reach the threshold.
+	"""
+	nradius=len(radius)
+	quadrant=((90-np.degrees(theta))%360//90).astype(int)
+	radii=np.zeros((ff.shape[0],len(thresholds),4))
 
-	return outer_size	
+	for k,thr in enumerate(thresholds):
+		above=ff>=thr
+		last=nradius-1-np.argmax(above[...,::-1],axis=-1)
+		after=np.minimum(last+1,nradius-1)
+		f_last=np.take_along_axis(ff,last[...,np.newaxis],axis=-1)[...,0]
+		f_after=np.take_along_axis(ff,after[...,np.newaxis],axis=-1)[...,0]
+		with np.errstate(invalid='ignore',divide='ignore'):
+			frac=np.where((after>last)&(f_after<f_last),(f_last-thr)/(f_last-f_after),0)
+		leg_radii=np.where(above.any(axis=-1),radius[last]+frac*(radius[after]-radius[last]),0)
+		for q in range(0,4):
+			radii[:,k,q]=np.where(quadrant==q,leg_radii,0).max(axis=1)
+
+	return radii
 
 
 
@@ -4989,7 +6770,9 @@ def compute_roci_RU(latc=None,
 		pmin=None,dang=10,
 		dradius=100,
 		search_radius=2000,
-		model_res=20):
+		model_res=20,
+		grid=None,
+		sampler=None):
 
 	
 	"""
@@ -5018,6 +6801,11 @@ def compute_roci_RU(latc=None,
 		Radius of the circular ring to search for the minimum mean sea level pressure value.
 	model_res : int
 		Resolution of the model.
+	grid : dict
+		Grid metrics returned by get_grid_metrics, used to find the grid points nearest to the polar coordinates (default is None).
+	sampler : dict
+		Polar sampling operator around the center returned by get_polar_sampler, built with dang and dradius.
+		It is used while the search radius is the one of the operator (default is None).
 
 	Returns
 	-------
@@ -5027,120 +6815,198 @@ def compute_roci_RU(latc=None,
 	closedp : float
 		Pressure value of the outermost closed isobar.
 	"""
-	outerp=900
-	outerp_found=False
-	while outerp<pmin:
+	roci,closedp=compute_roci_RU_batch(latc=[latc],
+				lonc=[lonc],
+				lats=lats,
+				lons=lons,
+				mslp=mslp,
+				pmin=[pmin],
+				dang=dang,
+				dradius=dradius,
+				search_radius=search_radius,
+				model_res=model_res,
+				grid=grid,
+				sampler=sampler)
+
+	return roci[0], closedp[0]
+
+
+def compute_roci_RU_batch(latc=np.array(None),
+		lonc=np.array(None),
+		lats=np.array(None),
+		lons=np.array(None),
+		mslp=np.array(None),
+		pmin=np.array(None),
+		dang=10,
+		dradius=100,
+		search_radius=2000,
+		model_res=20,
+		grid=None,
+		sampler=None):
+	"""
+	Compute the ROCI of several cyclones at once (see compute_roci_RU).
+
+	Parameters
+	----------
+	latc : numpy array
+		Latitudes of the cyclone centers.
+	lonc : numpy array
+		Longitudes of the cyclone centers.
+	lats : numpy array
+		Array of latitudes of the grid points.
+	lons : numpy array
+		Array of longitudes of the grid points.
+	mslp : numpy array
+		Array of mean sea level pressure values.
+	pmin : numpy array
+		Minimum mean sea level pressure values of the cyclones.
+	dang : int
+		Angular distance between two consecutive points in the circular ring.
+	dradius : int
+		Radial distance between two consecutive points in the circular ring.
+	search_radius : int
+		Radius of the circular ring to search for the minimum mean sea level pressure value.
+	model_res : int
+		Resolution of the model.
+	grid : dict
+		Grid metrics returned by get_grid_metrics (default is None).
+	sampler : dict
+		Polar sampling operator around the centers returned by get_polar_sampler, built with dang and dradius.
+		It is used if its search radius is not shorter than search_radius (default is None).
+
+	Returns
+	-------
+	roci : numpy array
+		Radius of the outermost closed isobar of each cyclone.
+	closedp : numpy array
+		Pressure value of the outermost closed isobar of each cyclone.
+	"""
+	if sampler is None or sampler["search_radius"]<search_radius or sampler["dang"]!=dang or sampler["dradius"]!=dradius:
+		if grid is None:
+			grid=get_grid_metrics(lats=lats,lons=lons)
+		sampler=get_polar_sampler(latc=latc,
+					lonc=lonc,
+					dang=dang,
+					dradius=dradius,
+					search_radius=search_radius,
+					grid=grid)
+	theta=sampler["theta"]
+	ntheta=len(theta)
+	pminp_max=sample_grid_field(field=mslp,sampler=sampler).reshape(-1,ntheta,len(sampler["radius"]))
+	pmin=np.asarray(pmin)
+	ncenters=len(pmin)
+
+	# the search radius is reduced while the outermost ring is below the central pressure; the legs of
+	# a shorter search radius are the first points of the legs sampled at the maximum radius
+	nradius=np.zeros(ncenters,dtype=int)
+	outerp=np.full(ncenters,900.)
+	outerp_found=np.zeros(ncenters,dtype=bool)
+	active=outerp<pmin
+	while active.any():
 		if search_radius>=1.5*dradius:
-			latp,lonp,radius,theta=polar_cords(latc=latc,
-						lonc=lonc,
-						dth=math.radians(dang),
-						dr=dradius,
-						search_radius=search_radius)
-			pointint=np.empty((len(latp.flatten()),2))
-			pointint[:,0]=lonp.flatten()
-			pointint[:,1]=latp.flatten()
-
-			pointdata=np.empty((len(lats.flatten()),2))
-			pointdata[:,0]=lons.flatten()
-			pointdata[:,1]=lats.flatten()
-
-			pminp=griddata(pointdata, mslp.flatten(), pointint, method='nearest')
-			pminp=pminp.reshape(int(latp.shape[0]),int(latp.shape[1]))
-		
-			outsp=[]
-			for i in range(0,pminp.shape[0]):
-				leg=pminp[i,:]
-				if len(leg)>2:
-					outsp=np.append(outsp,leg[-1])
-					outerp_found=True
-			outerp=np.min(outsp)
+			nr=len(np.arange(0,search_radius+dradius,dradius))
+			nradius[active]=nr
+			outerp[active]=np.min(pminp_max[active,:,nr-1],axis=1)
+			outerp_found[active]=True
 			search_radius=search_radius-dradius
 		else:
-			outerp_found=False
+			outerp_found[active]=False
 			break
+		active=active&(outerp<pmin)
 
-	
-	if outerp>pmin and outerp_found==True:
-		nradius,ntheta=np.meshgrid(radius,theta)
-		
-			
-		critical_rad=[]
-		critical_p=[]
-		if model_res>50:
-			bint=1
-		else:
-			bint=3
-
-		for i in range(1,nradius.shape[0]):
-			leg=pminp[i,:]
-			legdr=nradius[i,:]
-			check=False
-			for j in range(bint,len(leg)-1):
-				if  0<=leg[j]-leg[j-1]<=0.00001 and check==False:
-					critical_rad=np.append(critical_rad,legdr[j])
-					critical_p=np.append(critical_p,leg[j])
-					check=True
-			if check==False:
-				critical_rad=np.append(critical_rad,legdr[-1])
-				critical_p=np.append(critical_p,leg[-1])
-
-		closedp=critical_p.min()
-		radius_i=[]
-		critical_lat=[]
-		critical_lon=[]
-
-		for i in range(0,nradius.shape[0]):
-			leg=pminp[i,:]
-			legdr=nradius[i,:]
-			if closedp<leg.min():
-				contour_p=leg.min()
-			elif closedp>leg.max():
-				contour_p=leg.max()
-			else:
-				contour_p=closedp
-		
-			if len(leg)<2:
-				return np.nan,np.nan
-			else:
-				finterpolate = interpolate.interp1d(leg, legdr)
-				radius_closedp=finterpolate(contour_p)
-				radius_i=np.append(radius_i,radius_closedp)
-			
-			dp=np.abs(leg-closedp)
-			ind=np.where(dp==dp.min())
-			if len(ind[0])>1:
-				ind=int(ind[0][-1])
-			else:
-				ind=int(ind[0])
-			critical_lat=np.append(critical_lat,latp[i,ind])
-			critical_lon=np.append(critical_lon,lonp[i,ind])
+	if model_res>50:
+		bint=1
+	else:
+		bint=3
 
-		SmArea=[]
-		for i in range(1,len(critical_rad)):
-			SmArea=np.append(SmArea,calc_area(radius_i[i-1],radius_i[i],theta[i]-theta[i-1]))
+	roci=np.zeros(ncenters)
+	closedp=np.zeros(ncenters)
+	closed=(outerp>pmin)&outerp_found
+	for nr in np.unique(nradius[closed]):
+		group=np.where(closed&(nradius==nr))[0]
+		radius=sampler["radius"][:nr]
+		pminp=pminp_max[group,:,:nr]
 
-		sumaArea=np.sum(SmArea)
-		roci=np.sqrt(sumaArea/np.pi)
-	else:
-		roci=0
-		closedp=0
-	if closedp<pmin:
-		roci=0
-		closedp=0
+		# first point of each leg (except the first one) where the pressure stops decreasing
+		legs=pminp[:,1:,:]
+		check=np.diff(legs,axis=2)[:,:,bint-1:-1]
+		check=(check>=0)&(check<=0.00001)
+		critical_p=legs[:,:,-1]
+		if check.shape[2]>0:
+			first=np.argmax(check,axis=2)+bint
+			critical_p=np.where(check.any(axis=2),np.take_along_axis(legs,first[:,:,np.newaxis],axis=2)[:,:,0],critical_p)
+
+		gclosedp=critical_p.min(axis=1)
+
+		legmin=pminp.min(axis=2)
+		legmax=pminp.max(axis=2)
+		contour_p=np.where(gclosedp[:,np.newaxis]<legmin,legmin,np.where(gclosedp[:,np.newaxis]>legmax,legmax,gclosedp[:,np.newaxis]))
+		radius_i=interpolate_legs(x=pminp.reshape(-1,nr),y=radius,xnew=contour_p.ravel()).reshape(len(group),ntheta)
+
+		SmArea=calc_area(radius_i[:,:ntheta-2],radius_i[:,1:ntheta-1],theta[1:ntheta-1]-theta[:ntheta-2])
+
+		sumaArea=np.sum(SmArea,axis=1)
+		roci[group]=np.sqrt(sumaArea/np.pi)
+		closedp[group]=gclosedp
+
+	roci[closedp<pmin]=0
+	closedp[closedp<pmin]=0
 	
 	return roci, closedp
 
 
+def interpolate_legs(x=np.array(None),y=np.array(None),xnew=np.array(None)):
+	"""
+	Linearly interpolate y(x) along each leg of a polar grid at one value per leg.
+	It gives the same results as calling scipy.interpolate.interp1d(x[i],y)(xnew[i]) leg by leg, with xnew[i] within the range of x[i].
+
+	Parameters
+	----------
+	x : numpy.ndarray
+		2D array of the values of the legs, with shape (nlegs, npoints). They do not need to be sorted.
+	y : numpy.ndarray
+		Coordinates along the legs, with shape (npoints,) or (nlegs, npoints).
+	xnew : numpy.ndarray
+		Value to interpolate in each leg, with shape (nlegs,).
+
+	Returns
+	-------
+	numpy.ndarray
+		Interpolated coordinate of each leg.
+	"""
+	order=np.argsort(x,axis=1,kind="mergesort")
+	x=np.take_along_axis(x,order,axis=1)
+	y=np.take_along_axis(np.broadcast_to(y,x.shape),order,axis=1)
+
+	y=y.astype(float)
+
+	# same steps as numpy.interp, which interp1d uses for linear interpolation
+	# (repeated values and the inf padding of the legs give inf-inf and x/0, handled below)
+	rows=np.arange(x.shape[0])
+	lo=np.clip(np.sum(x<=xnew[:,np.newaxis],axis=1)-1,0,x.shape[1]-2)
+	hi=lo+1
+	x_lo=x[rows,lo]
+	y_lo=y[rows,lo]
+	with np.errstate(invalid='ignore',divide='ignore'):
+		slope=(y[rows,hi]-y_lo)/(x[rows,hi]-x_lo)
+		ynew=slope*(xnew-x_lo)+y_lo
+		ynew=np.where(np.isnan(ynew),slope*(xnew-x[rows,hi])+y[rows,hi],ynew)
+	ynew=np.where(np.isnan(ynew)&(y_lo==y[rows,hi]),y_lo,ynew)
+	ynew=np.where(x_lo==xnew,y_lo,ynew)
+	ynew=np.where(xnew==x[:,-1],y[:,-1],ynew)
+	return ynew
+
+
 def polar_cords(latc=None,lonc=None,dth=np.pi/256,dr=0.5,search_radius=2000):
 	"""
 	Generate polar coordinates (latitude and longitude arrays) for a given center point.
 
 	Parameters
 	----------
-	latc : float, optional
-		Latitude of the center point (default is None).
-	lonc : float, optional
-		Longitude of the center point (default is None).
+	latc : float or numpy.ndarray, optional
+		Latitude of the center point, or latitudes of several center points (default is None).
+	lonc : float or numpy.ndarray, optional
+		Longitude of the center point, or longitudes of several center points (default is None).
 	dth : float, optional
 		Angular step in radians for theta (default is np.pi/256).
 	dr : float, optional
@@ -5151,26 +7017,56 @@ def polar_cords(latc=None,lonc=None,dth=np.pi/256,dr=0.5,search_radius=2000):
 	Returns
 	-------
 	lat : numpy.ndarray
-		Array of latitudes in polar coordinates.
+		Array of latitudes in polar coordinates, with shape (len(theta), len(radius)), or (ncenters, len(theta), len(radius))
+		for several center points.
 	lon : numpy.ndarray
-		Array of longitudes in polar coordinates.
+		Array of longitudes in polar coordinates, with the shape of lat.
 	radius : numpy.ndarray
 		Array of radial distances in kilometers from the center point.
 	theta : numpy.ndarray
 		Array of angular coordinates in radians.
 	"""
+	dlat,dlon,radius,theta=get_polar_template(dth=dth,dr=dr,search_radius=search_radius)
+	lat=dlat+np.reshape(latc,np.shape(latc)+(1,1))
+	lon=dlon+np.reshape(lonc,np.shape(lonc)+(1,1))
+
+	return lat,lon,radius,theta
+
+@functools.lru_cache(maxsize=32)
+def get_polar_template(dth=np.pi/256,dr=0.5,search_radius=2000):
+	"""
+	Generate the latitude and longitude offsets of the polar coordinates used by polar_cords.
+	The offsets only depend on the angular and radial steps, so they are computed once and cached.
+
+	Parameters
+	----------
+	dth : float, optional
+		Angular step in radians for theta (default is np.pi/256).
+	dr : float, optional
+		Radial step in kilometers for radius (default is 0.5).
+	search_radius : int, optional
+		Maximum search radius in kilometers (default is 2000).
+
+	Returns
+	-------
+	dlat : numpy.ndarray
+		Read-only array of latitude offsets, with shape (len(theta), len(radius)).
+	dlon : numpy.ndarray
+		Read-only array of longitude offsets, with shape (len(theta), len(radius)).
+	radius : numpy.ndarray
+		Read-only array of radial distances in kilometers from the center point.
+	theta : numpy.ndarray
+		Read-only array of angular coordinates in radians.
+	"""
 	theta=np.arange(0,2*np.pi+dth,dth)
 	radius=np.arange(0,search_radius+dr,dr)
-	lat=np.empty((len(theta),len(radius)))
-	lon=np.empty((len(theta),len(radius)))
-	for k in range(0,len(theta)):
-
-		for j in range(0,len(radius)):
-				radii=radius[j]/111
-				lon[k,j]=radii*np.cos(theta[k])+lonc
-				lat[k,j]=radii*np.sin(theta[k])+latc
+	radii=radius[np.newaxis,:]/111
+	dlon=radii*np.cos(theta)[:,np.newaxis]
+	dlat=radii*np.sin(theta)[:,np.newaxis]
+	for array in (dlat,dlon,radius,theta):
+		array.setflags(write=False)
 
-	return lat,lon,radius,theta
+	return dlat,dlon,radius,theta
 
 def calc_area(a=0,b=0,ang=0):
 	"""
@@ -5199,49 +7095,25 @@ def geo_distance(lat1=None, lon1=None, lat2=None, lon2=None):
 	
 	"""
 	Calculate the great circle distance between two points on the earth (specified in decimal degrees)
+	Kept only for backward compatibility, CyTRACK itself calls central_angle_distance from cytrack_geodesic.
 	
 	Parameters
 	----------
-	lat1 : float
+	lat1 : float or numpy array
 		latitude of the first point
-	lon1 : float
+	lon1 : float or numpy array
 		longitude of the first point
-	lat2 : float
+	lat2 : float or numpy array
 		latitude of the second point
-	lon2 : float
+	lon2 : float or numpy array
 		longitude of the second point
 	
 	Returns
 	-------
-	distance : float
+	distance : float or numpy array
 		great circle distance in kilometers
 	"""
-	EARTHRADIUS = 6371 
-	lat1 = 90 - lat1
-	lat2 = 90 - lat2
-	lon1 = 180 + lon1
-	lon2 = 180 + lon2
-
-	la1 = (np.pi / 180) * lat1
-	la2 = (np.pi / 180) * lat2
-	lo1 = (np.pi / 180) * lon1
-	lo2 = (np.pi / 180) * lon2
-	
-	x1 = np.sin(la1) * np.cos(lo1)
-	y1 = np.sin(la1) * np.sin(lo1)
-	z1= np.cos(la1)
-
-	x2 = np.sin(la2) * np.cos(lo2)
-	y2 = np.sin(la2) * np.sin(lo2)
-	z2 = np.cos(la2)
-
-	dotp = x1 * x2 + y1 * y2 + z1 * z2
-	if dotp>1:
-		dotp=1
-	angle = math.acos(dotp)
-	dist = angle * EARTHRADIUS
-
-	return dist
+	return central_angle_distance(lat1=lat1,lon1=lon1,lat2=lat2,lon2=lon2)
 
 def tmp_data_loadt(data_file):
 	"""
@@ -5268,6 +7140,35 @@ def tmp_data_loadt(data_file):
 		
 	return data
 
+def get_nearest_free_center(latc=None,lonc=None,ndata=np.array(None),dist_threshold=None):
+	"""
+	Find the nearest critical center that is not yet part of a track within a distance threshold.
+
+	Parameters
+	----------
+	latc : float
+		Latitude of the last point of the track in degrees.
+	lonc : float
+		Longitude of the last point of the track in degrees.
+	ndata : numpy.ndarray
+		Critical centers of the next time step (see tmp_data_loadt). The first two columns are the
+		latitude and longitude, and the last column is 1 for the centers that are still free.
+	dist_threshold : float
+		Maximum distance in km.
+
+	Returns
+	-------
+	int or None
+		Row of the nearest free center, or None if no free center is within the threshold.
+		Ties are resolved in favour of the first row.
+	"""
+	pdist=central_angle_distance(lat1=latc,lon1=lonc,lat2=ndata[:,0],lon2=ndata[:,1])
+	eligible=(ndata[:,-1]==1)&(pdist<=dist_threshold)&(pdist<10000)
+	if not np.any(eligible):
+		return None
+	return int(np.argmin(np.where(eligible,pdist,np.inf)))
+
+
 def get_bearing_old(lat1, lon1, lat2, lon2):
 	"""
 	Calculate the initial bearing (forward azimuth) between two points on the earth's surface.
@@ -5300,6 +7201,7 @@ def get_bearing_old(lat1, lon1, lat2, lon2):
 def get_bearing(lat1, lon1, lat2, lon2):
 	"""
 	Calculate the initial bearing (forward azimuth) between two points on the earth's surface.
+	Kept only for backward compatibility, CyTRACK itself calls initial_bearing from cytrack_geodesic.
 
 	Parameters
 	----------
@@ -5317,20 +7219,7 @@ def get_bearing(lat1, lon1, lat2, lon2):
 	brng : float
 		Initial bearing in degrees from the first point to the second point, measured clockwise from north.
 	"""
-	lat1 = np.pi*lat1/180
-	lat2 = np.pi*lat2/180
-	
-	lon1 = np.pi*lon1/180
-	lon2 = np.pi*lon2/180
-	
-	dLon = (lon2 - lon1)
-	
-	x = np.cos(lat2) * np.sin(dLon)
-	y = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(dLon)
-	brng = np.arctan2(x,y)
-	brng = np.degrees(brng)
-	brng = (brng +360) % 360
-	return brng
+	return initial_bearing(lat1=lat1,lon1=lon1,lat2=lat2,lon2=lon2)
 
 
 def compute_VT_series(dates=np.array([None]),
@@ -5384,84 +7273,83 @@ def compute_VT_series(dates=np.array([None]),
 		If vtl_vtu_lr is True, returns (VTL_series, VTU_series) computed using linear regression.
 		Otherwise, returns (VTL_seriesb, VTU_seriesb) computed using basic difference method.
 	"""
-	listlev11=np.array(listlev1)*100
-	lnP1=np.log(listlev11)
-	listlev22=np.array(listlev2)*100
-	lnP2=np.log(listlev22)
+	lnP1=np.log(np.array(listlev1)*100)
+	lnP2=np.log(np.array(listlev2)*100)
 
+	if len(liste_lat)==0:
+		return [], []
 
-	VTL_seriesb=[]
-	VTU_seriesb=[]
-	
-	VTL_series=[]
-	VTU_series=[]
+	clats=np.asarray(liste_lat,dtype=float)
+	clons=np.asarray(liste_lon,dtype=float)
+	clons=np.where(clons>=180,clons-360,clons)
 
+	# range of the geopotential height within max_dist of each centre, for all the levels at once
+	ilevs=[list(levels).index(lev) for lev in list(listlev1)+list(listlev2)]
+	grid=get_grid_metrics(lats=lats,lons=lons)
+	centre,index=get_grid_neighbours(latsc=clats,lonsc=clons,radius=max_dist,grid=grid)
+	deltaZ=get_local_range(field=Zvar[ilevs].reshape(len(ilevs),-1),centre=centre,index=index,ncentres=len(clats))
+	deltaZ=np.trunc(deltaZ).astype(int)
+	deltaZ1=deltaZ[:,:len(listlev1)]
+	deltaZ2=deltaZ[:,len(listlev1):]
 
-	for i in range(0,len(liste_lat)):
+	if vtl_vtu_lr:
+		VTL_series=get_lnp_slope(lnp=lnP1,dz=deltaZ1)
+		VTU_series=get_lnp_slope(lnp=lnP2,dz=deltaZ2)
+	else:
+		VTL_series=(deltaZ1[:,-1]-deltaZ1[:,0])/(lnP1[-1]-lnP1[0])
+		VTU_series=(deltaZ2[:,-1]-deltaZ2[:,0])/(lnP2[-1]-lnP2[0])
 
-		clat = liste_lat[i]
-		clon = liste_lon[i]
-		
-		if clon>=180:
-			clon=clon-360
-		
-		
-		
-		deltaZ1=[]
-		deltaZ2=[]
+	return list(np.trunc(VTL_series).astype(int)), list(np.trunc(VTU_series).astype(int))
 
-		distance=haversine(lons, lats, clon, clat)
-		for iplev in range(0,len(listlev1)):
 
-			ilev = list(levels).index(listlev1[iplev])
-			
-			data_z1 = Zvar[ilev,:,:]
-			data_z1_m = np.ma.masked_where(distance > max_dist, data_z1)
-			zmin=np.min(data_z1_m)
-			zmax=np.max(data_z1_m)
-			delta_z1=zmax-zmin
-			deltaZ1.append(int(delta_z1))
+def get_local_range(field=np.array(None),centre=np.array(None),index=np.array(None),ncentres=0):
+	"""
+	Get the difference between the maximum and the minimum of several fields over the neighbours of each centre.
 
-		#for plev in listlev2:
+	Parameters
+	----------
+	field : numpy array
+		Fields with shape (nfields, npoints), with the grid points flattened.
+	centre : numpy array
+		Index of the centre of each neighbour, in increasing order (see get_grid_neighbours).
+	index : numpy array
+		Flat index in the grid of each neighbour.
+	ncentres : int
+		Number of centres.
 
-			ilev2 = list(levels).index(listlev2[iplev])
-			data_z2 = Zvar[ilev2,:,:]
+	Returns
+	-------
+	numpy array
+		Range of each field around each centre, with shape (ncentres, nfields). It is 0 for the centres without neighbours.
+	"""
+	zrange=np.zeros((ncentres,field.shape[0]),dtype=field.dtype)
+	counts=np.bincount(centre,minlength=ncentres)
+	found=counts>0
+	if found.any():
+		values=field[:,index]
+		starts=np.concatenate(([0],np.cumsum(counts)[:-1]))[found]
+		zrange[found]=(np.maximum.reduceat(values,starts,axis=1)-np.minimum.reduceat(values,starts,axis=1)).T
+	return zrange
 
-			data_z2_m = np.ma.masked_where(distance > max_dist, data_z2)
-			zmin2=np.min(data_z2_m)
-			zmax2=np.max(data_z2_m)
-			delta_z2=zmax2-zmin2
-			deltaZ2.append(int(delta_z2))
 
-		coef1b=(deltaZ1[-1]-deltaZ1[0])/(lnP1[-1]-lnP1[0])
-		VTL_seriesb.append(int(coef1b))
+def get_lnp_slope(lnp=np.array(None),dz=np.array(None)):
+	"""
+	Least-squares slope of several profiles against ln(p), in closed form.
 
-		coef2b=(deltaZ2[-1]-deltaZ2[0])/(lnP2[-1]-lnP2[0])
-		VTU_seriesb.append(int(coef2b))
-		
-		X1 = np.reshape(lnP1, (len(lnP1), 1))
-		y1 =  deltaZ1
-		model = LinearRegression().fit(X1, y1)
-		model.fit(X1, y1)
-		yhat1 = model.predict(X1)
-		reg = LinearRegression().fit(X1, y1)
-		coef1=reg.coef_
-		VTL_series.append(int(coef1))
-		
-		
-		X2 = np.reshape(lnP2, (len(lnP2), 1))
-		y2 =  deltaZ2
-		model = LinearRegression().fit(X2, y2)
-		model.fit(X2, y2)
-		yhat2 = model.predict(X2)
-		reg = LinearRegression().fit(X2, y2)
-		coef2=reg.coef_
-		VTU_series.append(int(coef2))
+	Parameters
+	----------
+	lnp : numpy array
+		Logarithm of the pressure of the levels.
+	dz : numpy array
+		Profiles with shape (nprofiles, len(lnp)).
 
-	if vtl_vtu_lr:
-		return VTL_series, VTU_series
-	else:
-		return VTL_seriesb, VTU_seriesb
+	Returns
+	-------
+	numpy array
+		Slope of each profile.
+	"""
+	x=lnp-np.mean(lnp)
+	return ((dz-np.mean(dz,axis=1,keepdims=True))@x)/np.sum(x**2)
 
 
 def compute_Bparameter_hart(cenlats=np.array([None]),
@@ -5472,7 +7360,8 @@ def compute_Bparameter_hart(cenlats=np.array([None]),
 			lats=np.array([None]),
 			lons=np.array([None]),
 			levels=np.array([None]),
-			Zvar=np.array([None])
+			Zvar=np.array([None]),
+			thickness=None
 			):
 
 	#for ix in range(0,lons.shape[0]):
@@ -5504,93 +7393,66 @@ def compute_Bparameter_hart(cenlats=np.array([None]),
 		Array with the pressure levels of the ERA5 grid.
 	Zvar : numpy array
 		Array with the geopotential height at the respective pressure levels.
+	thickness : list of numpy array
+		900-600 hPa thickness of each time step (see read_upper_store). If given, levels and Zvar are not used (default is None).
 
 	Returns
 	-------
 	B_series : numpy array
 		Array with the B parameter values at each time step.
 	"""
-	ilev_top = list(levels).index(600)
-	ilev_bot = list(levels).index(900)
-
-	B_series=[]
-	for i in range(0,len(cenlats)-1):
-		
-		#ilev_top = list(levels).index(600)
-		#ilev_bot = list(levels).index(900)
-		
-		#thickness=zvar[ilev_top,:]-zvar[ilev_bot,:]
-		
-		
-		
-		data=Zvar[i,ilev_top,:]-Zvar[i,ilev_bot,:]
-	
-		clat = cenlats[i]
-		clon = cenlons[i]
-		
-			
-		if clon>=180:
-			clon=clon-360
-		
-		#qq_ang_all=np.zeros([lons.shape[0],lons.shape[1]],dtype='f')
-		
-		#for x in range(0,lons.shape[0]):
-			#for y in range(0,lons.shape[1]):
-				#qq_ang_all[x,y]=get_bearing(clat, clon, lats[x,y], lons[x,y])
-		
-		qq_ang_all = np.array(get_bearing(clat, clon, lats, lons))
-		
-		distance=haversine(lons, lats, clon, clat)
-		ang=get_bearing(clat, clon, cenlats[i+1], cenlons[i+1])
-		Zl=np.zeros([lons.shape[0],lons.shape[1]],dtype='f')
-		Zr=np.zeros([lons.shape[0],lons.shape[1]],dtype='f')
-
-		for jlat in range(0,lons.shape[0]-1):
-			for jlon in range(0,lons.shape[1]-1):
-				if qq_ang_all[jlat,jlon] == ang:
-					Zl[jlat,jlon] = 0
-					Zr[jlat,jlon] = 0
-				elif (ang >= 0 and ang < 180):
-					if (qq_ang_all[jlat,jlon] > ang and qq_ang_all[jlat,jlon]  < ang+180):
-						Zl[jlat,jlon] = 0
-						Zr[jlat,jlon] = data[jlat,jlon]
-					else:
-						Zr[jlat,jlon] = 0
-						Zl[jlat,jlon] = data[jlat,jlon]
-				elif (ang >= 180 and ang < 360):
-					if (qq_ang_all[jlat,jlon] > ang-180 and qq_ang_all[jlat,jlon] < ang):
-						Zr[jlat,jlon] = 0
-						Zl[jlat,jlon] = data[jlat,jlon]
-					else:
-						Zl[jlat,jlon] = 0
-						Zr[jlat,jlon] = data[jlat,jlon]
-
-
-		
-		Zr_m = np.ma.masked_where(distance > max_dist, Zr)
-		Zl_m = np.ma.masked_where(distance > max_dist, Zl)
-		
-		Zr_m[Zr_m == 0] = np.nan
-		Zl_m[Zl_m == 0] = np.nan
-		
-
-		Zr_m = xr.DataArray(Zr_m)
-		Zl_m = xr.DataArray(Zl_m)
-		weights = xr.DataArray(np.cos(np.deg2rad(Zr_m.shape[0])))
-		Zr_weighted = Zr_m.weighted(weights)
-		Zl_weighted = Zl_m.weighted(weights)
-		Zr_weighted_mean=Zr_weighted.mean()
-		Zl_weighted_mean=Zl_weighted.mean()
-		
-			
-		B=(Zr_weighted_mean-Zl_weighted_mean)
-		
-		if not np.isnan(B):
-			B=int(B)
-	
-		if clat<0:
-			B=-B
-		B_series=np.append(B_series,B)
+	npoints=len(cenlats)-1
+	if npoints<=0:
+		return np.array([])
+
+	clats=np.asarray(cenlats,dtype=float)
+	clons=np.asarray(cenlons,dtype=float)
+	clons=np.where(clons>=180,clons-360,clons)
+
+	# direction of motion from each point of the track to the next one
+	ang=initial_bearing(lat1=clats[:-1],lon1=clons[:-1],lat2=clats[1:],lon2=normalize_longitudes(cenlons[1:]))
+
+	# grid points within max_dist of each point of the track, without the last row and column of the grid
+	grid=get_grid_metrics(lats=lats,lons=lons)
+	centre,index=get_grid_neighbours(latsc=clats[:-1],lonsc=clons[:-1],radius=max_dist,grid=grid)
+	nlon=lons.shape[1]
+	inner=(index//nlon<lons.shape[0]-1)&(index%nlon<nlon-1)
+	centre=centre[inner]
+	index=index[inner]
+
+	# bearing from each point of the track to its grid points (see initial_bearing_to_grid)
+	latc=np.deg2rad(clats[:-1])[centre]
+	dlon=grid["rlons"].ravel()[index]-np.deg2rad(clons[:-1])[centre]
+	x=grid["coslat"].ravel()[index]*np.sin(dlon)
+	y=np.cos(latc)*grid["sinlat"].ravel()[index]-np.sin(latc)*grid["coslat"].ravel()[index]*np.cos(dlon)
+	qq_ang=(np.degrees(np.arctan2(x,y))+360)%360
+
+	# right and left of the motion vector, the points along it are in neither side
+	ang=ang[centre]
+	right=np.where(ang<180,(qq_ang>ang)&(qq_ang<ang+180),~((qq_ang>ang-180)&(qq_ang<ang)))
+	right&=(qq_ang!=ang)&(ang>=0)&(ang<360)
+	left=~right&(qq_ang!=ang)&(ang>=0)&(ang<360)
+
+	# 900-600 hPa thickness, the points with zero (or missing) thickness are not averaged
+	if thickness is None:
+		ilev_top = list(levels).index(600)
+		ilev_bot = list(levels).index(900)
+		thickness=[Zvar[k,ilev_top]-Zvar[k,ilev_bot] for k in range(0,npoints)]
+	bounds=np.searchsorted(centre,np.arange(0,npoints+1))
+	values=np.empty(len(index),dtype='f')
+	for k in range(0,npoints):
+		values[bounds[k]:bounds[k+1]]=np.asarray(thickness[k]).ravel()[index[bounds[k]:bounds[k+1]]]
+	valid=(values!=0)&~np.isnan(values)
+	thickness=values.astype(float)
+
+	with np.errstate(invalid='ignore',divide='ignore'):
+		Zr_mean=np.bincount(centre[right&valid],weights=thickness[right&valid],minlength=npoints)/np.bincount(centre[right&valid],minlength=npoints)
+		Zl_mean=np.bincount(centre[left&valid],weights=thickness[left&valid],minlength=npoints)/np.bincount(centre[left&valid],minlength=npoints)
+
+	B_series=np.trunc(Zr_mean-Zl_mean)
+	B_series=np.where(clats[:-1]<0,-B_series,B_series)
+	# as int() does, the values truncated to zero are written as 0 and not -0
+	B_series=B_series+0.0
 
 	return B_series
 
@@ -5794,6 +7656,67 @@ def get_CPS_data(dates=np.array([None]),
 	return sourcelats,sourcelons, Zvar, source_levels, listlev1, listlev2
 
 
+def write_upper_store(tmpdir="./",fdate="",lats=np.array(None),lons=np.array(None),levels=np.array(None),Zvar=np.array(None)):
+	"""
+	Save the upper-air data of one time step needed to link the critical centers: the 900-600 hPa thickness
+	in float32, and the grid of the upper-air data, that is written once per run.
+
+	Parameters
+	----------
+	tmpdir : str
+		Directory of the temporary files.
+	fdate : str
+		Date and hour of the time step (YYYYMMDDHH).
+	lats : numpy array
+		Latitudes of the upper-air grid.
+	lons : numpy array
+		Longitudes of the upper-air grid.
+	levels : numpy array
+		Pressure levels of Zvar in hPa.
+	Zvar : numpy array
+		Geopotential height with shape (len(levels), ny, nx).
+	"""
+	grid_file=tmpdir+"/upper_grid.npz"
+	if not os.path.exists(grid_file):
+		# written under a name of its own and then renamed, so that several ranks can write it at the same time
+		tmp_file=tmpdir+"/upper_grid_"+str(os.getpid())+".npz"
+		np.savez(tmp_file,lats=lats,lons=lons)
+		os.replace(tmp_file,grid_file)
+
+	levels=list(levels)
+	thickness=(Zvar[levels.index(600)]-Zvar[levels.index(900)]).astype(np.float32)
+	np.save(tmpdir+"/upper_thickness_"+fdate+".npy",thickness)
+
+
+def read_upper_store(tmpdir="./",dates=np.array([None]),hours=np.array([None])):
+	"""
+	Read the upper-air data saved by write_upper_store. The thickness files are memory-mapped, not loaded.
+
+	Parameters
+	----------
+	tmpdir : str
+		Directory of the temporary files.
+	dates : numpy array
+		Dates of the time steps (YYYYMMDD).
+	hours : numpy array
+		Hours of the time steps (HH).
+
+	Returns
+	-------
+	lats : numpy array
+		Latitudes of the upper-air grid.
+	lons : numpy array
+		Longitudes of the upper-air grid.
+	thickness : list of numpy array
+		Read-only 900-600 hPa thickness of each time step.
+	"""
+	with np.load(tmpdir+"/upper_grid.npz") as grid:
+		lats=grid["lats"]
+		lons=grid["lons"]
+	thickness=[np.load(tmpdir+"/upper_thickness_"+date+hour+".npy",mmap_mode="r") for date,hour in zip(dates,hours)]
+	return lats,lons,thickness
+
+
 def get_B_series(cenlats=np.array([None]),
 						cenlons=np.array([None]),
 						dates=np.array([None]),
@@ -5862,28 +7785,7 @@ def get_B_series(cenlats=np.array([None]),
 		B parameter values for each cyclone center.
 
 	"""
-	if vtl_vtu_lr:
-		listlev1=[900,850,800,750,700,650,600]
-		listlev2=[600,550,500,450,400,350,300]
-	else:
-		listlev1=[900,600]
-		listlev2=[600,300]
-
-
-	sourcelats = np.loadtxt(tmpdir+"/sourcelats.dat")
-	sourcelons= np.loadtxt(tmpdir+"/sourcelons.dat")
-	source_levels = np.loadtxt(tmpdir+"/source_levels.dat")
-	sourceZ = np.load(tmpdir+"/source_upper_"+dates[0]+hours[0]+".npy")
-
-	Zvar=np.empty((len(dates), sourceZ.shape[0], sourceZ.shape[1], sourceZ.shape[2]))
-	Zvar[0,:,:,:]=sourceZ
-	for idx in range(1, len(dates)):
-		fdate=dates[idx]+hours[idx]
-		sourceZ = np.load(tmpdir+"/source_upper_"+fdate+".npy")
-
-
-
-		Zvar[idx,:,:,:]=sourceZ
+	sourcelats,sourcelons,thickness=read_upper_store(tmpdir=tmpdir,dates=dates,hours=hours)
 
 	Bhart=compute_Bparameter_hart(cenlats=cenlats,
 			cenlons=cenlons,
@@ -5892,8 +7794,7 @@ def get_B_series(cenlats=np.array([None]),
 			hours=hours,
 			lats=sourcelats,
 			lons=sourcelons,
-			levels=source_levels,
-			Zvar=Zvar
+			thickness=thickness
 			)
 
 	return Bhart
@@ -5984,7 +7885,7 @@ def get_gap_VTL_VTU(cenlats=np.array([None]),
 				custom_date_file_name=custom_date_file_name
 				)
 
-	np.save(tmpdir+"/source_upper_"+dates[0]+hours[0]+".npy",Zvar[0,:])
+	write_upper_store(tmpdir=tmpdir,fdate=dates[0]+hours[0],lats=sourcelats,lons=sourcelons,levels=source_levels,Zvar=Zvar[0,:])
 	
 
 	VTL, VTU = compute_VT_series(dates=dates,
@@ -6395,16 +8296,10 @@ def paring_centers(cyclone_type="",
 								track_end=True
 						else:
 							ndata=tmp_data_loadt(tmpdir+"/critical_centers_"+nfdate+".dat")
+							ndata[:,1]=normalize_longitudes(ndata[:,1])
 							k_paring=None
-							back_dist=10000
-							for k in range(0,ndata.shape[0]):
-								if ndata[k,1]>180:
-									ndata[k,1]=ndata[k,1]-360
-								if ndata[k,-1]==1 and data[i,4]!=0:
-									pdist=geo_distance(lat1=latc, lon1=lonc, lat2=ndata[k,0], lon2=ndata[k,1])
-									if pdist<=dist_threshold and pdist<back_dist:
-										k_paring=k
-										back_dist=np.copy(pdist)
+							if data[i,4]!=0:
+								k_paring=get_nearest_free_center(latc=latc,lonc=lonc,ndata=ndata,dist_threshold=dist_threshold)
 							
 							if k_paring!=None:
 								nlats=np.append(nlats, ndata[k_paring,0])
@@ -6428,17 +8323,11 @@ def paring_centers(cyclone_type="",
 								nfdate2=dates[j+1]+hours[j+1]
 								ndata2=tmp_data_loadt(tmpdir+"/critical_centers_"+nfdate2+".dat")
 								k_paring2=None
-								back_dist2=10000
 								latc=nlats[-1]
 								lonc=nlons[-1]
-								for k in range(0,ndata2.shape[0]):
-									if ndata2[k,1]>180:
-										ndata2[k,1]=ndata2[k,1]-360
-									if ndata2[k,-1]==1 and data[i,4]!=0:
-										pdist2=geo_distance(lat1=latc, lon1=lonc, lat2=ndata2[k,0], lon2=ndata2[k,1])
-										if pdist2<=2*dist_threshold and pdist2<back_dist2:
-											k_paring2=k
-											back_dist2=np.copy(pdist2)
+								if ndata2.size>0 and data[i,4]!=0:
+									ndata2[:,1]=normalize_longitudes(ndata2[:,1])
+									k_paring2=get_nearest_free_center(latc=latc,lonc=lonc,ndata=ndata2,dist_threshold=2*dist_threshold)
 
 								if k_paring2!=None and len(nlons)>=2:
 									m1=(nlons[-2]-nlons[-1])/((nlons[-2]-nlons[-1]))
@@ -6502,13 +8391,10 @@ def paring_centers(cyclone_type="",
 
 									track_end=False
 							elif (len(nlats)-1)*dt_h>=dt_lifetime and nmws.max()>intensity_threshold:
-								check_dist=[]
-								for ilat in range(1,len(nlats)):
-									aux_dist=geo_distance(lat1=nlats[ilat-1],
-											lon1=nlons[ilat-1],
-											lat2=nlats[ilat],
-											lon2=nlons[ilat])
-									check_dist=np.append(check_dist,aux_dist)
+								check_dist=central_angle_distance(lat1=nlats[:-1],
+										lon1=nlons[:-1],
+										lat2=nlats[1:],
+										lon2=nlons[1:])
 								if np.sum(check_dist)>=minimum_distance_travelled:
 									
 									if  checking_upper_levels_parameters: 
@@ -6631,6 +8517,114 @@ def paring_centers(cyclone_type="",
 
 
 
+CANDIDATE_STATS_COLUMNS=["minima","min_slp","mslp_anomaly","terrain","search_limits","vorticity","duplicates","dmslp","max_wind","roci","centers"]
+
+def write_candidate_stats(filename="",date="",hour="",stats=None):
+	"""
+	Write the candidate counters of one time step (see get_low_centers) as one line of text.
+
+	Parameters
+	----------
+	filename : str
+		Path of the file to write.
+	date : str
+		Date of the time step (YYYYMMDD).
+	hour : str
+		Hour of the time step (HH).
+	stats : dict
+		Counters of the time step. Missing counters are written as 0.
+	"""
+	with open(filename,"w") as fstats:
+		fstats.write(date+" "+hour+" "+" ".join([str(int(stats.get(name,0))) for name in CANDIDATE_STATS_COLUMNS])+"\n")
+
+
+def merge_candidate_stats(tmpdir="./",dates=[None],hours=[None],filename=""):
+	"""
+	Collect the candidate counters written by each time step into a single file, with one line per time step
+	and the total of each counter at the end. The files of the time steps are removed once merged. The counters of the stages are the number of candidates each
+	stage or threshold rejected; "minima" is the number of local MSLP minima of the whole field, and "centers" the number of critical centers kept.
+
+	Parameters
+	----------
+	tmpdir : str
+		Directory with the per time step files written by write_candidate_stats.
+	dates : list of str
+		Dates of the time steps.
+	hours : list of str
+		Hours of the time steps.
+	filename : str
+		Path of the file to write.
+	"""
+	totals=np.zeros(len(CANDIDATE_STATS_COLUMNS),dtype=int)
+	with open(filename,"w") as fstats:
+		fstats.write("date hour "+" ".join(CANDIDATE_STATS_COLUMNS)+"\n")
+		for date,hour in zip(dates,hours):
+			stats_file=tmpdir+"/candidate_stats_"+date+hour+".dat"
+			if not os.path.exists(stats_file):
+				continue
+			with open(stats_file) as fstep:
+				line=fstep.readline()
+			os.remove(stats_file)
+			fstats.write(line)
+			totals=totals+np.array(line.split()[2:],dtype=int)
+		fstats.write("total - "+" ".join([str(total) for total in totals])+"\n")
+
+
+def write_wind_radii(filename="",date="",hour="",lats=np.array(None),lons=np.array(None),radii=np.array(None)):
+	"""
+	Write the quadrant wind radii of the critical centers of one time step, one line per center.
+
+	Parameters
+	----------
+	filename : str
+		Path of the file to write.
+	date : str
+		Date of the time step (YYYYMMDD).
+	hour : str
+		Hour of the time step (HH).
+	lats : numpy array
+		Latitudes of the centers.
+	lons : numpy array
+		Longitudes of the centers.
+	radii : numpy array
+		Wind radii in km with shape (len(lats), 4*number of thresholds), the four quadrants (NE, SE, SW, NW)
+		of each threshold in a row (see get_wind_radii).
+	"""
+	with open(filename,"w") as fradii:
+		for k in range(0,len(lats)):
+			fradii.write(date+" "+hour+" "+"%.2f %.2f "%(lats[k],lons[k])+" ".join(["%.1f"%r for r in radii[k]])+"\n")
+
+
+def merge_wind_radii(tmpdir="./",dates=[None],hours=[None],wind_radii_thresholds=[],filename=""):
+	"""
+	Collect the quadrant wind radii written by each time step into a single file, with one line per critical center.
+	The radii are in km, and 0 where the wind does not reach the threshold. The files of the time steps are removed once merged.
+
+	Parameters
+	----------
+	tmpdir : str
+		Directory with the per time step files written by write_wind_radii.
+	dates : list of str
+		Dates of the time steps.
+	hours : list of str
+		Hours of the time steps.
+	wind_radii_thresholds : list of float
+		Wind speed thresholds in m/s of the wind radii.
+	filename : str
+		Path of the file to write.
+	"""
+	columns=["R%g_%s"%(thr,quadrant) for thr in wind_radii_thresholds for quadrant in ("NE","SE","SW","NW")]
+	with open(filename,"w") as fradii:
+		fradii.write("date hour lat lon "+" ".join(columns)+"\n")
+		for date,hour in zip(dates,hours):
+			radii_file=tmpdir+"/wind_radii_"+date+hour+".dat"
+			if not os.path.exists(radii_file):
+				continue
+			with open(radii_file) as fstep:
+				fradii.write(fstep.read())
+			os.remove(radii_file)
+
+
 def write_tracker(cyclone_type,nlats,nlons,npmin,nmws,nclosedp,nroci,nouter_r,nctype,VTU,VTL, Bhart, search_region,sys_id,fwrite,ndates, nhours):
 	"""
 	Write the cyclone tracking results to a file.
@@ -0,0 +1,284 @@
+import numpy as np
+import hashlib
+
+
+EARTH_RADIUS=6371
+
+
+def normalize_longitudes(lons=np.array(None)):
+	"""
+	Move longitudes of 180 degrees or more to the -180 to 180 range.
+
+	Parameters
+	----------
+	lons : float or numpy array
+		Longitudes in degrees.
+
+	Returns
+	-------
+	float or numpy array
+		Longitudes in degrees, with the values of 180 or more shifted by -360.
+	"""
+	lons=np.asarray(lons,dtype=float)
+	return np.where(lons>=180,lons-360,lons)
+
+
+_grid_trig={}
+
+def get_grid_trig(lats=np.array(None),lons=np.array(None),dtype=np.float64):
+	"""
+	Get the coordinates in radians and their sines and cosines for every point of a grid.
+	The tables are computed once per grid and cached by a fingerprint of the coordinates.
+
+	Parameters
+	----------
+	lats : numpy array
+		Latitudes of the grid in degrees.
+	lons : numpy array
+		Longitudes of the grid in degrees. They are normalized with normalize_longitudes.
+	dtype : numpy dtype, optional
+		Precision of the tables, np.float64 or np.float32 (default is np.float64).
+
+	Returns
+	-------
+	dict
+		Read-only arrays rlats, rlons, sinlat, coslat, sinlon and coslon, with the shape of the grid.
+	"""
+	lats=np.asarray(lats,dtype=float)
+	lons=normalize_longitudes(lons)
+	dtype=np.dtype(dtype)
+	key=(dtype.str,lats.shape,hashlib.md5(lats.tobytes()+lons.tobytes()).hexdigest())
+	if key in _grid_trig:
+		return _grid_trig[key]
+
+	rlats=np.deg2rad(lats).astype(dtype)
+	rlons=np.deg2rad(lons).astype(dtype)
+	trig={"rlats":rlats,
+		"rlons":rlons,
+		"sinlat":np.sin(rlats),
+		"coslat":np.cos(rlats),
+		"sinlon":np.sin(rlons),
+		"coslon":np.cos(rlons)}
+	for name in trig:
+		trig[name].setflags(write=False)
+
+	_grid_trig[key]=trig
+	return trig
+
+
+def get_unit_sphere_xyz(lats=np.array(None),lons=np.array(None)):
+	"""
+	Convert latitudes and longitudes to Cartesian coordinates on the unit sphere.
+
+	Parameters
+	----------
+	lats : numpy array
+		Latitudes in degrees.
+	lons : numpy array
+		Longitudes in degrees.
+
+	Returns
+	-------
+	numpy array
+		Array of shape (npoints, 3) with the x, y, z coordinates of the points.
+	"""
+	rlats=np.deg2rad(np.asarray(lats,dtype=float)).ravel()
+	rlons=np.deg2rad(np.asarray(lons,dtype=float)).ravel()
+	coslat=np.cos(rlats)
+	return np.column_stack((coslat*np.cos(rlons),coslat*np.sin(rlons),np.sin(rlats)))
+
+
+def haversine_distance(lat1=None,lon1=None,lat2=None,lon2=None,dtype=None):
+	"""
+	Great-circle distance between pairs of points with the haversine formula. The inputs are broadcast against each other.
+
+	Parameters
+	----------
+	lat1 : float or numpy array
+		Latitudes of the first points in degrees.
+	lon1 : float or numpy array
+		Longitudes of the first points in degrees.
+	lat2 : float or numpy array
+		Latitudes of the second points in degrees.
+	lon2 : float or numpy array
+		Longitudes of the second points in degrees.
+	dtype : numpy dtype, optional
+		Precision of the computation, e.g. np.float32. If None, the precision of the inputs is kept (default is None).
+
+	Returns
+	-------
+	float or numpy array
+		Great-circle distance in km.
+	"""
+	lon1=np.deg2rad(lon1 if dtype is None else np.asarray(lon1,dtype=dtype))
+	lon2=np.deg2rad(lon2 if dtype is None else np.asarray(lon2,dtype=dtype))
+	lat1=np.deg2rad(lat1 if dtype is None else np.asarray(lat1,dtype=dtype))
+	lat2=np.deg2rad(lat2 if dtype is None else np.asarray(lat2,dtype=dtype))
+
+	dlon = lon2 - lon1
+	dlat = lat2 - lat1
+	a = np.sin(dlat/2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon/2)**2
+	c = 2 * np.arcsin(np.sqrt(a))
+	return c * EARTH_RADIUS
+
+
+def haversine_to_grid(latc=None,lonc=None,trig=None):
+	"""
+	Great-circle distance between a point and every point of a grid with the haversine formula,
+	using the tables of get_grid_trig (or any dict with rlats, rlons and coslat, such as get_grid_metrics).
+
+	Parameters
+	----------
+	latc : float
+		Latitude of the point in degrees.
+	lonc : float
+		Longitude of the point in degrees.
+	trig : dict
+		Trigonometric tables of the grid.
+
+	Returns
+	-------
+	numpy array
+		Great-circle distance in km, with the shape of the grid.
+	"""
+	dtype = trig["rlats"].dtype
+	lonc = np.deg2rad(lonc).astype(dtype)
+	latc = np.deg2rad(latc).astype(dtype)
+
+	dlon = trig["rlons"] - lonc
+	dlat = trig["rlats"] - latc
+	a = np.sin(dlat/2)**2 + np.cos(latc) * trig["coslat"] * np.sin(dlon/2)**2
+	c = 2 * np.arcsin(np.sqrt(a))
+	return c * EARTH_RADIUS
+
+
+def haversine_matrix(lats1=np.array(None),lons1=np.array(None),lats2=np.array(None),lons2=np.array(None),dtype=None):
+	"""
+	Great-circle distance between every point of a first set and every point of a second set.
+
+	Parameters
+	----------
+	lats1 : numpy array
+		Latitudes of the first set in degrees.
+	lons1 : numpy array
+		Longitudes of the first set in degrees.
+	lats2 : numpy array
+		Latitudes of the second set in degrees.
+	lons2 : numpy array
+		Longitudes of the second set in degrees.
+	dtype : numpy dtype, optional
+		Precision of the computation (default is None, see haversine_distance).
+
+	Returns
+	-------
+	numpy array
+		Matrix of distances in km with shape (len(lats1), len(lats2)).
+	"""
+	return haversine_distance(lat1=np.ravel(lats1)[:,np.newaxis],
+				lon1=np.ravel(lons1)[:,np.newaxis],
+				lat2=np.ravel(lats2)[np.newaxis,:],
+				lon2=np.ravel(lons2)[np.newaxis,:],
+				dtype=dtype)
+
+
+def central_angle_distance(lat1=None,lon1=None,lat2=None,lon2=None):
+	"""
+	Great-circle distance between pairs of points from the dot product of their position vectors
+	(the formulation of geo_distance). The inputs are broadcast against each other.
+
+	Parameters
+	----------
+	lat1 : float or numpy array
+		Latitudes of the first points in degrees.
+	lon1 : float or numpy array
+		Longitudes of the first points in degrees.
+	lat2 : float or numpy array
+		Latitudes of the second points in degrees.
+	lon2 : float or numpy array
+		Longitudes of the second points in degrees.
+
+	Returns
+	-------
+	float or numpy array
+		Great-circle distance in km.
+	"""
+	lat1 = 90 - lat1
+	lat2 = 90 - lat2
+	lon1 = 180 + lon1
+	lon2 = 180 + lon2
+
+	la1 = (np.pi / 180) * lat1
+	la2 = (np.pi / 180) * lat2
+	lo1 = (np.pi / 180) * lon1
+	lo2 = (np.pi / 180) * lon2
+
+	x1 = np.sin(la1) * np.cos(lo1)
+	y1 = np.sin(la1) * np.sin(lo1)
+	z1 = np.cos(la1)
+
+	x2 = np.sin(la2) * np.cos(lo2)
+	y2 = np.sin(la2) * np.sin(lo2)
+	z2 = np.cos(la2)
+
+	dotp = x1 * x2 + y1 * y2 + z1 * z2
+	angle = np.arccos(np.minimum(dotp,1))
+	return angle * EARTH_RADIUS
+
+
+def initial_bearing(lat1=None,lon1=None,lat2=None,lon2=None):
+	"""
+	Initial bearing (forward azimuth) from the first points to the second points. The inputs are broadcast against each other.
+
+	Parameters
+	----------
+	lat1 : float or numpy array
+		Latitudes of the first points in degrees.
+	lon1 : float or numpy array
+		Longitudes of the first points in degrees.
+	lat2 : float or numpy array
+		Latitudes of the second points in degrees.
+	lon2 : float or numpy array
+		Longitudes of the second points in degrees.
+
+	Returns
+	-------
+	float or numpy array
+		Initial bearing in degrees, measured clockwise from north between 0 and 360.
+	"""
+	lat1 = np.deg2rad(lat1)
+	lat2 = np.deg2rad(lat2)
+	dlon = np.deg2rad(lon2) - np.deg2rad(lon1)
+
+	x = np.cos(lat2) * np.sin(dlon)
+	y = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(dlon)
+	brng = np.degrees(np.arctan2(x,y))
+	return (brng + 360) % 360
+
+
+def initial_bearing_to_grid(latc=None,lonc=None,trig=None):
+	"""
+	Initial bearing from a point to every point of a grid, using the tables of get_grid_trig.
+	The result is the same as initial_bearing(latc, lonc, lats, lons).
+
+	Parameters
+	----------
+	latc : float
+		Latitude of the point in degrees.
+	lonc : float
+		Longitude of the point in degrees.
+	trig : dict
+		Trigonometric tables of the grid returned by get_grid_trig.
+
+	Returns
+	-------
+	numpy array
+		Initial bearing in degrees, with the shape of the grid.
+	"""
+	dtype = trig["rlats"].dtype
+	latc = np.deg2rad(latc).astype(dtype)
+	dlon = trig["rlons"] - np.deg2rad(lonc).astype(dtype)
+
+	x = trig["coslat"] * np.sin(dlon)
+	y = np.cos(latc) * trig["sinlat"] - np.sin(latc) * trig["coslat"] * np.cos(dlon)
+	brng = np.degrees(np.arctan2(x,y))
+	return (brng + 360) % 360
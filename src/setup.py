@@ -34,9 +34,9 @@ setuptools.setup(
         "Operating System :: OS Independent",
     ],
     python_requires='>=3.6',
-    install_requires=["numpy","mpi4py","netCDF4","scipy","matplotlib","xarray","scikit-learn"],
+    install_requires=["numpy","mpi4py","netCDF4","scipy","matplotlib","xarray"],
 
     
     include_package_data=True,
-    package_data={"":['VERSION', "cytrack_inputs.cfg","_version.py","cytrack_functions.py", "LAST_UPDATE", "ERA5_terrain_high.nc"]},
+    package_data={"":['VERSION', "cytrack_inputs.cfg","_version.py","cytrack_functions.py", "cytrack_geodesic.py", "LAST_UPDATE", "ERA5_terrain_high.nc"]},
 )
@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+# the tests import cytrack from this source tree and the synthetic fields from this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synthetic
+
+
+@pytest.fixture(scope="session")
+def mslp_case():
+	"""Synthetic MSLP on a regular 0.25 degree grid and its deepest local minima."""
+	lats, lons = synthetic.regular_grid()
+	mslp = synthetic.synthetic_mslp(lats, lons)
+	latc, lonc, pmin = synthetic.local_minima(lats, lons, mslp)
+	return {"lats": lats, "lons": lons, "mslp": mslp, "latc": latc, "lonc": lonc, "pmin": pmin}
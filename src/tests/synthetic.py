@@ -0,0 +1,47 @@
+"""
+Synthetic grids and fields shared by the tests, and the sampling of the original per-centre routines
+(planar polar coordinates and nearest-neighbour interpolation with scipy's griddata).
+"""
+import numpy as np
+from scipy.interpolate import griddata
+from scipy.ndimage import minimum_filter
+
+
+def regular_grid(res=0.25, latmin=10, latmax=60, lonmin=-70, lonmax=-10):
+	"""2D latitudes and longitudes of a regular grid."""
+	lons, lats = np.meshgrid(np.arange(lonmin, lonmax + res / 2, res), np.arange(latmin, latmax + res / 2, res))
+	return lats, lons
+
+
+def synthetic_mslp(lats, lons, seed=0):
+	"""A few Gaussian lows of different depth and width on a smooth background with a little noise."""
+	rng = np.random.default_rng(seed)
+	mslp = 1013 + 4 * np.sin(np.deg2rad(3 * lons)) * np.cos(np.deg2rad(4 * lats))
+	for clat, clon, depth, width in [(25.0, -50.0, 30.0, 4.0), (32.0, -46.0, 12.0, 2.0), (45.0, -30.0, 22.0, 5.0), (50.0, -25.0, 8.0, 1.5), (20.0, -20.0, 15.0, 3.0)]:
+		mslp = mslp - depth * np.exp(-((lats - clat) ** 2 + (lons - clon) ** 2) / (2 * width ** 2))
+	return mslp + rng.normal(0, 0.05, mslp.shape)
+
+
+def local_minima(lats, lons, field, nsize=9, border=20):
+	"""Latitudes, longitudes and values of the local minima of a field away from its edges, from the lowest."""
+	iy, ix = np.where(minimum_filter(field, nsize, mode="nearest") == field)
+	inner = (iy > border) & (iy < field.shape[0] - border) & (ix > border) & (ix < field.shape[1] - border)
+	iy, ix = iy[inner], ix[inner]
+	order = np.argsort(field[iy, ix])
+	return lats[iy, ix][order], lons[iy, ix][order], field[iy, ix][order]
+
+
+def polar_cords(latc, lonc, dang, dradius, search_radius):
+	"""Polar coordinates around a centre as the original polar_cords built them, with 111 km per degree."""
+	theta = np.arange(0, 2 * np.pi + np.radians(dang), np.radians(dang))
+	radius = np.arange(0, search_radius + dradius, dradius)
+	radii = radius[np.newaxis, :] / 111
+	lonp = radii * np.cos(theta[:, np.newaxis]) + lonc
+	latp = radii * np.sin(theta[:, np.newaxis]) + latc
+	return latp, lonp, radius, theta
+
+
+def sample_nearest(lats, lons, field, latp, lonp):
+	"""Field at the grid points nearest to (latp, lonp) in the longitude-latitude plane."""
+	points = np.column_stack((lons.ravel(), lats.ravel()))
+	return griddata(points, field.ravel(), np.column_stack((lonp.ravel(), latp.ravel())), method="nearest").reshape(latp.shape)
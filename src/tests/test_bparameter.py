@@ -0,0 +1,88 @@
+"""
+Regression tests of the B parameter (thermal asymmetry) computed from the neighbours of all the track points at once,
+against the original loop over the grid.
+"""
+import numpy as np
+import pytest
+
+import cytrack.cytrack_functions as cf
+from synthetic import regular_grid
+
+
+LEVELS = [1000, 900, 850, 700, 600, 500]
+
+
+def reference_bearing(lat1, lon1, lat2, lon2):
+	"""Initial bearing as get_bearing computed it before the geodesic module."""
+	lat1, lat2, dlon = np.deg2rad(lat1), np.deg2rad(lat2), np.deg2rad(lon2 - lon1)
+	x = np.cos(lat2) * np.sin(dlon)
+	y = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(dlon)
+	return (np.degrees(np.arctan2(x, y)) + 360) % 360
+
+
+def reference_bparameter(cenlats, cenlons, max_dist, lats, lons, levels, Zvar):
+	"""compute_Bparameter_hart before the batching, with the right and left sides found point by point."""
+	ilev_top, ilev_bot = list(levels).index(600), list(levels).index(900)
+	B_series = []
+	for i in range(0, len(cenlats) - 1):
+		data = Zvar[i, ilev_top] - Zvar[i, ilev_bot]
+		clat, clon = cenlats[i], cenlons[i]
+		if clon >= 180:
+			clon = clon - 360
+		qq_ang_all = reference_bearing(clat, clon, lats, lons)
+		distance = cf.haversine(lons, lats, clon, clat)
+		ang = reference_bearing(clat, clon, cenlats[i + 1], cenlons[i + 1])
+		Zl = np.zeros(lons.shape, dtype="f")
+		Zr = np.zeros(lons.shape, dtype="f")
+		for jlat in range(0, lons.shape[0] - 1):
+			for jlon in range(0, lons.shape[1] - 1):
+				qq = qq_ang_all[jlat, jlon]
+				if qq == ang:
+					continue
+				if ang < 180:
+					right = ang < qq < ang + 180
+				else:
+					right = not (ang - 180 < qq < ang)
+				if right:
+					Zr[jlat, jlon] = data[jlat, jlon]
+				else:
+					Zl[jlat, jlon] = data[jlat, jlon]
+		Zr = np.where((distance > max_dist) | (Zr == 0), np.nan, Zr.astype(float))
+		Zl = np.where((distance > max_dist) | (Zl == 0), np.nan, Zl.astype(float))
+		with np.errstate(invalid="ignore"):
+			B = np.nanmean(Zr) - np.nanmean(Zl) if np.isfinite(Zr).any() and np.isfinite(Zl).any() else np.nan
+		if not np.isnan(B):
+			B = int(B)
+		if clat < 0:
+			B = -B
+		B_series.append(B)
+	return np.array(B_series, dtype=float)
+
+
+@pytest.mark.parametrize("hemisphere", [1, -1])
+def test_compute_Bparameter_hart(hemisphere):
+	lats, lons = regular_grid(res=0.5, latmin=10, latmax=60, lonmin=-80, lonmax=-10)
+	lats = hemisphere * lats
+	rng = np.random.default_rng(5)
+	# a track that turns, with a point on each side of the antimeridian convention
+	cenlats = hemisphere * np.array([18.0, 19.5, 21.2, 23.0, 25.1, 27.5, 30.0, 33.2, 36.0])
+	cenlons = np.array([-60.0, -61.0, 297.5, -62.0, -61.2, -59.0, 304.0, -52.5, -48.0])
+	Zvar = []
+	for k in range(0, len(cenlats)):
+		profile = [1000 - 10 * lev + (3 + k) * lev / 100 * (lons + 50) + 2 * lev / 100 * lats for lev in LEVELS]
+		Zvar.append(np.array(profile) + rng.normal(0, 5, (len(LEVELS),) + lats.shape))
+	Zvar = np.array(Zvar)
+
+	B = cf.compute_Bparameter_hart(cenlats=cenlats, cenlons=cenlons, max_dist=500, dates=None, hours=None,
+				lats=lats, lons=lons, levels=LEVELS, Zvar=Zvar)
+	expected = reference_bparameter(cenlats, cenlons, 500, lats, lons, LEVELS, Zvar)
+	np.testing.assert_array_equal(B, expected)
+	assert len(B) == len(cenlats) - 1
+	assert np.all(B != 0)
+
+
+def test_compute_Bparameter_hart_single_point():
+	lats, lons = regular_grid(res=0.5)
+	B = cf.compute_Bparameter_hart(cenlats=[20.0], cenlons=[-50.0], max_dist=500, dates=None, hours=None,
+				lats=lats, lons=lons, levels=LEVELS, Zvar=np.zeros((1, len(LEVELS)) + lats.shape))
+	assert len(B) == 0
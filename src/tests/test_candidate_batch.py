@@ -0,0 +1,57 @@
+"""
+Tests of the candidate properties computed for all the centres of a time step at once, against the same properties
+computed one centre at a time.
+"""
+import numpy as np
+
+import cytrack.cytrack_functions as cf
+
+
+def centres(mslp_case):
+	"""The minima of the synthetic field, and first guesses moved away from them."""
+	latc = np.concatenate([mslp_case["latc"], mslp_case["latc"] + 1.0])
+	lonc = np.concatenate([mslp_case["lonc"], mslp_case["lonc"] - 1.5])
+	pmin = np.concatenate([mslp_case["pmin"], mslp_case["pmin"] + 5])
+	return latc, lonc, pmin
+
+
+def test_compute_dmslp_batch(mslp_case):
+	lats, lons, mslp = mslp_case["lats"], mslp_case["lons"], mslp_case["mslp"]
+	latc, lonc, pmin = centres(mslp_case)
+	kwargs = dict(dang=10, dradius=50, search_radius=750, model_res=25, great_circle_distance=650, filter_center_threshold=350,
+			search_limits=[lons.min(), lats.min(), lons.max(), lats.max()])
+	batch = cf.compute_dmslp_batch(latc=latc, lonc=lonc, lats=lats, lons=lons, mslp=mslp, pmin=pmin,
+				grid=cf.get_grid_metrics(lats=lats, lons=lons), **kwargs)
+	single = np.array([cf.compute_dmslp(latc=latc[i], lonc=lonc[i], lats=lats, lons=lons, mslp=mslp, pmin=pmin[i], **kwargs) for i in range(0, len(latc))])
+	for value, expected in zip(batch, single.T):
+		np.testing.assert_array_equal(value, expected)
+
+
+def test_compute_roci_RU_batch(mslp_case):
+	lats, lons, mslp = mslp_case["lats"], mslp_case["lons"], mslp_case["mslp"]
+	latc, lonc, pmin = centres(mslp_case)
+	grid = cf.get_grid_metrics(lats=lats, lons=lons)
+	sampler = cf.get_polar_sampler(latc=latc, lonc=lonc, dang=10, dradius=100, search_radius=1500, grid=grid)
+	roci, closedp = cf.compute_roci_RU_batch(latc=latc, lonc=lonc, lats=lats, lons=lons, mslp=mslp, pmin=pmin, dang=10, dradius=100,
+				search_radius=1500, model_res=25, sampler=sampler)
+	for i in range(0, len(latc)):
+		expected = cf.compute_roci_RU(latc=latc[i], lonc=lonc[i], lats=lats, lons=lons, mslp=mslp, pmin=pmin[i], dang=10, dradius=100,
+				search_radius=1500, model_res=25)
+		np.testing.assert_array_equal((roci[i], closedp[i]), expected)
+	assert np.any(roci > 0)
+
+
+def test_compute_TC_size_batch(mslp_case):
+	lats, lons, mslp = mslp_case["lats"], mslp_case["lons"], mslp_case["mslp"]
+	latc, lonc, pmin = centres(mslp_case)
+	# winds turning counterclockwise around the lows, as the geostrophic wind in the Northern Hemisphere
+	dpdy, dpdx = np.gradient(mslp, 0.25 * 111, 0.25 * 111)
+	u, v = -100 * dpdy, 100 * dpdx
+	size, radii = cf.compute_TC_size_batch(latc=latc, lonc=lonc, lats=lats, lons=lons, u=u, v=v, dradius=50, dang=10,
+				search_radius=1000, model_res=25, outer_wind_speed_threshold=2.5, wind_radii_thresholds=[10, 17])
+	for i in range(0, len(latc)):
+		expected = cf.compute_TC_size(latc=latc[i], lonc=lonc[i], lats=lats, lons=lons, u=u, v=v, dradius=50, dang=10,
+				search_radius=1000, model_res=25, outer_wind_speed_threshold=2.5)
+		np.testing.assert_array_equal(size[i], expected)
+	assert np.any(size > 0)
+	assert radii.shape == (len(latc), 2, 4)
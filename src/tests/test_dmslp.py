@@ -0,0 +1,42 @@
+"""
+Regression tests of the iterative dMSLP and centre relocation against the original recursive routine.
+"""
+import numpy as np
+import pytest
+
+import cytrack.cytrack_functions as cf
+from synthetic import polar_cords, sample_nearest
+
+
+def reference_dmslp(latc, lonc, lats, lons, mslp, pmin, dang=10, dradius=50, search_radius=750, model_res=20,
+			great_circle_distance=650, filter_center_threshold=350, search_limits=[None, None, None, None]):
+	"""compute_dmslp before the batching, which called itself each time the centre moved to a deeper point."""
+	latp, lonp, radius, theta = polar_cords(latc, lonc, dang, dradius, search_radius)
+	pminp = sample_nearest(lats, lons, mslp, latp, lonp)
+	nradius, ntheta = np.meshgrid(radius, theta)
+	npminp = np.copy(pminp)
+	npminp[nradius > filter_center_threshold] = 10000
+	ii, jj = np.where(npminp == npminp.min())
+	npmin, nlatc, nlonc = npminp[ii[0], jj[0]], latp[ii[0], jj[0]], lonp[ii[0], jj[0]]
+	if npmin < pmin and search_limits[1] < nlatc < search_limits[3] and search_limits[0] < nlonc < search_limits[2]:
+		return reference_dmslp(nlatc, nlonc, lats, lons, mslp, npmin, dang=dang, dradius=model_res, search_radius=search_radius, model_res=model_res,
+				great_circle_distance=great_circle_distance, filter_center_threshold=filter_center_threshold, search_limits=search_limits)
+	return np.mean(pminp[nradius > great_circle_distance]), latc, lonc, pmin
+
+
+@pytest.mark.parametrize("offset", [(0, 0), (1.5, -1.0), (-2.0, 2.5)])
+def test_compute_dmslp(mslp_case, offset):
+	lats, lons, mslp = mslp_case["lats"], mslp_case["lons"], mslp_case["mslp"]
+	search_limits = [lons.min(), lats.min(), lons.max(), lats.max()]
+	moved = 0
+	for latc, lonc in zip(mslp_case["latc"], mslp_case["lonc"]):
+		# start away from the minimum, from the pressure of the grid point nearest to the first guess
+		latc, lonc = latc + offset[0], lonc + offset[1]
+		pmin = sample_nearest(lats, lons, mslp, np.array([latc]), np.array([lonc]))[0]
+		kwargs = dict(dang=10, dradius=50, search_radius=750, model_res=25, great_circle_distance=650, filter_center_threshold=350, search_limits=search_limits)
+		result = cf.compute_dmslp(latc=latc, lonc=lonc, lats=lats, lons=lons, mslp=mslp, pmin=pmin, **kwargs)
+		expected = reference_dmslp(latc, lonc, lats, lons, mslp, pmin, **kwargs)
+		np.testing.assert_allclose(result, expected, rtol=0, atol=1e-9)
+		moved += expected[1] != latc or expected[2] != lonc
+	if offset != (0, 0):
+		assert moved > 0
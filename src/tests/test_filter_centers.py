@@ -0,0 +1,73 @@
+"""
+Regression tests of the KD-tree filter of duplicate centres against the original pairwise loop.
+"""
+import math
+
+import numpy as np
+import pytest
+
+import cytrack.cytrack_functions as cf
+
+
+def reference_distance(lat1, lon1, lat2, lon2):
+	"""geo_distance before it was vectorised, from the dot product of the unit vectors."""
+	la1, la2 = np.radians(90 - lat1), np.radians(90 - lat2)
+	lo1, lo2 = np.radians(180 + lon1), np.radians(180 + lon2)
+	dotp = np.sin(la1) * np.sin(la2) * (np.cos(lo1) * np.cos(lo2) + np.sin(lo1) * np.sin(lo2)) + np.cos(la1) * np.cos(la2)
+	return math.acos(min(dotp, 1)) * 6371
+
+
+def reference_kept(lats, lons, pmin, filter_center_threshold):
+	"""Indices kept by the original O(n^2) filter_centers, which removed the merged centres with nan."""
+	lats, lons, pmin = np.array(lats, dtype=float), np.array(lons, dtype=float), np.array(pmin, dtype=float)
+	lons[lons > 180] = lons[lons > 180] - 360
+	kept = []
+	for i in range(0, len(lats)):
+		if np.isfinite(pmin[i]) and np.isfinite(lats[i]) and np.isfinite(lons[i]):
+			valid = [j for j in range(0, len(lats)) if np.isfinite(pmin[j]) and np.isfinite(lats[j]) and np.isfinite(lons[j])]
+			near = [j for j in valid if reference_distance(lats[i], lons[i], lats[j], lons[j]) < filter_center_threshold]
+			if len(near) <= 1:
+				kept.append(i)
+			else:
+				check_indices = [i] + near
+				pindex = check_indices[int(np.argmin(pmin[check_indices]))]
+				kept.append(pindex)
+				pmin[pindex] = lats[pindex] = lons[pindex] = np.nan
+				pmin[near] = lats[near] = lons[near] = np.nan
+		pmin[i] = np.nan
+	return kept
+
+
+@pytest.mark.parametrize("seed", range(0, 5))
+def test_filter_centers(seed):
+	rng = np.random.default_rng(seed)
+	n = 40
+	lats = rng.uniform(10, 30, n)
+	lons = rng.uniform(170, 200, n)
+	pmin = np.round(rng.uniform(980, 1010, n), 1)
+	pmin[::7] = np.nan
+	roci, closedp, ff, outer_r = rng.uniform(100, 500, n), rng.uniform(990, 1012, n), rng.uniform(5, 40, n), rng.uniform(100, 400, n)
+	inputs = [np.copy(a) for a in (lats, lons, roci, pmin, closedp, ff, outer_r)]
+
+	result = cf.filter_centers(lats=lats, lons=lons, roci=roci, pmin=pmin, closedp=closedp, ff=ff, outer_r=outer_r,
+				filter_center_threshold=400, return_index=True)
+	kept = reference_kept(lats, lons, pmin, 400)
+	assert list(result[-1]) == kept
+	assert 0 < len(kept) < n - len(pmin[::7])
+	for value, expected in zip(result[:7], (lats, np.where(lons > 180, lons - 360, lons), roci, pmin, closedp, ff, outer_r)):
+		np.testing.assert_array_equal(value, expected[kept])
+	assert result[7]
+	# the input arrays are not modified
+	for value, expected in zip((lats, lons, roci, pmin, closedp, ff, outer_r), inputs):
+		np.testing.assert_array_equal(value, expected)
+
+
+def test_filter_centers_keeps_the_deepest_neighbour():
+	lats = np.array([20.0, 20.5, 30.0])
+	lons = np.array([-60.0, -60.5, -40.0])
+	pmin = np.array([1000.0, 995.0, 1005.0])
+	flats, flons, froci, fpmin, fclosedp, fmws, fouter_r, centers_found, kept = cf.filter_centers(lats=lats, lons=lons, roci=np.zeros(3), pmin=pmin,
+				closedp=np.zeros(3), filter_center_threshold=300, return_index=True)
+	assert kept == [1, 2]
+	np.testing.assert_array_equal(fpmin, [995.0, 1005.0])
+	assert len(cf.filter_centers(lats=lats, lons=lons, roci=np.zeros(3), pmin=pmin, closedp=np.zeros(3), filter_center_threshold=300)) == 8
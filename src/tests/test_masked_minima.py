@@ -0,0 +1,60 @@
+"""
+Tests of the minima searched only inside the regions of the threshold mask, and of the rejection counts of the
+candidate statistics.
+"""
+import numpy as np
+import pytest
+import scipy.ndimage as sp
+from scipy.ndimage import minimum_filter
+
+import cytrack.cytrack_functions as cf
+
+
+def random_case(seed, shape=(120, 180)):
+	"""A smooth field with flat (rounded) areas and a mask made of a few blobs, some of them at the edges."""
+	rng = np.random.default_rng(seed)
+	field = np.round(sp.gaussian_filter(rng.normal(0, 10, shape), 3), 1)
+	mask = sp.gaussian_filter(rng.normal(0, 1, shape), 6) > 0.05
+	mask[:, :5] = rng.uniform(size=(shape[0], 5)) > 0.5
+	return field, mask
+
+
+@pytest.mark.parametrize("seed", range(0, 4))
+@pytest.mark.parametrize("nsize", [3, 9, 10, 25])
+def test_get_masked_minima(seed, nsize):
+	field, mask = random_case(seed)
+	assert sp.label(mask)[1] > 1
+	mxy, mxx = cf.get_masked_minima(field=field, mask=mask, nsize=nsize)
+	ey, ex = np.where((minimum_filter(field, nsize, mode="nearest") == field) & mask)
+	np.testing.assert_array_equal(mxy, ey)
+	np.testing.assert_array_equal(mxx, ex)
+
+
+def test_get_masked_minima_empty_mask():
+	field, mask = random_case(0)
+	mxy, mxx = cf.get_masked_minima(field=field, mask=np.zeros_like(mask), nsize=9)
+	assert len(mxy) == 0 and len(mxx) == 0
+
+
+@pytest.mark.parametrize("seed", range(0, 4))
+def test_count_threshold_rejections(seed):
+	field, mask = random_case(seed)
+	rng = np.random.default_rng(seed + 10)
+	masks = [mask, field < 5, rng.uniform(size=field.shape) > 0.3]
+	thresholds = [("mslp", masks[0]), ("mslp_anomaly", masks[1]), ("terrain", masks[2])]
+	stats = {}
+	cf.count_threshold_rejections(field=field, thresholds=thresholds, nsize=9, stats=stats)
+
+	allminima = minimum_filter(field, 9, mode="nearest") == field
+	assert stats["minima"] == np.sum(allminima)
+	# each threshold counts the minima that passed the previous ones and fail it
+	passed = allminima
+	for name, threshold in thresholds:
+		assert stats[name] == np.sum(passed & ~threshold)
+		passed = passed & threshold
+	accepted = cf.get_masked_minima(field=field, mask=masks[0] & masks[1] & masks[2], nsize=9)[0]
+	assert stats["minima"] == stats["mslp"] + stats["mslp_anomaly"] + stats["terrain"] + len(accepted)
+
+	# the counters add up over the time steps
+	cf.count_threshold_rejections(field=field, thresholds=thresholds, nsize=9, stats=stats)
+	assert stats["minima"] == 2 * np.sum(allminima)
@@ -0,0 +1,62 @@
+"""
+Tests of the static MSLP climatology files (use_mslp_anomaly='climatology').
+"""
+import os
+
+import numpy as np
+import pytest
+
+import cytrack.cytrack_functions as cf
+
+
+@pytest.fixture
+def climatology_file(tmp_path):
+	lat1d = np.arange(60, 9.9, -0.5)
+	lon1d = np.arange(280, 350.1, 0.5)
+	lons, lats = np.meshgrid(lon1d, lat1d)
+	mslp_sum = np.stack([(1000 + month + 0.01 * lats) * 2 for month in range(0, 12)])
+	mslp_count = np.full(12, 2)
+	mslp_count[6] = 0
+	filename = str(tmp_path / "mslp_climatology.nc")
+	cf.write_mslp_climatology(filename=filename, lats=lats, lons=lons, mslp_sum=mslp_sum, mslp_count=mslp_count, mslp_climatology_period="monthly")
+	return filename, lats, lons
+
+
+def test_climatology_index():
+	assert cf.get_mslp_climatology_index(date="20180315", mslp_climatology_period="monthly") == 2
+	assert cf.get_mslp_climatology_index(date="20190301", mslp_climatology_period="dayofyear") == 60
+	assert cf.get_mslp_climatology_index(date="20200301", mslp_climatology_period="dayofyear") == 60
+
+
+def test_read_climatology(climatology_file):
+	filename, lats, lons = climatology_file
+	mslp = cf.read_mslp_climatology(filename=filename, date="20180315", lats=lats, lons=lons)
+	np.testing.assert_allclose(mslp, 1002 + 0.01 * lats)
+
+	# the same grid with the longitudes between -180 and 180
+	mslp = cf.read_mslp_climatology(filename=filename, date="20181102", lats=lats, lons=lons - 360)
+	np.testing.assert_allclose(mslp, 1010 + 0.01 * lats)
+
+
+def test_cached_periods_do_not_reopen_the_file(climatology_file):
+	filename, lats, lons = climatology_file
+	climatology = {}
+	first = cf.read_mslp_climatology(filename=filename, date="20180315", climatology=climatology, lats=lats, lons=lons)
+	os.remove(filename)
+	second = cf.read_mslp_climatology(filename=filename, date="20180328", climatology=climatology, lats=lats, lons=lons)
+	assert second is first
+	assert climatology["period"] == "monthly"
+
+
+def test_grid_mismatch(climatology_file):
+	filename, lats, lons = climatology_file
+	with pytest.raises(SystemExit):
+		cf.read_mslp_climatology(filename=filename, date="20180315", lats=lats, lons=lons + 0.5)
+	with pytest.raises(SystemExit):
+		cf.read_mslp_climatology(filename=filename, date="20180315", lats=lats[1:], lons=lons[1:])
+
+
+def test_period_without_data(climatology_file):
+	filename, lats, lons = climatology_file
+	with pytest.raises(SystemExit):
+		cf.read_mslp_climatology(filename=filename, date="20180710", lats=lats, lons=lons)
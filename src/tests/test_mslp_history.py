@@ -0,0 +1,41 @@
+"""
+Tests of the MSLP history collected for the pre-pass of the MSLP anomaly (precompute_mslp_anomaly).
+"""
+import pytest
+
+import cytrack.cytrack_functions as cf
+
+
+def anomaly_window(date, hour, prev_days, calendar):
+	"""Dates and hours averaged by get_mslp_anomaly for one time step."""
+	dates, hours = cf.get_dates_vectors(year_case_init=date[0:4], month_case_init=date[4:6], day_case_init=date[6:8], hour_case_init=hour,
+					year_case_end=date[0:4], month_case_end=date[4:6], day_case_end=date[6:8], hour_case_end=hour,
+					dt_h=24, prev_days=prev_days, previous_dates=True, calendar=calendar)
+	return [d + h for d, h in zip(dates[:-1], hours[:-1])]
+
+
+@pytest.mark.parametrize("calendar", ["366d", "365d"])
+def test_history_covers_the_anomaly_windows(calendar):
+	dates = ["20200304", "20200304", "20200305", "20200313", "20200316"]
+	hours = ["00", "12", "00", "18", "06"]
+	history_dates, history_hours = cf.get_mslp_history_dates(dates=dates, hours=hours, prev_days=14, calendar=calendar)
+	history = [d + h for d, h in zip(history_dates, history_hours)]
+
+	assert history == sorted(set(history))
+	expected = set()
+	for date, hour in zip(dates, hours):
+		window = anomaly_window(date, hour, 14, calendar)
+		assert len(window) == 14
+		expected.update(window)
+	assert set(history) == expected
+
+
+def test_history_skips_february_29_with_365d():
+	history_dates, history_hours = cf.get_mslp_history_dates(dates=["20200305"], hours=["00"], prev_days=14, calendar="365d")
+	assert "20200229" not in history_dates
+	assert history_dates[0] == "20200219"
+	assert len(history_dates) == 14
+
+	history_dates, history_hours = cf.get_mslp_history_dates(dates=["20200305"], hours=["00"], prev_days=14, calendar="366d")
+	assert "20200229" in history_dates
+	assert history_dates[0] == "20200220"
@@ -0,0 +1,91 @@
+"""
+Regression tests of the ROCI computed from legs sampled once at the maximum radius, against the original
+algorithm that resampled the legs at each shorter search radius.
+"""
+import warnings
+
+import numpy as np
+import pytest
+from scipy.interpolate import interp1d
+
+import cytrack.cytrack_functions as cf
+from synthetic import polar_cords, sample_nearest
+
+
+def reference_roci(latc, lonc, lats, lons, mslp, pmin, dang=10, dradius=100, search_radius=2000, model_res=20):
+	"""compute_roci_RU before the single sampling, with the legs sampled again for each search radius."""
+	outerp = 900
+	while outerp < pmin:
+		if search_radius < 1.5 * dradius:
+			return 0, 0
+		latp, lonp, radius, theta = polar_cords(latc, lonc, dang, dradius, search_radius)
+		pminp = sample_nearest(lats, lons, mslp, latp, lonp)
+		outerp = pminp[:, -1].min()
+		search_radius = search_radius - dradius
+	if outerp <= pmin:
+		return 0, 0
+
+	# first point of each leg (except the first one) where the pressure stops decreasing
+	bint = 1 if model_res > 50 else 3
+	critical_p = []
+	for leg in pminp[1:]:
+		flat = [leg[j] for j in range(bint, len(leg) - 1) if 0 <= leg[j] - leg[j - 1] <= 0.00001]
+		critical_p.append(flat[0] if len(flat) > 0 else leg[-1])
+	closedp = min(critical_p)
+
+	radius_i = [interp1d(leg, radius)(min(max(closedp, leg.min()), leg.max())) for leg in pminp]
+	area = sum(radius_i[i - 1] * radius_i[i] * np.sin(theta[i] - theta[i - 1]) / 2 for i in range(1, len(critical_p)))
+	if closedp < pmin:
+		return 0, 0
+	return np.sqrt(area / np.pi), closedp
+
+
+@pytest.mark.parametrize("model_res", [25, 60])
+def test_compute_roci_RU(mslp_case, model_res):
+	lats, lons, mslp = mslp_case["lats"], mslp_case["lons"], mslp_case["mslp"]
+	found = 0
+	for latc, lonc, pmin in zip(mslp_case["latc"], mslp_case["lonc"], mslp_case["pmin"]):
+		roci, closedp = cf.compute_roci_RU(latc=latc, lonc=lonc, lats=lats, lons=lons, mslp=mslp, pmin=pmin,
+						dang=10, dradius=100, search_radius=1500, model_res=model_res)
+		ref_roci, ref_closedp = reference_roci(latc, lonc, lats, lons, mslp, pmin, dang=10, dradius=100, search_radius=1500, model_res=model_res)
+		np.testing.assert_allclose(roci, ref_roci, rtol=1e-12, atol=1e-9)
+		assert closedp == ref_closedp
+		found += roci > 0
+	assert 0 < found < len(mslp_case["latc"])
+
+
+@pytest.mark.parametrize("seed", range(0, 5))
+def test_interpolate_legs(seed):
+	rng = np.random.default_rng(seed)
+	nlegs, npoints = 50, 16
+	y = np.arange(0, npoints) * 100.0
+	x = np.cumsum(rng.uniform(0, 2, (nlegs, npoints)), axis=1) + 990
+	# unsorted legs and repeated values, as in the legs of a polar grid
+	x[::3] = x[::3, ::-1]
+	x[1::5, 4:7] = x[1::5, 4:5]
+	x[2::5] = np.round(x[2::5])
+	xnew = rng.uniform(x.min(axis=1), x.max(axis=1))
+	xnew[::4] = x[::4, 5]
+	xnew[1::4] = x.min(axis=1)[1::4]
+	xnew[2::4] = x.max(axis=1)[2::4]
+
+	with warnings.catch_warnings():
+		warnings.simplefilter("error", RuntimeWarning)
+		ynew = cf.interpolate_legs(x=x, y=y, xnew=xnew)
+	ref = np.array([interp1d(x[i], y)(xnew[i]) for i in range(0, nlegs)])
+	np.testing.assert_array_equal(ynew, ref)
+
+
+def test_interpolate_legs_with_inf_padding():
+	# the first points of the legs are padded with inf, as compute_TC_size_batch does inwards of the wind maximum
+	rng = np.random.default_rng(7)
+	y = np.arange(0, 12) * 50.0
+	x = np.sort(rng.uniform(0, 30, (20, 12)), axis=1)[:, ::-1]
+	x[:, :3] = np.inf
+	xnew = np.full(20, 12.0)
+	with warnings.catch_warnings():
+		warnings.simplefilter("error", RuntimeWarning)
+		ynew = cf.interpolate_legs(x=x, y=y, xnew=xnew)
+	inside = (x[:, 3:].min(axis=1) <= 12) & (x[:, 3:].max(axis=1) >= 12)
+	ref = np.array([interp1d(x[i, 3:], y[3:])(12.0) for i in np.where(inside)[0]])
+	np.testing.assert_allclose(ynew[inside], ref, rtol=1e-12)
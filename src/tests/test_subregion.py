@@ -0,0 +1,70 @@
+"""
+Tests of the subregion (hyperslab) reads of the ERA5 and CUSTOM surface files.
+"""
+import numpy as np
+import pytest
+from netCDF4 import Dataset
+
+import cytrack.cytrack_functions as cf
+
+
+def expected_field(lats, lons):
+	"""Value written at each grid point, from its latitude and its longitude between 0 and 360."""
+	return 100000 + 100 * lats + np.mod(lons, 360)
+
+
+@pytest.fixture
+def global_file(tmp_path):
+	"""Global ERA5-like file, with latitudes from north to south and longitudes from 0 to 359."""
+	lat = np.arange(90, -90.1, -1.0)
+	lon = np.arange(0, 360, 1.0)
+	lons, lats = np.meshgrid(lon, lat)
+	filename = tmp_path / "era5_20180901_00.nc"
+	nc = Dataset(str(filename), "w")
+	nc.createDimension("time", 1)
+	nc.createDimension("latitude", len(lat))
+	nc.createDimension("longitude", len(lon))
+	nc.createVariable("latitude", "f4", ("latitude",))[:] = lat
+	nc.createVariable("longitude", "f4", ("longitude",))[:] = lon
+	nc.createVariable("msl", "f8", ("time", "latitude", "longitude"))[:] = expected_field(lats, lons)[np.newaxis]
+	nc.createVariable("hgt", "f4", ("latitude", "longitude"))[:] = lats
+	nc.close()
+	return tmp_path, filename.name
+
+
+@pytest.mark.parametrize("search_region,search_limits", [("NA", [-100, 0, 20, 60]), ("NA", [-60, -30, -10, 10]), ("NP", [120, 0, 250, 60]), ("NP", [10, 20, 50, 40])])
+def test_era5_subregion(global_file, search_region, search_limits):
+	idir, erafile = global_file
+	varlist = cf.get_era5_2dvar(idir=str(idir), erafile=erafile, svariables=["msl"], search_limits=search_limits, search_region=search_region)
+	lats, lons, msl = varlist
+
+	np.testing.assert_array_equal(msl, expected_field(lats, lons))
+	assert lats.min() == search_limits[1] and lats.max() == search_limits[3]
+	if search_region == "NA":
+		assert lons.min() == search_limits[0] and lons.max() == search_limits[2]
+	else:
+		assert lons.min() == search_limits[0] % 360 and lons.max() == search_limits[2] % 360
+	# the longitudes increase eastwards without gaps, also across the edge of the grid
+	np.testing.assert_array_equal(np.diff(np.mod(lons[0] - search_limits[0], 360)), 1)
+
+
+def test_read_subregion_across_the_edge(global_file):
+	idir, erafile = global_file
+	nc = Dataset(str(idir / erafile))
+	window = cf.get_subregion_window(lat=nc.variables["latitude"][:], lon=nc.variables["longitude"][:], search_limits=[-20, 10, 30, 50], wrap_lon=True)
+	assert len(window["lon_slices"]) == 2
+	field = cf.read_subregion(ncvar=nc.variables["msl"], window=window)
+	full = nc.variables["msl"][0]
+	nc.close()
+	expected = np.concatenate([full[window["lat_slice"], lon_slice] for lon_slice in window["lon_slices"]], axis=-1)
+	np.testing.assert_array_equal(field, expected)
+	np.testing.assert_array_equal(field, expected_field(window["lats"], window["lons"]))
+
+
+def test_custom_terrain_with_its_own_coordinates(global_file):
+	idir, erafile = global_file
+	search_limits = [-100, 0, 20, 60]
+	# the data files name their coordinates lat/lon, the terrain file latitude/longitude
+	hgt = cf.get_cumstom_hgt_data(str(idir / erafile), "hgt", varlat="lat", varlon="lon", search_limits=search_limits)
+	lats = cf.get_era5_2dvar(idir=str(idir), erafile=erafile, svariables=["msl"], search_limits=search_limits, search_region="NA")[0]
+	np.testing.assert_array_equal(hgt, lats)
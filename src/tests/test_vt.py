@@ -0,0 +1,79 @@
+"""
+Regression tests of the thermal wind (VTL and VTU) computed for all the centres at once, against the original
+loop over the centres.
+"""
+import numpy as np
+import pytest
+
+import cytrack.cytrack_functions as cf
+from synthetic import regular_grid
+
+
+LEVELS = [900, 850, 800, 750, 700, 650, 600, 550, 500, 450, 400, 350, 300]
+LISTLEV1 = [900, 850, 800, 750, 700, 650, 600]
+LISTLEV2 = [600, 550, 500, 450, 400, 350, 300]
+
+
+def reference_vt_series(liste_lat, liste_lon, max_dist, lats, lons, levels, Zvar, vtl_vtu_lr):
+	"""compute_VT_series before the batching, with the range of each level masked by the distance to each centre."""
+	lnP1 = np.log(np.array(LISTLEV1) * 100)
+	lnP2 = np.log(np.array(LISTLEV2) * 100)
+	vtl, vtu = [], []
+	for clat, clon in zip(liste_lat, liste_lon):
+		if clon >= 180:
+			clon = clon - 360
+		distance = cf.haversine(lons, lats, clon, clat)
+		deltaZ = []
+		for lev in LISTLEV1 + LISTLEV2:
+			data = np.ma.masked_where(distance > max_dist, Zvar[list(levels).index(lev)])
+			deltaZ.append(int(np.max(data) - np.min(data)))
+		deltaZ1, deltaZ2 = deltaZ[:len(LISTLEV1)], deltaZ[len(LISTLEV1):]
+		if vtl_vtu_lr:
+			vtl.append(int(np.polyfit(lnP1, deltaZ1, 1)[0]))
+			vtu.append(int(np.polyfit(lnP2, deltaZ2, 1)[0]))
+		else:
+			vtl.append(int((deltaZ1[-1] - deltaZ1[0]) / (lnP1[-1] - lnP1[0])))
+			vtu.append(int((deltaZ2[-1] - deltaZ2[0]) / (lnP2[-1] - lnP2[0])))
+	return vtl, vtu
+
+
+@pytest.fixture(scope="module")
+def geopotential():
+	"""Geopotential heights with a low whose depth changes with the level, on a 0.5 degree grid."""
+	lats, lons = regular_grid(res=0.5, lonmin=-80, lonmax=-10)
+	rng = np.random.default_rng(3)
+	Zvar = []
+	for k, lev in enumerate(LEVELS):
+		depth = 60 + 15 * np.sin(k / 2)
+		low = depth * np.exp(-((lats - 30) ** 2 + (lons + 45) ** 2) / 50)
+		Zvar.append(1000 + 8 * (900 - lev) - low + 0.5 * (lats - 10) ** 1.5 + rng.normal(0, 3, lats.shape))
+	return lats, lons, np.array(Zvar)
+
+
+@pytest.mark.parametrize("vtl_vtu_lr", [False, True])
+def test_compute_VT_series(geopotential, vtl_vtu_lr):
+	lats, lons, Zvar = geopotential
+	# longitudes in both conventions, and a centre next to the edge of the grid
+	liste_lat = [30.0, 31.5, 28.25, 45.0, 12.0, 58.5]
+	liste_lon = [-45.0, 314.5, -47.3, 300.0, -75.0, -12.0]
+	vtl, vtu = cf.compute_VT_series(dates=None, hours=None, listlev1=LISTLEV1, listlev2=LISTLEV2, liste_lat=liste_lat, liste_lon=liste_lon,
+				max_dist=500, lats=lats, lons=lons, levels=LEVELS, Zvar=Zvar, vtl_vtu_lr=vtl_vtu_lr)
+	expected = reference_vt_series(liste_lat, liste_lon, 500, lats, lons, LEVELS, Zvar, vtl_vtu_lr)
+	assert (vtl, vtu) == expected
+	assert all(isinstance(value, (int, np.integer)) for value in vtl + vtu)
+	assert len(set(vtl)) > 1
+
+
+def test_compute_VT_series_without_centres(geopotential):
+	lats, lons, Zvar = geopotential
+	assert cf.compute_VT_series(dates=None, hours=None, listlev1=LISTLEV1, listlev2=LISTLEV2, liste_lat=[], liste_lon=[],
+				max_dist=500, lats=lats, lons=lons, levels=LEVELS, Zvar=Zvar) == ([], [])
+
+
+def test_get_lnp_slope():
+	linear_model = pytest.importorskip("sklearn.linear_model")
+	rng = np.random.default_rng(0)
+	lnp = np.log(np.array(LISTLEV1) * 100)
+	dz = rng.normal(100, 30, (20, len(lnp)))
+	expected = [linear_model.LinearRegression().fit(lnp.reshape(-1, 1), profile).coef_[0] for profile in dz]
+	np.testing.assert_allclose(cf.get_lnp_slope(lnp=lnp, dz=dz), expected, rtol=1e-9)
@@ -0,0 +1,103 @@
+"""
+Tests of the storm-relative winds, the quadrant wind radii and the TC size computed from them, on idealised vortices
+in both hemispheres.
+"""
+import warnings
+
+import numpy as np
+import pytest
+
+import cytrack.cytrack_functions as cf
+from synthetic import regular_grid
+
+
+def vortex_profile(r, vmax=40.0, rmax=80.0):
+	"""Tangential wind in m/s of a modified Rankine vortex at the distance r in km."""
+	return np.where(r < rmax, vmax * r / rmax, vmax * (rmax / np.maximum(r, rmax)) ** 0.6)
+
+
+def vortex_winds(lats, lons, latc, lonc, inflow=0.0):
+	"""u and v of a cyclonic vortex (counterclockwise in the NH, clockwise in the SH) with a fraction of inflow."""
+	dx = (lons - lonc) * 111.0 * np.cos(np.deg2rad(latc))
+	dy = (lats - latc) * 111.0
+	r = np.hypot(dx, dy)
+	speed = vortex_profile(r)
+	with np.errstate(invalid="ignore", divide="ignore"):
+		ex, ey = np.where(r > 0, dx / r, 0), np.where(r > 0, dy / r, 0)
+	sign = 1 if latc > 0 else -1
+	u = speed * (-sign * ey - inflow * ex)
+	v = speed * (sign * ex - inflow * ey)
+	return u, v
+
+
+@pytest.mark.parametrize("latc", [25.0, -25.0])
+def test_tangential_wind_is_cyclonic_in_both_hemispheres(latc):
+	lats, lons = regular_grid(latmin=latc - 15, latmax=latc + 15, lonmin=-60, lonmax=-20)
+	lonc = -40.0
+	u, v = vortex_winds(lats, lons, latc, lonc, inflow=0.2)
+	grid = cf.get_grid_metrics(lats=lats, lons=lons)
+	sampler = cf.get_polar_sampler(latc=np.array([latc]), lonc=np.array([lonc]), dang=10, dradius=50, search_radius=600, grid=grid, method="bilinear")
+	uint = cf.sample_grid_field(field=u, sampler=sampler).reshape(sampler["lats"].shape)
+	vint = cf.sample_grid_field(field=v, sampler=sampler).reshape(sampler["lats"].shape)
+	vt, vr = cf.get_storm_relative_winds(u=uint, v=vint, latc=np.array([latc]), lonc=np.array([lonc]), latp=sampler["lats"], lonp=sampler["lons"])
+
+	radius = sampler["radius"]
+	ring = (radius >= 100) & (radius <= 500)
+	assert np.all(vt[..., 1:] > 0)
+	assert np.all(vr[..., 1:] < 0)
+	expected = vortex_profile(radius[ring])
+	np.testing.assert_allclose(vt[..., ring], np.broadcast_to(expected, vt[..., ring].shape), rtol=0.15)
+	np.testing.assert_allclose(vr[..., ring], np.broadcast_to(-0.2 * expected, vr[..., ring].shape), rtol=0.5)
+
+	# the same winds turning the other way are anticyclonic
+	vt, vr = cf.get_storm_relative_winds(u=-uint, v=-vint, latc=np.array([latc]), lonc=np.array([lonc]), latp=sampler["lats"], lonp=sampler["lons"])
+	assert np.all(vt[..., 1:] < 0)
+	assert np.all(vr[..., 1:] > 0)
+
+
+def test_get_wind_radii():
+	radius = np.arange(0, 501, 25.0)
+	theta = np.radians(np.arange(5, 360, 10.0))
+	bearing = (90 - np.degrees(theta)) % 360
+	quadrant = (bearing // 90).astype(int)
+	# a linear profile that peaks in the middle of each quadrant (NE, SE, SW, NW)
+	base = np.array([30.0, 45.0, 20.0, 12.0])
+	peak = base[quadrant] + 3 * np.sin(np.pi * (bearing % 90) / 90)
+	ff = peak[:, np.newaxis] - 0.05 * radius[np.newaxis, :]
+	ff[:, 0] = 0
+	ff = np.stack([ff, np.zeros_like(ff)])
+
+	thresholds = [17, 26, 33]
+	radii = cf.get_wind_radii(ff=ff, radius=radius, theta=theta, thresholds=thresholds)
+	assert radii.shape == (2, 3, 4)
+	for k, thr in enumerate(thresholds):
+		expected = np.where(base + 3 >= thr, np.minimum((base + 3 - thr) / 0.05, radius[-1]), 0)
+		np.testing.assert_allclose(radii[0, k], expected, atol=1e-9)
+	np.testing.assert_array_equal(radii[1], 0)
+
+	# the wind above the threshold up to the end of the legs gives the full search radius
+	radii = cf.get_wind_radii(ff=ff + 100, radius=radius, theta=theta, thresholds=[17])
+	np.testing.assert_array_equal(radii[0, 0], radius[-1])
+
+
+def test_compute_TC_size_batch_without_warnings():
+	lats, lons = regular_grid(latmin=-40, latmax=40, lonmin=-60, lonmax=-20, res=0.5)
+	u = np.zeros_like(lats)
+	v = np.zeros_like(lats)
+	for latc in (20.0, -20.0):
+		uc, vc = vortex_winds(lats, lons, latc, -40.0)
+		u, v = u + uc, v + vc
+	# the last centre is in calm air, where no leg reaches the threshold
+	latc = np.array([20.0, -20.0, 0.0])
+	lonc = np.array([-40.0, -40.0, -40.0])
+	u[np.abs(lats) < 3] = 0
+	v[np.abs(lats) < 3] = 0
+	with warnings.catch_warnings():
+		warnings.simplefilter("error", RuntimeWarning)
+		size, radii = cf.compute_TC_size_batch(latc=latc, lonc=lonc, lats=lats, lons=lons, u=u, v=v, dradius=50, dang=10,
+						search_radius=1000, model_res=50, outer_wind_speed_threshold=2.5, wind_radii_thresholds=[17, 26, 33])
+	assert size[0] > 500 and size[1] > 500
+	np.testing.assert_allclose(size[0], size[1], rtol=0.05)
+	assert radii.shape == (3, 3, 4)
+	assert np.all(radii[:2, 0] > radii[:2, 2])
+	np.testing.assert_array_equal(radii[2], 0)
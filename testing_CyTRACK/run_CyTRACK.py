@@ -6,5 +6,7 @@ if args.cytrack_help:
 	cytrack.help()
 elif args.get_template:
 	cytrack.get_cytrack_inputs_template()
+elif args.build_mslp_climatology:
+	cytrack.build_mslp_climatology_main(args.parameterfile)
 else:
 	cytrack.get_cytrack_main(args.parameterfile)